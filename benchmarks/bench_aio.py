@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare throughput of threaded `Queue` and asyncio `AsyncQueue`
+running put/take/ack cycles against local fake server.
+
+    $ python benchmarks/bench_aio.py --count 5000 --concurrency 32
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tarantool_queue import Queue  # noqa: E402
+from tarantool_queue.aio import AsyncQueue  # noqa: E402
+from tests.fake_tarantool import FakeTarantool  # noqa: E402
+
+
+def report(name, count, elapsed):
+    print("{0:<24} {1:>10.3f} s {2:>12.0f} cycles/s".format(
+        name, elapsed, count / elapsed))
+
+
+def bench_threads(server, count, concurrency):
+    # tarantool.Connection is not thread-safe: one Queue per thread
+    def worker(n):
+        tube = Queue(server.host, server.port, 0).tube("bench_threads")
+        for i in range(n):
+            tube.put(i)
+            tube.take().ack()
+
+    threads = [threading.Thread(target=worker, args=(count // concurrency,))
+               for _ in range(concurrency)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report("threads x{0}".format(concurrency), count, time.time() - start)
+
+
+def bench_asyncio(server, count, concurrency):
+    async def worker(tube, n):
+        for i in range(n):
+            await tube.put(i)
+            await (await tube.take()).ack()
+
+    async def main():
+        queue = AsyncQueue(server.host, server.port, 0)
+        tube = queue.tube("bench_asyncio")
+        start = time.time()
+        await asyncio.gather(*[worker(tube, count // concurrency)
+                               for _ in range(concurrency)])
+        report("asyncio x{0}".format(concurrency), count, time.time() - start)
+        await queue.close()
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    with FakeTarantool() as server:
+        bench_threads(server, args.count, args.concurrency)
+        bench_asyncio(server, args.count, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Overhead of `Queue._call` hook per call, with metrics disabled and
+enabled, against `call` of the connection object itself (the overhead
+includes `Queue.tnt` lookup). Connection answers without I/O, so only
+the client side is measured. Doesn't need running tarantool.
+
+    $ python benchmarks/bench_call_overhead.py --count 1000000
+"""
+import time
+import argparse
+
+from tarantool_queue import Queue
+from tarantool_queue.iproto import Response
+
+
+class NullConnection(object):
+    response = Response([(b"1", b"bench", b"ready", b"\x01")])
+
+    def __init__(self, host, port, schema=None):
+        pass
+
+    def call(self, method, args):
+        return self.response
+
+
+def bench(name, call, count):
+    args = ("0", "bench", "0", "0", "0", "0", "\x01")
+    start = time.time()
+    for _ in range(count):
+        call("queue.put", args)
+    elapsed = (time.time() - start) / count
+    print("{0:<20} {1:>8.0f} ns/call".format(name, elapsed * 1e9))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1000000)
+    args = parser.parse_args()
+
+    queue = Queue("127.0.0.1", 33013, 0)
+    queue.tarantool_connection = NullConnection
+    direct = bench("connection.call", queue.tnt.call, args.count)
+    disabled = bench("_call, no metrics", queue._call, args.count)
+    queue.create_metrics()
+    enabled = bench("_call, metrics", queue._call, args.count)
+    print("overhead: disabled {0:.0f} ns, enabled {1:.0f} ns".format(
+        (disabled - direct) * 1e9, (enabled - direct) * 1e9))
+
+
+if __name__ == "__main__":
+    main()
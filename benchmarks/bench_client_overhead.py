@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+CPU cost of the Python layer per operation, without network: Queue and
+TQueue are connected to a mock connection answering with prepared
+responses. For every hot path it reports ns/op, blocks of memory
+retained per op (by the result) and peak of memory allocated by one op.
+Results may be saved as JSON and compared with another run.
+
+    $ python benchmarks/bench_client_overhead.py --output new.json
+    $ python benchmarks/bench_client_overhead.py --compare old.json
+"""
+import gc
+import sys
+import json
+import time
+import struct
+import argparse
+import tracemalloc
+
+import msgpack
+
+from tarantool_queue import Queue, TQueue
+from tarantool_queue.iproto import Response
+from tarantool_queue.tarantool_queue import Task
+from tarantool_queue.tarantool_tqueue import TTask
+
+try:
+    _timer = time.perf_counter
+except AttributeError:
+    _timer = time.time
+
+PAYLOAD = msgpack.packb({"id": 1, "event": "x" * 64, "tags": [1, 2, 3]})
+STATUSES = ("ready", "delayed", "taken", "buried", "done", "total")
+COUNTERS = ("put", "urgent", "take", "take_timeout", "ack", "release",
+            "delete", "bury", "touch", "meta")
+
+
+def _q(value):
+    return struct.pack("<q", value)
+
+
+def statistics_row(tubes):
+    row = []
+    for i in range(tubes):
+        prefix = "space0.tube{0}.".format(i)
+        for status in STATUSES:
+            row += [prefix + "tasks." + status, str(i)]
+        for counter in COUNTERS:
+            row += [prefix + counter, str(i * 10)]
+    return tuple([field.encode("utf-8") for field in row])
+
+
+class MockConnection(object):
+    """
+    Zero-latency connection: every procedure returns prepared response.
+    """
+    task = Response([(b"0123456789abcdef", b"bench", b"ready", PAYLOAD)])
+    responses = {
+        "queue.put": task,
+        "queue.take": task,
+        "queue.meta": Response([(
+            b"0123456789abcdef", b"bench", b"taken", _q(0), b"0", b"0",
+            struct.pack("<l", 0), _q(1), _q(2), _q(3), _q(0), _q(1),
+            _q(4))]),
+        "queue.statistics": Response([statistics_row(100)]),
+        "box.queue.put": Response([(
+            _q(1), b"0", b"ready", b"32767", b"bench", b"300", b"0", b"5",
+            PAYLOAD)]),
+    }
+
+    def __init__(self, host, port, schema=None):
+        pass
+
+    def call(self, method, args):
+        return self.responses[method]
+
+
+def measure(name, func, count):
+    func()
+    gc.collect()
+    gc.disable()
+    try:
+        start = _timer()
+        for _ in range(count):
+            func()
+        elapsed = (_timer() - start) / count
+        blocks = None
+        if hasattr(sys, "getallocatedblocks"):
+            results = [None] * count
+            before = sys.getallocatedblocks()
+            for i in range(count):
+                results[i] = func()
+            blocks = (sys.getallocatedblocks() - before) / float(count)
+            del results
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    finally:
+        gc.enable()
+    return {"name": name, "ns": elapsed * 1e9, "blocks": blocks,
+            "peak_bytes": peak}
+
+
+def cases():
+    queue = Queue("127.0.0.1", 33013, 0)
+    queue.tarantool_connection = MockConnection
+    tube = queue.tube("bench")
+    args, threshold = tube._options({})
+    put = MockConnection.responses["queue.put"]
+
+    tqueue = TQueue("127.0.0.1", 33013, 0)
+    tqueue.tarantool_connection = MockConnection
+    ttube = tqueue.tube("bench")
+    targs = ttube._options({})
+    tput = MockConnection.responses["box.queue.put"]
+
+    def decode(response, cls):
+        # data is cached by task, so decode a fresh one every time
+        owner = queue if cls is Task else tqueue
+        return lambda: cls.from_tuple(owner, response).data
+
+    # (name, function, divisor of --count for slow operations)
+    return [
+        ("Queue  Tube._produce_args",
+         lambda: tube._produce_args({"id": 1}, args, threshold), 1),
+        ("Queue  Tube.put", lambda: tube.put({"id": 1}), 1),
+        ("Queue  Task.from_tuple", lambda: Task.from_tuple(queue, put), 1),
+        ("Queue  Task.data (with from_tuple)", decode(put, Task), 1),
+        ("Queue  Queue._meta", lambda: queue._meta("0123456789abcdef"), 1),
+        ("Queue  Queue.statistics (100 tubes)", queue.statistics, 100),
+        ("Queue  Queue.statistics (1 of 100)",
+         lambda: queue.statistics("tube1"), 100),
+        ("TQueue TTube._put_args",
+         lambda: ttube._put_args({"id": 1}, targs), 1),
+        ("TQueue TTube.put", lambda: ttube.put({"id": 1}), 1),
+        ("TQueue TTask.from_tuple",
+         lambda: TTask.from_tuple(tqueue, tput), 1),
+        ("TQueue TTask.data (with from_tuple)", decode(tput, TTask), 1),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--output", help="save results to JSON file")
+    parser.add_argument("--compare", help="JSON file of previous run")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="slowdown reported as regression")
+    args = parser.parse_args()
+
+    old = {}
+    if args.compare:
+        with open(args.compare) as f:
+            old = dict((result["name"], result)
+                       for result in json.load(f)["results"])
+    print("{0:<38} {1:>10} {2:>10} {3:>10} {4:>8}".format(
+        "operation", "ns/op", "blocks/op", "peak B/op", "change"))
+    results, regressions = [], 0
+    for name, func, divisor in cases():
+        result = measure(name, func, max(args.count // divisor, 1))
+        results.append(result)
+        change = ""
+        if name in old:
+            ratio = result["ns"] / old[name]["ns"] - 1
+            change = "{0:+.1f}%".format(ratio * 100)
+            if ratio > args.threshold:
+                change += " !"
+                regressions += 1
+        blocks = "-" if result["blocks"] is None else \
+            "{0:.1f}".format(result["blocks"])
+        print("{0:<38} {1:>10.0f} {2:>10} {3:>10} {4:>8}".format(
+            name, result["ns"], blocks, result["peak_bytes"], change))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"python": sys.version.split()[0],
+                       "count": args.count,
+                       "results": results}, f, indent=2, sort_keys=True)
+    if regressions:
+        print("{0} regressions over {1:.0%}".format(regressions,
+                                                    args.threshold))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
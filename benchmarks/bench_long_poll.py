@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Measure latency of put/take/ack cycle while N consumers are idle in
+blocking `take(timeout)` on an empty tube, with and without dedicated
+long-poll connections. Runs against local fake server.
+
+    $ python benchmarks/bench_long_poll.py --consumers 8 --pool 4
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tarantool_queue import Queue  # noqa: E402
+from tests.fake_tarantool import FakeTarantool  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def bench(server, name, consumers, pool_size, count, long_poll):
+    queue = Queue(server.host, server.port, 0)
+    queue.create_pool(min_size=pool_size, max_size=pool_size)
+    if long_poll:
+        queue.create_long_poll(per='thread')
+    idle = queue.tube("idle_" + name)
+    work = queue.tube("work_" + name)
+    stop = threading.Event()
+
+    def consumer():
+        while not stop.is_set():
+            task = idle.take(0.2)
+            if task is not None:
+                task.ack()
+
+    threads = [threading.Thread(target=consumer) for _ in range(consumers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+
+    latencies = []
+    for i in range(count):
+        start = time.time()
+        work.put(i)
+        work.take(0).ack()
+        latencies.append(time.time() - start)
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    del queue.tarantool_long_poll
+    del queue.tarantool_pool
+    print("{0:<16} p50 {1:>9.3f} ms  p99 {2:>9.3f} ms  max {3:>9.3f} ms".format(
+        name, percentile(latencies, 0.5) * 1000,
+        percentile(latencies, 0.99) * 1000, max(latencies) * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--consumers", type=int, default=8)
+    parser.add_argument("--pool", type=int, default=4)
+    parser.add_argument("--count", type=int, default=200)
+    args = parser.parse_args()
+
+    with FakeTarantool() as server:
+        bench(server, "shared pool", args.consumers, args.pool, args.count,
+              long_poll=False)
+        bench(server, "long poll", args.consumers, args.pool, args.count,
+              long_poll=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Throughput of put from many threads sharing one connection: plain
+connection guarded by a lock (one request in flight), against
+MultiplexedConnection (requests of all threads in flight together) and
+put_async pipelined by one thread. Runs against local fake server.
+
+    $ python benchmarks/bench_mux.py --threads 16 --count 500
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tarantool_queue import Queue  # noqa: E402
+from tarantool_queue.mux import MultiplexedConnection  # noqa: E402
+from tests.fake_tarantool import FakeTarantool  # noqa: E402
+
+
+class LockedConnection(object):
+    # default connection is shared by threads under one lock
+    def __init__(self, host, port, schema=None):
+        from tarantool import Connection
+        self._tnt = Connection(host, port)
+        self._lock = threading.Lock()
+
+    def call(self, method, args):
+        with self._lock:
+            return self._tnt.call(method, args)
+
+
+def threaded(queue, threads, count):
+    tube = queue.tube("bench_mux")
+
+    def worker():
+        for _ in range(count):
+            tube.put("x" * 64)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.time()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return threads * count / (time.time() - start)
+
+
+def pipelined(queue, threads, count):
+    tube = queue.tube("bench_mux")
+    start = time.time()
+    futures = [tube.put_async("x" * 64) for _ in range(threads * count)]
+    for future in futures:
+        future.result()
+    return threads * count / (time.time() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--count", type=int, default=500,
+                        help="puts per thread")
+    args = parser.parse_args()
+
+    with FakeTarantool() as server:
+        for name, connection, run in (
+                ("shared lock, threads", LockedConnection, threaded),
+                ("multiplexed, threads", MultiplexedConnection, threaded),
+                ("multiplexed, put_async", MultiplexedConnection,
+                 pipelined)):
+            queue = Queue(server.host, server.port, 0)
+            queue.tarantool_connection = connection
+            rate = run(queue, args.threads, args.count)
+            print("{0:<24} {1:>10.0f} puts/s".format(name, rate))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Latency of put seen by the caller and total throughput: inline
+`tube.put()` waiting a round trip against `BufferedProducer.put()`
+returning future. Runs against local fake server.
+
+    $ python benchmarks/bench_producer.py --count 5000
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tarantool_queue import Queue  # noqa: E402
+from tests.fake_tarantool import FakeTarantool  # noqa: E402
+
+
+def run(name, put, count, done=None):
+    latencies = []
+    start = time.time()
+    for _ in range(count):
+        begin = time.time()
+        put("x" * 64)
+        latencies.append(time.time() - begin)
+    if done is not None:
+        done()
+    elapsed = time.time() - start
+    latencies.sort()
+    print("{0:<24} {1:>10.1f} {2:>10.1f} {3:>10.0f}".format(
+        name, latencies[len(latencies) // 2] * 1e6,
+        latencies[int(len(latencies) * 0.99)] * 1e6, count / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--linger", type=float, default=0.005)
+    args = parser.parse_args()
+
+    with FakeTarantool() as server:
+        queue = Queue(server.host, server.port, 0)
+        tube = queue.tube("bench_producer")
+        print("{0:<24} {1:>10} {2:>10} {3:>10}".format(
+            "put", "p50 us", "p99 us", "puts/s"))
+        run("inline", tube.put, args.count)
+        producer = tube.create_producer(args.batch_size, args.linger)
+        run("buffered", producer.put, args.count, producer.close)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+CPU cost of put: arguments encoded on every call (dict of options
+copied and every option converted to string, as in 0.1.4) against
+arguments precompiled by `update_options`. Uses connection answering
+without I/O. Doesn't need running tarantool.
+
+    $ python benchmarks/bench_put_args.py --count 200000
+"""
+import time
+import struct
+import argparse
+
+from tarantool_queue import Queue, TQueue
+from tarantool_queue.iproto import Response
+from tarantool_queue.tarantool_queue import Tube, Task
+from tarantool_queue.tarantool_tqueue import TTube, unpack_long_long
+
+try:
+    _timer = time.perf_counter
+except AttributeError:
+    _timer = time.time
+
+
+class NullConnection(object):
+    responses = {
+        "queue.put": Response([(b"1", b"bench", b"ready", b"\x01")]),
+        "box.queue.put": Response([(
+            struct.pack("<q", 1), b"0", b"ready", b"32767", b"bench",
+            b"300", b"0", b"5", b"\x01")]),
+    }
+
+    def __init__(self, host, port, schema=None):
+        pass
+
+    def call(self, method, args):
+        return self.responses[method]
+
+
+class OldTube(Tube):
+    # put of 0.1.4
+    def _produce(self, method, data, **kwargs):
+        opt = dict(self.opt, **kwargs)
+        the_tuple = self.queue._call(method, (
+            str(self.queue.space),
+            str(opt["tube"]),
+            str(opt["delay"]),
+            str(opt["ttl"]),
+            str(opt["ttr"]),
+            str(opt["pri"]),
+            self.serialize(data)
+        ))
+        return Task.from_tuple(self.queue, the_tuple)
+
+
+class OldTTube(TTube):
+    # put of 0.1.4
+    def put(self, data, **kwargs):
+        opt = dict(self.opt, **kwargs)
+        the_tuple = self.queue._call("box.queue.put", (
+            str(self.queue.space),
+            str(opt["tube"]),
+            str(opt["limits"]),
+            str(opt["pri"]),
+            str(opt["delay"]),
+            str(opt["ttr"]),
+            str(opt["ttl"]),
+            str(opt["retry"]),
+            self.serialize(data)
+        ))
+        return unpack_long_long(the_tuple[0][0])
+
+
+def bench(name, func, count):
+    func()
+    start = _timer()
+    for _ in range(count):
+        func()
+    elapsed = (_timer() - start) / count
+    print("{0:<32} {1:>8.0f} ns/put".format(name, elapsed * 1e9))
+    return elapsed
+
+
+def compare(name, old, new, count):
+    old = bench(name + ", per call", old, count)
+    new = bench(name + ", precompiled", new, count)
+    print("{0:<32} {1:>8.0f} ns/put ({2:.0f}%)".format(
+        "saved", (old - new) * 1e9, 100.0 * (1 - new / old)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200000)
+    args = parser.parse_args()
+
+    queue = Queue("127.0.0.1", 33013, 0)
+    queue.tarantool_connection = NullConnection
+    # tube is created by queue.tube() in applications, same options here
+    tube = queue.tube("bench", ttr=60, pri=5)
+    old_tube = OldTube(queue, "bench", ttr=60, pri=5)
+    compare("Tube.put", lambda: old_tube.put(1), lambda: tube.put(1),
+            args.count)
+    compare("Tube.put(delay=1)", lambda: old_tube.put(1, delay=1),
+            lambda: tube.put(1, delay=1), args.count)
+
+    tqueue = TQueue("127.0.0.1", 33013, 0)
+    tqueue.tarantool_connection = NullConnection
+    ttube = tqueue.tube("bench", ttr=60)
+    old_ttube = OldTTube(tqueue, "bench", ttr=60)
+    compare("TTube.put", lambda: old_ttube.put(1), lambda: ttube.put(1),
+            args.count)
+
+
+if __name__ == "__main__":
+    main()
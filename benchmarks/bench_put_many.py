@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare per-call `Tube.put` loop with pipelined `Tube.put_many`.
+Needs running tarantool with queue (see tests/tarantool.cfg).
+
+    $ python benchmarks/bench_put_many.py --count 10000 --chunk 512
+"""
+import time
+import argparse
+
+from tarantool_queue import Queue
+
+
+def bench(name, func, count):
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    print("{0:<24} {1:>10.3f} s {2:>12.0f} tasks/s".format(
+        name, elapsed, count / elapsed))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=33013)
+    parser.add_argument("--space", type=int, default=0)
+    parser.add_argument("--tube", default="bench_put_many")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--chunk", type=int, default=512)
+    args = parser.parse_args()
+
+    queue = Queue(args.host, args.port, args.space)
+    tube = queue.tube(args.tube)
+    payloads = [{"id": i, "event": "x" * 64} for i in range(args.count)]
+
+    def loop():
+        for data in payloads:
+            tube.put(data)
+
+    def batch():
+        tube.put_many(payloads, chunk_size=args.chunk)
+
+    tube.truncate()
+    loop_time = bench("put loop", loop, args.count)
+    tube.truncate()
+    batch_time = bench("put_many", batch, args.count)
+    tube.truncate()
+    print("speedup: {0:.1f}x".format(loop_time / batch_time))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Throughput and p50/p99 latency of put, take and ack for Queue and
+TQueue at several payload sizes and thread counts. Runs against local
+fake server. Results are saved as JSON and may be compared with saved
+results of another run to catch regressions.
+
+    $ python benchmarks/bench_queue.py --output new.json
+    $ python benchmarks/bench_queue.py --output new.json --compare old.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tarantool_queue import Queue, TQueue  # noqa: E402
+from tests.fake_tarantool import FakeTarantool  # noqa: E402
+
+CLIENTS = {"Queue": Queue, "TQueue": TQueue}
+OPERATIONS = ("put", "take", "ack")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def worker(tube, data, count, latencies):
+    for _ in range(count):
+        start = time.time()
+        tube.put(data)
+        latencies["put"].append(time.time() - start)
+    for _ in range(count):
+        start = time.time()
+        task = tube.take(1)
+        latencies["take"].append(time.time() - start)
+        start = time.time()
+        task.ack()
+        latencies["ack"].append(time.time() - start)
+
+
+def bench(server, client, payload, threads, count):
+    queue = CLIENTS[client](server.host, server.port, 0)
+    queue.create_pool(min_size=threads, max_size=threads)
+    data = "x" * payload
+    results = [dict((op, []) for op in OPERATIONS) for _ in range(threads)]
+    # own tube per thread, so every take finds its task
+    workers = [threading.Thread(target=worker, args=(
+        queue.tube("bench_{0}_{1}_{2}_{3}".format(client, payload, threads,
+                                                   i)),
+        data, count, results[i])) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    del queue.tarantool_pool
+
+    records = []
+    for op in OPERATIONS:
+        latencies = sum([result[op] for result in results], [])
+        records.append({
+            "client": client,
+            "payload": payload,
+            "threads": threads,
+            "op": op,
+            "count": len(latencies),
+            # calls per second of time the threads spent in the op
+            "throughput": len(latencies) * threads / sum(latencies),
+            "p50_us": percentile(latencies, 0.5) * 1e6,
+            "p99_us": percentile(latencies, 0.99) * 1e6,
+        })
+    return records
+
+
+def key(record):
+    return (record["client"], record["payload"], record["threads"],
+            record["op"])
+
+
+def report(records, baseline=None, threshold=0.1):
+    old = dict((key(record), record) for record in baseline or [])
+    regressions = 0
+    print("{0:<7} {1:>7} {2:>7} {3:<4} {4:>10} {5:>10} {6:>10} {7:>8}".format(
+        "client", "payload", "threads", "op", "ops/s", "p50 us", "p99 us",
+        "change"))
+    for record in records:
+        change = ""
+        if key(record) in old:
+            ratio = (record["throughput"] /
+                     old[key(record)]["throughput"] - 1)
+            change = "{0:+.1f}%".format(ratio * 100)
+            if ratio < -threshold:
+                change += " !"
+                regressions += 1
+        print("{0:<7} {1:>7} {2:>7} {3:<4} {4:>10.0f} {5:>10.1f} "
+              "{6:>10.1f} {7:>8}".format(
+                  record["client"], record["payload"], record["threads"],
+                  record["op"], record["throughput"], record["p50_us"],
+                  record["p99_us"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", default="Queue,TQueue")
+    parser.add_argument("--payloads", default="16,1024,65536")
+    parser.add_argument("--threads", default="1,4,16")
+    parser.add_argument("--count", type=int, default=500,
+                        help="tasks per thread")
+    parser.add_argument("--output", help="save results to JSON file")
+    parser.add_argument("--compare", help="JSON file of previous run")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="throughput drop reported as regression")
+    args = parser.parse_args()
+
+    records = []
+    with FakeTarantool() as server:
+        for client in args.clients.split(","):
+            for payload in map(int, args.payloads.split(",")):
+                for threads in map(int, args.threads.split(",")):
+                    records += bench(server, client, payload, threads,
+                                     args.count)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+    regressions = report(records, baseline, args.threshold)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "time": time.time(),
+                "count": args.count,
+                "results": records,
+            }, f, indent=2, sort_keys=True)
+    if regressions:
+        print("{0} regressions over {1:.0%}".format(regressions,
+                                                    args.threshold))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
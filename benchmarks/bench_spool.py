@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Rate of puts accepted by spool while the server is down, and rate of
+their replay once it's up. Runs against local fake server.
+
+    $ python benchmarks/bench_spool.py --count 100000
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tarantool_queue import Queue  # noqa: E402
+from tarantool_queue.spool import Spool  # noqa: E402
+from tests.fake_tarantool import FakeTarantool  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--payload", type=int, default=64)
+    parser.add_argument("--sync", action="store_true",
+                        help="flush every put to disk")
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp()
+    try:
+        server = FakeTarantool()
+        port = server.port
+        server.stop()
+        queue = Queue("127.0.0.1", port, 0)
+        queue.spool = Spool(queue, path, sync=args.sync)
+        tube = queue.tube("bench_spool")
+        data = "x" * args.payload
+        tube.put(data)
+
+        start = time.time()
+        for _ in range(args.count):
+            tube.put(data)
+        elapsed = time.time() - start
+        print("{0:<10} {1:>10.0f} puts/s".format("spooled",
+                                                 args.count / elapsed))
+
+        with FakeTarantool(port=port):
+            start = time.time()
+            replayed = queue.spool.replay()
+            elapsed = time.time() - start
+        print("{0:<10} {1:>10.0f} puts/s".format("replayed",
+                                                 replayed / elapsed))
+        del queue.spool
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Parse `queue.statistics` response of 1000 tubes: regexp parser of 0.1.4
+against precompiled `parse_statistics`. Doesn't need running tarantool.
+
+    $ python benchmarks/bench_statistics.py --tubes 1000 --repeat 100
+"""
+import re
+import time
+import argparse
+
+from tarantool_queue.tarantool_queue import parse_statistics
+
+COUNTERS = ("put", "urgent", "take", "take_timeout", "ack", "release",
+            "delete", "bury", "touch", "meta")
+STATUSES = ("ready", "delayed", "taken", "buried", "done", "total")
+
+
+def parse_statistics_regexp(space, row):
+    # parser of tarantool-queue 0.1.4
+    ans = {}
+    for k, v in zip(row[0::2], row[1::2]):
+        k_t = list(
+            re.match(r'space([^.]*)\.(.*)\.([^.]*)', k).groups()
+        )
+        if int(k_t[0]) != space:
+            continue
+        if k_t[1].endswith('.tasks'):
+            k_t = k_t[0:1] + k_t[1].split('.') + k_t[2:3]
+        if k_t[1] not in ans:
+            ans[k_t[1]] = {'tasks': {}}
+        if len(k_t) == 4:
+            ans[k_t[1]]['tasks'][k_t[-1]] = v
+        elif len(k_t) == 3:
+            ans[k_t[1]][k_t[-1]] = v
+    return ans
+
+
+def bench(name, func, repeat):
+    start = time.time()
+    for _ in range(repeat):
+        func()
+    elapsed = (time.time() - start) / repeat
+    print("{0:<28} {1:>9.3f} ms/response".format(name, elapsed * 1000))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tubes", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    row = []
+    for i in range(args.tubes):
+        prefix = "space0.tube{0}.".format(i)
+        for status in STATUSES:
+            row += [prefix + "tasks." + status, str(i)]
+        for counter in COUNTERS:
+            row += [prefix + counter, str(i * 10)]
+    some = set("tube{0}".format(i) for i in range(0, args.tubes, 10))
+
+    old = bench("regexp", lambda: parse_statistics_regexp(0, row),
+                args.repeat)
+    new = bench("precompiled", lambda: parse_statistics(0, row),
+                args.repeat)
+    bench("precompiled, 10% of tubes",
+          lambda: parse_statistics(0, row, some), args.repeat)
+    print("speedup: {0:.1f}x".format(old / new))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compare schema-compiled `StructCodec` with msgpack
+`Queue.basic_serialize`/`basic_deserialize` on small fixed records.
+Doesn't need running tarantool.
+
+    $ python benchmarks/bench_struct_codec.py --count 200000
+"""
+import time
+import argparse
+
+from tarantool_queue import Queue
+from tarantool_queue.codec import StructCodec
+
+
+def bench(name, func, items):
+    start = time.time()
+    for item in items:
+        func(item)
+    elapsed = time.time() - start
+    print("{0:<24} {1:>8.3f} s {2:>12.0f} ops/s".format(
+        name, elapsed, len(items) / elapsed))
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200000)
+    args = parser.parse_args()
+
+    schema = StructCodec([("id", "uint64"), ("user", "uint32"),
+                          ("kind", "uint8"), ("score", "double"),
+                          ("name", "str")])
+    records = [{"id": i, "user": i % 1000, "kind": i % 7,
+                "score": i / 3.0, "name": u"event-%d" % i}
+               for i in range(args.count)]
+
+    packed = [Queue.basic_serialize(record) for record in records]
+    structs = [schema.serialize(record) for record in records]
+    print("size: msgpack {0:.1f} B, struct {1:.1f} B".format(
+        sum(map(len, packed)) / float(len(packed)),
+        sum(map(len, structs)) / float(len(structs))))
+
+    encode = bench("msgpack serialize", Queue.basic_serialize, records)
+    encode_struct = bench("struct serialize", schema.serialize, records)
+    decode = bench("msgpack deserialize", Queue.basic_deserialize, packed)
+    decode_struct = bench("struct deserialize", schema.deserialize, structs)
+    print("speedup: serialize {0:.1f}x, deserialize {1:.1f}x".format(
+        encode / encode_struct, decode / decode_struct))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Memory held by prefetched tasks: `__slots__` Task against Task of
+0.1.4, which kept its attributes in `__dict__`. Doesn't need running
+tarantool.
+
+    $ python benchmarks/bench_task_memory.py --count 1000000
+"""
+import gc
+import time
+import argparse
+import tracemalloc
+
+import msgpack
+
+from tarantool_queue import Queue
+from tarantool_queue.iproto import Response
+from tarantool_queue.tarantool_queue import Task
+
+
+class DictTask(object):
+    """
+    Task of 0.1.4 (without methods calling the queue and `__del__`).
+    """
+    def __init__(self, queue, space=0, task_id=0,
+                 tube="", status="", raw_data=None):
+        self.task_id = task_id
+        self.tube = tube
+        self.status = status
+        self.raw_data = raw_data
+        self.space = space
+        self.queue = queue
+        self.modified = False
+
+    @property
+    def data(self):
+        if not self.raw_data:
+            return None
+        if not hasattr(self, '_decoded_data'):
+            data = self.queue.tube(self.tube).deserialize(self.raw_data)
+            self._decoded_data = data
+        return self._decoded_data
+
+    @classmethod
+    def from_tuple(cls, queue, the_tuple):
+        if the_tuple is None:
+            return
+        if the_tuple.rowcount < 1:
+            raise Queue.ZeroTupleException('error creating task')
+        row = the_tuple[0]
+        return cls(
+            queue,
+            space=queue.space,
+            task_id=row[0],
+            tube=row[1],
+            status=row[2],
+            raw_data=row[3],
+        )
+
+
+def bench(name, cls, queue, responses):
+    gc.collect()
+    tracemalloc.start()
+    start = time.time()
+    tasks = [cls.from_tuple(queue, response) for response in responses]
+    created = time.time() - start
+    size = tracemalloc.get_traced_memory()[0]
+    start = time.time()
+    for task in tasks:
+        task.data
+    decoded = time.time() - start
+    tracemalloc.stop()
+    print("{0:<10} {1:>8.1f} MB {2:>6.0f} B/task "
+          "create {3:>6.2f} s decode {4:>6.2f} s".format(
+              name, size / 2.0 ** 20, size / float(len(tasks)),
+              created, decoded))
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=1000000)
+    args = parser.parse_args()
+
+    queue = Queue("127.0.0.1", 33013, 0)
+    queue.tube("bench")
+    payload = msgpack.packb({"id": 1, "event": "x" * 16})
+    responses = [Response([(str(i).encode(), "bench", "taken", payload)])
+                 for i in range(args.count)]
+
+    dict_size = bench("__dict__", DictTask, queue, responses)
+    slots_size = bench("__slots__", Task, queue, responses)
+    print("saved: {0:.0f}%".format(100.0 * (1 - slots_size /
+                                            float(dict_size))))
+
+
+if __name__ == "__main__":
+    main()
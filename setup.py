@@ -50,7 +50,8 @@ setup(
     platforms=["all"],
     install_requires=[
         'msgpack-python',
-        'tarantool<0.4'
+        'tarantool<0.4',
+        'futures; python_version < "3"'
     ],
     url='http://github.com/tarantool/tarantool-queue-python',
     test_suite='tests.test_queue',
@@ -0,0 +1,574 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio client for tarantool queue (Python 3 only).
+
+All coroutines share one connection: requests are tagged with sync id
+and responses are matched back by it, so any number of requests may be
+in flight at the same time.
+
+    >>> from tarantool_queue.aio import AsyncQueue
+    >>> queue = AsyncQueue("localhost", 33013, 0)
+    >>> tube = queue.tube("holy_grail")
+    >>> await tube.put([1, 2, 3])
+    >>> task = await tube.take(5)
+    >>> await task.ack()
+        True
+    >>> await queue.close()
+"""
+import asyncio
+import itertools
+
+import tarantool
+
+from . import iproto
+from .tarantool_queue import Queue, parse_statistics, unpack_long, _text
+from .tarantool_queue import _MISSING
+
+
+class AsyncConnection(object):
+    """
+    Connection to tarantool with concurrent requests. It is connected
+    lazily on the first call and reconnected after network errors.
+    """
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._waiters = {}
+        self._sync = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def connected(self):
+        return self._writer is not None
+
+    async def connect(self):
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+            try:
+                self._reader, self._writer = await asyncio.open_connection(
+                    self.host, self.port)
+            except OSError as e:
+                raise tarantool.NetworkError(e)
+            self._read_task = asyncio.ensure_future(
+                self._read_loop(self._reader))
+
+    async def call(self, name, args):
+        """
+        Call stored procedure and wait for its response.
+
+        :rtype: `tarantool_queue.iproto.Response` instance
+        """
+        if self._writer is None:
+            await self.connect()
+        sync = next(self._sync) & 0xffffffff
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[sync] = future
+        try:
+            self._writer.write(iproto.pack_call(sync, name, args))
+            await self._writer.drain()
+            return await future
+        except OSError as e:
+            self._abort(tarantool.NetworkError(e))
+            raise tarantool.NetworkError(e)
+        finally:
+            self._waiters.pop(sync, None)
+
+    async def _read_loop(self, reader):
+        try:
+            while True:
+                header = await reader.readexactly(iproto.HEADER_SIZE)
+                _, length, sync = iproto.unpack_header(header)
+                body = await reader.readexactly(length) if length else b""
+                future = self._waiters.get(sync)
+                if future is None or future.done():
+                    continue
+                response = iproto.unpack_response(body)
+                error = response.error()
+                if error is None:
+                    future.set_result(response)
+                else:
+                    # not raised here: traceback of raised exception would
+                    # keep the frame of this coroutine
+                    future.set_exception(error)
+        except Exception as e:
+            # broken stream or response: pending calls can't be matched
+            self._abort(tarantool.NetworkError(e))
+
+    def _abort(self, exc):
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+        waiters, self._waiters = self._waiters, {}
+        for future in waiters.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    async def close(self):
+        writer = self._writer
+        if self._read_task is not None:
+            self._read_task.cancel()
+            self._read_task = None
+        self._abort(tarantool.NetworkError("connection closed"))
+        if writer is not None:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+class AsyncTask(object):
+    """
+    Tarantool queue task wrapper for asyncio. Unlike `Task`, it's not
+    released on garbage collection: ack or release it explicitly.
+
+    .. warning::
+
+        Don't instantiate it with your bare hands
+    """
+    def __init__(self, queue, task_id=0, tube="", status="", raw_data=None):
+        self.task_id = task_id
+        self.tube = tube
+        self.status = status
+        self.raw_data = raw_data
+        self.queue = queue
+        self.modified = False
+        # payload itself, when raw_data is reference to blob store
+        self._payload = raw_data
+        self._data = _MISSING
+
+    async def ack(self):
+        """
+        Confirm completion of a task.
+
+        :rtype: boolean
+        """
+        self.modified = True
+        result = await self.queue._ack(self.task_id)
+        if result:
+            self.queue._blob_delete([self], [result])
+        return result
+
+    async def release(self, **kwargs):
+        """
+        Return a task back to the queue: the task is not executed.
+
+        :param ttl: new time to live
+        :param delay: new delay for task
+        :type ttl: int
+        :type delay: int
+        :rtype: `AsyncTask` instance
+        """
+        self.modified = True
+        return await self.queue._release(self.task_id, **kwargs)
+
+    async def delete(self):
+        """
+        Delete a task from the queue (regardless of task state or status).
+
+        :rtype: boolean
+        """
+        self.modified = True
+        result = await self.queue._delete(self.task_id)
+        if result:
+            self.queue._blob_delete([self], [result])
+        return result
+
+    async def bury(self):
+        """
+        Mark a task as buried.
+
+        :rtype: boolean
+        """
+        self.modified = True
+        return await self.queue._bury(self.task_id)
+
+    async def meta(self):
+        """
+        Return unpacked task metadata.
+        :rtype: dict with metainformation or None
+        """
+        return await self.queue._meta(self.task_id)
+
+    async def touch(self):
+        """
+        Prolong living time for taken task with this id.
+
+        :rtype: boolean
+        """
+        return await self.queue._touch(self.task_id)
+
+    @property
+    def data(self):
+        """
+        Task data deserialized on first access. Payload kept in blob
+        store is read when the task is received.
+        """
+        if not self.raw_data:
+            return None
+        if self._data is _MISSING:
+            deserialize = self.queue._deserializer(self.tube)
+            self._data = deserialize(self._payload)
+        return self._data
+
+    def __str__(self):
+        args = (
+            self.task_id, self.tube, self.status, self.queue.space
+        )
+        return "Task (id: {0}, tube:{1}, status: {2}, space:{3})".format(*args)
+
+    @classmethod
+    def from_tuple(cls, queue, the_tuple):
+        if the_tuple is None:
+            return
+        if the_tuple.rowcount < 1:
+            raise Queue.ZeroTupleException('error creating task')
+        row = the_tuple[0]
+        return cls(
+            queue,
+            task_id=_text(row[0]),
+            tube=_text(row[1]),
+            status=_text(row[2]),
+            raw_data=row[3],
+        )
+
+
+class AsyncTube(object):
+    """
+    Tarantool queue tube wrapper for asyncio, see `Tube`.
+
+    .. warning::
+
+        Don't instantiate it with your bare hands
+    """
+    def __init__(self, queue, name, **kwargs):
+        self.queue = queue
+        self.opt = {
+            'delay': 0,
+            'ttl': 0,
+            'ttr': 0,
+            'pri': 0,
+            'tube': name
+        }
+        self.opt.update(kwargs)
+        self._threshold = self.opt.get("blob_threshold")
+        self._serialize = None
+        self._deserialize = None
+
+    # ----------------
+    @property
+    def serialize(self):
+        """
+        Serialize function: must be Callable or None. Sets None when deleted
+        """
+        if self._serialize is None:
+            return self.queue.serialize
+        return self._serialize
+
+    @serialize.setter
+    def serialize(self, func):
+        if not (hasattr(func, '__call__') or func is None):
+            raise TypeError("func must be Callable "
+                            "or None, but not " + str(type(func)))
+        self._serialize = func
+
+    # ----------------
+    @property
+    def deserialize(self):
+        """
+        Deserialize function: must be Callable or None. Sets None when deleted
+        """
+        if self._deserialize is None:
+            return self.queue.deserialize
+        return self._deserialize
+
+    @deserialize.setter
+    def deserialize(self, func):
+        if not (hasattr(func, '__call__') or func is None):
+            raise TypeError("func must be Callable "
+                            "or None, but not " + str(type(func)))
+        self._deserialize = func
+
+    # ----------------
+    def update_options(self, **kwargs):
+        """
+        Update options for current tube (such as ttl, ttr, pri and delay)
+        """
+        self.opt.update(kwargs)
+        self._threshold = self.opt.get("blob_threshold")
+
+    async def _produce(self, method, data, **kwargs):
+        opt = dict(self.opt, **kwargs)
+        payload = self.serialize(data)
+        raw_data = payload
+        threshold = opt.get("blob_threshold")
+        if threshold is not None and len(payload) >= threshold:
+            raw_data = await asyncio.get_running_loop().run_in_executor(
+                None, self.queue._blob_put, payload)
+        the_tuple = await self.queue.tnt.call(method, (
+            str(self.queue.space),
+            str(opt["tube"]),
+            str(opt["delay"]),
+            str(opt["ttl"]),
+            str(opt["ttr"]),
+            str(opt["pri"]),
+            raw_data)
+        )
+        task = AsyncTask.from_tuple(self.queue, the_tuple)
+        if task is not None and raw_data is not payload:
+            task._payload = payload
+        return task
+
+    async def put(self, data, **kwargs):
+        """
+        Enqueue a task, see :meth:`Tube.put() <tarantool_queue.Tube.put>`.
+
+        :rtype: `AsyncTask` instance
+        """
+        return await self._produce("queue.put", data, **kwargs)
+
+    async def put_unique(self, data, **kwargs):
+        """
+        Same as :meth:`AsyncTube.put() <tarantool_queue.aio.AsyncTube.put>`,
+        but it returns None if task exists
+        """
+        return await self._produce("queue.put_unique", data, **kwargs)
+
+    async def urgent(self, data=None, **kwargs):
+        """
+        Same as :meth:`AsyncTube.put() <tarantool_queue.aio.AsyncTube.put>`,
+        but set highest priority for this task.
+        """
+        kwargs['delay'] = 0
+        return await self._produce("queue.urgent", data, **kwargs)
+
+    async def take(self, timeout=0):
+        """
+        Take a task, see :meth:`Tube.take() <tarantool_queue.Tube.take>`.
+        Other coroutines keep working while it waits.
+
+        :param timeout: timeout to wait.
+        :type timeout: int or None
+        :rtype: `AsyncTask` instance or None
+        """
+        return await self.queue._take(self.opt['tube'], timeout)
+
+    async def statistics(self):
+        """
+        See :meth:`Queue.statistics() <tarantool_queue.Queue.statistics>`
+        for more information.
+        """
+        return await self.queue.statistics(tube=self.opt['tube'])
+
+    async def truncate(self):
+        """
+        Truncate tube
+        """
+        return await self.queue.truncate(tube=self.opt['tube'])
+
+
+class AsyncQueue(object):
+    """
+    Tarantool queue wrapper for asyncio. Mirrors `Queue` API, but every
+    network method is a coroutine.
+    """
+
+    DataBaseError = Queue.DataBaseError
+    NetworkError = Queue.NetworkError
+    BadConfigException = Queue.BadConfigException
+    ZeroTupleException = Queue.ZeroTupleException
+
+    basic_serialize = staticmethod(Queue.basic_serialize)
+    basic_deserialize = staticmethod(Queue.basic_deserialize)
+
+    # blobs are kept the same way as by `Queue`, see `Queue.blob_store`
+    blob_store = Queue.blob_store
+    _tube_of = Queue._tube_of
+    _blob_put = Queue._blob_put
+    _blob_reference = Queue._blob_reference
+    _blob_get = Queue._blob_get
+    _blob_delete = Queue._blob_delete
+    _deserializer = Queue._deserializer
+
+    def __init__(self, host="localhost", port=33013, space=0):
+        if not(host and port):
+            raise AsyncQueue.BadConfigException("host and port params "
+                                                "must be not empty")
+
+        if not isinstance(port, int):
+            raise AsyncQueue.BadConfigException("port must be int")
+
+        if not isinstance(space, int):
+            raise AsyncQueue.BadConfigException("space must be int")
+
+        self.host = host
+        self.port = port
+        self.space = space
+        self.tubes = {}
+        self._serialize = self.basic_serialize
+        self._deserialize = self.basic_deserialize
+        self._tnt = None
+
+    # ----------------
+    @property
+    def serialize(self):
+        """
+        Serialize function: must be Callable. If sets to None, then
+        it will use msgpack for serializing.
+        """
+        return self._serialize
+
+    @serialize.setter
+    def serialize(self, func):
+        if not (hasattr(func, '__call__') or func is None):
+            raise TypeError("func must be Callable "
+                            "or None, but not " + str(type(func)))
+        self._serialize = func if func is not None else self.basic_serialize
+
+    # ----------------
+    @property
+    def deserialize(self):
+        """
+        Deserialize function: must be Callable. If sets to None,
+        then it will use msgpack for deserializing.
+        """
+        return self._deserialize
+
+    @deserialize.setter
+    def deserialize(self, func):
+        if not (hasattr(func, '__call__') or func is None):
+            raise TypeError("func must be Callable "
+                            "or None, but not " + str(type(func)))
+        self._deserialize = (func
+                             if func is not None
+                             else self.basic_deserialize)
+
+    # ----------------
+    @property
+    def tnt(self):
+        if self._tnt is None:
+            self._tnt = AsyncConnection(self.host, self.port)
+        return self._tnt
+
+    async def close(self):
+        if self._tnt is not None:
+            await self._tnt.close()
+
+    async def __aenter__(self):
+        await self.tnt.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _take(self, tube, timeout=0):
+        args = [str(self.space), str(tube)]
+        if timeout is not None:
+            args.append(str(timeout))
+        the_tuple = await self.tnt.call("queue.take", tuple(args))
+        if the_tuple.rowcount == 0:
+            return None
+        return await self._task(the_tuple)
+
+    async def _task(self, the_tuple):
+        # payload kept in blob store is read in executor, not in the loop
+        task = AsyncTask.from_tuple(self, the_tuple)
+        if task is not None and \
+                self._blob_reference(task.tube, task.raw_data) is not None:
+            task._payload = await asyncio.get_running_loop().run_in_executor(
+                None, self._blob_get, task.tube, task.raw_data)
+        return task
+
+    async def _simple(self, method, task_id):
+        the_tuple = await self.tnt.call(method, (str(self.space), task_id))
+        return the_tuple.return_code == 0
+
+    async def _ack(self, task_id):
+        return await self._simple("queue.ack", task_id)
+
+    async def _release(self, task_id, delay=0, ttl=0):
+        the_tuple = await self.tnt.call("queue.release", (
+            str(self.space),
+            task_id,
+            str(delay),
+            str(ttl)
+        ))
+        return await self._task(the_tuple)
+
+    async def _bury(self, task_id):
+        return await self._simple("queue.bury", task_id)
+
+    async def _delete(self, task_id):
+        return await self._simple("queue.delete", task_id)
+
+    async def _touch(self, task_id):
+        return await self._simple("queue.touch", task_id)
+
+    async def _meta(self, task_id):
+        the_tuple = await self.tnt.call("queue.meta",
+                                        (str(self.space), task_id))
+        meta = Queue._meta_from_tuple(the_tuple)
+        if meta is not None:
+            for key in ('task_id', 'tube', 'status'):
+                meta[key] = _text(meta[key])
+        return meta
+
+    async def peek(self, task_id):
+        """
+        Return a task by task id.
+
+        :param task_id: UUID of task in HEX
+        :type task_id: string
+        :rtype: `AsyncTask` instance
+        """
+        the_tuple = await self.tnt.call("queue.peek",
+                                        (str(self.space), task_id))
+        return await self._task(the_tuple)
+
+    async def truncate(self, tube):
+        """
+        Truncate queue tube, return quantity of deleted tasks
+
+        :param tube: Name of tube
+        :type tube: string
+        :rtype: int
+        """
+        deleted = await self.tnt.call("queue.truncate",
+                                      (str(self.space), tube))
+        return unpack_long(deleted[0][0])
+
+    async def statistics(self, tube=None):
+        """
+        Return queue module statistics accumulated since server start.
+        See :meth:`Queue.statistics() <tarantool_queue.Queue.statistics>`.
+
+        :param tube: Name of tube
+        :type tube: string or None
+        :rtype: dict with statistics
+        """
+        args = (str(self.space),)
+        args = args if tube is None else args + (tube,)
+        stat = await self.tnt.call("queue.statistics", args)
+        ans = {}
+        if stat.rowcount > 0:
+            ans = parse_statistics(self.space, stat[0])
+        return ans[tube] if tube else ans
+
+    def tube(self, name, **kwargs):
+        """
+        Create AsyncTube object, if not created before, and set kwargs.
+        If existed, return existed AsyncTube.
+        See :meth:`Queue.tube() <tarantool_queue.Queue.tube>` for params.
+
+        :rtype: `AsyncTube` instance
+        """
+        if name in self.tubes:
+            tube = self.tubes[name]
+            tube.update_options(**kwargs)
+        else:
+            tube = AsyncTube(self, name, **kwargs)
+            self.tubes[name] = tube
+        return tube
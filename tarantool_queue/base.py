@@ -0,0 +1,540 @@
+# -*- coding: utf-8 -*-
+"""
+Connections and infrastructure shared by
+:class:`Queue <tarantool_queue.Queue>` and
+:class:`TQueue <tarantool_queue.TQueue>`.
+"""
+import os
+import weakref
+import functools
+import threading
+
+import tarantool
+
+from .pipeline import call_many
+from .pool import ConnectionPool, LongPollConnections
+from .metrics import CallMetrics
+from . import interceptor
+from . import mux
+from .tracker import TaskTracker
+from .spool import Spool, SEGMENT_SIZE
+
+
+#: Queues reset in child process right after `fork()`.
+_queues = weakref.WeakSet()
+
+
+def _after_fork():
+    for queue in list(_queues):
+        queue._after_fork()
+
+
+#: Without `os.register_at_fork` (Python < 3.7) pid is checked by `tnt`.
+_AT_FORK = hasattr(os, 'register_at_fork')
+if _AT_FORK:
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class QueueBase(object):
+    """
+    Connection handling of a queue: shared connection, pool, long-poll
+    connections, background threads, metrics, interceptors and spool.
+    Subclasses define `host`, `port`, `schema`, `tubes` and `release_many`.
+    """
+    def __init__(self):
+        # process owning connections and threads, see `_check_fork`
+        self._pid = os.getpid()
+        _queues.add(self)
+
+    # ----------------
+    @property
+    def tarantool_connection(self):
+        """
+        Tarantool Connection class: must be class with methods call and
+        __init__. If it sets to None or deleted - it will use the default
+        tarantool.Connection class for connection.
+        """
+        if not hasattr(self, '_conclass'):
+            self._conclass = tarantool.Connection
+        return self._conclass
+
+    @tarantool_connection.setter
+    def tarantool_connection(self, cls):
+        if 'call' not in dir(cls) or '__init__' not in dir(cls):
+            if cls is not None:
+                raise TypeError("Connection class must have"
+                                " connect and call methods or be None")
+        self._conclass = cls if cls is not None else tarantool.Connection
+        if hasattr(self, '_tnt'):
+            self.__dict__.pop('_tnt')
+        if hasattr(self, '_pool'):
+            self._pool.clear()
+
+    @tarantool_connection.deleter
+    def tarantool_connection(self):
+        if hasattr(self, '_conclass'):
+            self.__dict__.pop('_conclass')
+        if hasattr(self, '_tnt'):
+            self.__dict__.pop('_tnt')
+        if hasattr(self, '_pool'):
+            self._pool.clear()
+
+    # ----------------
+    @property
+    def tarantool_lock(self):
+        """
+        Locking class: must be locking instance with methods __enter__
+        and __exit__. If it sets to None or delete - it will use default
+        threading.Lock() instance for locking in the connecting.
+        """
+        if not hasattr(self, '_lockinst'):
+            self._lockinst = threading.Lock()
+            # only default lock is recreated after fork()
+            self._lockdefault = True
+        return self._lockinst
+
+    @tarantool_lock.setter
+    def tarantool_lock(self, lock):
+        if '__enter__' not in dir(lock) or '__exit__' not in dir(lock):
+            if lock is not None:
+                raise TypeError("Lock class must have `__enter__`"
+                                " and `__exit__` methods or be None")
+        del self.tarantool_lock
+        if lock is not None:
+            self._lockinst = lock
+
+    @tarantool_lock.deleter
+    def tarantool_lock(self):
+        if hasattr(self, '_lockinst'):
+            self.__dict__.pop('_lockinst')
+        self.__dict__.pop('_lockdefault', None)
+
+    # ----------------
+    @property
+    def tarantool_pool(self):
+        """
+        Connection pool: must be `ConnectionPool` instance or None. When
+        it's set, every request takes connection from the pool instead of
+        using one shared connection. If it sets to None or deleted - pool
+        is closed and the shared connection is used again.
+        """
+        return self.__dict__.get('_pool')
+
+    @tarantool_pool.setter
+    def tarantool_pool(self, pool):
+        if not (isinstance(pool, ConnectionPool) or pool is None):
+            raise TypeError("pool must be ConnectionPool "
+                            "or None, but not " + str(type(pool)))
+        del self.tarantool_pool
+        if pool is not None:
+            self._pool = pool
+
+    @tarantool_pool.deleter
+    def tarantool_pool(self):
+        if hasattr(self, '_pool'):
+            self.__dict__.pop('_pool').close()
+
+    def create_pool(self, min_size=1, max_size=8, idle_timeout=60.0,
+                    check_interval=30.0, timeout=None, warm_up=True):
+        """
+        Create connection pool for this queue and use it for all requests.
+        Connections are created with `tarantool_connection` class.
+
+        :param min_size: Number of connections kept open
+        :param max_size: Maximum number of connections
+        :param idle_timeout: Seconds after idle connection is closed
+        :param check_interval: Seconds of idleness after connection
+                               is pinged before use
+        :param timeout: Seconds to wait for free connection (None - forever)
+        :param warm_up: Open `min_size` connections right now
+        :type min_size: int
+        :type max_size: int
+        :rtype: `ConnectionPool` instance
+        """
+        pool = ConnectionPool(self._connect, min_size, max_size,
+                              idle_timeout, check_interval, timeout)
+        if warm_up:
+            pool.warm_up()
+        self.tarantool_pool = pool
+        return pool
+
+    # ----------------
+    @property
+    def tarantool_long_poll(self):
+        """
+        Long-poll connections: must be `LongPollConnections` instance or
+        None. When it's set, blocking takes (timeout is not 0) are sent
+        through them, so they don't hold connections used by other
+        requests. If it sets to None or deleted - connections are closed.
+        """
+        return self.__dict__.get('_long_poll')
+
+    @tarantool_long_poll.setter
+    def tarantool_long_poll(self, long_poll):
+        if not (isinstance(long_poll, LongPollConnections) or
+                long_poll is None):
+            raise TypeError("long_poll must be LongPollConnections "
+                            "or None, but not " + str(type(long_poll)))
+        del self.tarantool_long_poll
+        if long_poll is not None:
+            self._long_poll = long_poll
+
+    @tarantool_long_poll.deleter
+    def tarantool_long_poll(self):
+        if hasattr(self, '_long_poll'):
+            self.__dict__.pop('_long_poll').close()
+
+    def create_long_poll(self, per='thread', max_size=8):
+        """
+        Route blocking takes to dedicated long-poll connections.
+
+        :param per: 'thread' - connection per thread,
+                    'tube' - pool of connections per tube
+        :param max_size: Maximum number of connections per tube
+        :type per: string
+        :type max_size: int
+        :rtype: `LongPollConnections` instance
+        """
+        long_poll = LongPollConnections(self._connect, per, max_size)
+        self.tarantool_long_poll = long_poll
+        return long_poll
+
+    # ----------------
+    @property
+    def task_tracker(self):
+        """
+        `TaskTracker` of tasks taken from this queue: tasks garbage
+        collected without ack, release, etc. are released by it
+        in background.
+        """
+        if not hasattr(self, '_tracker'):
+            with self.tarantool_lock:
+                if not hasattr(self, '_tracker'):
+                    self._tracker = TaskTracker(
+                        self._background(self.release_many))
+        return self._tracker
+
+    # ----------------
+    @property
+    def metrics(self):
+        """
+        Call metrics: must be `CallMetrics` instance or None. When it's
+        set, latency, errors and payload sizes of every call are recorded
+        in it. If it sets to None or deleted - calls aren't observed.
+        """
+        return self.__dict__.get('_metrics')
+
+    @metrics.setter
+    def metrics(self, metrics):
+        if not (isinstance(metrics, CallMetrics) or metrics is None):
+            raise TypeError("metrics must be CallMetrics "
+                            "or None, but not " + str(type(metrics)))
+        self.__dict__.pop('_metrics', None)
+        if metrics is not None:
+            self._metrics = metrics
+        self._chain()
+
+    @metrics.deleter
+    def metrics(self):
+        self.__dict__.pop('_metrics', None)
+        self._chain()
+
+    def create_metrics(self, buckets=None):
+        """
+        Record metrics of all calls made by this queue.
+
+        :param buckets: Upper bounds of latency buckets in seconds
+                        (`metrics.DEFAULT_BUCKETS` if None)
+        :rtype: `CallMetrics` instance
+        """
+        metrics = CallMetrics() if buckets is None else CallMetrics(buckets)
+        self.metrics = metrics
+        return metrics
+
+    # ----------------
+    @property
+    def interceptors(self):
+        """
+        Tuple of interceptors every call goes through, the first one is
+        the outermost. See :class:`Interceptor
+        <tarantool_queue.interceptor.Interceptor>`.
+        """
+        return tuple(self.__dict__.get('_interceptors', ()))
+
+    def add_interceptor(self, obj, index=None):
+        """
+        Add interceptor to the chain.
+
+        :param obj: Object with `call` and `call_many` methods
+        :param index: Position in the chain (the end if None)
+        :type index: int
+        """
+        if not interceptor.is_interceptor(obj):
+            raise TypeError("interceptor must have call and call_many "
+                            "methods, but not " + str(type(obj)))
+        interceptors = list(self.interceptors)
+        if index is None:
+            interceptors.append(obj)
+        else:
+            interceptors.insert(index, obj)
+        self._interceptors = interceptors
+        self._chain()
+
+    def remove_interceptor(self, obj):
+        """
+        Remove interceptor from the chain.
+        """
+        interceptors = list(self.interceptors)
+        interceptors.remove(obj)
+        self._interceptors = interceptors
+        self._chain()
+
+    def _chain(self):
+        # compose interceptors and metrics (the innermost) once, so
+        # calls without them take the fast path in `_call`
+        chain = list(self.__dict__.get('_interceptors', ()))
+        if '_metrics' in self.__dict__:
+            chain.append(self._metrics)
+        self._invoke, self._invoke_many = interceptor.chain(chain)
+
+    # ----------------
+    @property
+    def spool(self):
+        """
+        Local spool of puts: must be `Spool` instance or None. When it's
+        set, puts failed with `NetworkError` are spooled and replayed in
+        background once the server is reachable (see :class:`Spool
+        <tarantool_queue.spool.Spool>`). If it sets to None or deleted -
+        spool is closed, spooled puts are kept on disk.
+        """
+        return self.__dict__.get('_spool')
+
+    @spool.setter
+    def spool(self, spool):
+        if not (isinstance(spool, Spool) or spool is None):
+            raise TypeError("spool must be Spool "
+                            "or None, but not " + str(type(spool)))
+        del self.spool
+        if spool is not None:
+            self._spool = spool
+
+    @spool.deleter
+    def spool(self):
+        if hasattr(self, '_spool'):
+            self.__dict__.pop('_spool').close()
+
+    def create_spool(self, path, segment_size=SEGMENT_SIZE, batch_size=512,
+                     interval=0.5, sync=False, max_bytes=None,
+                     on_full='raise'):
+        """
+        Spool puts of this queue to local directory while the server is
+        unreachable.
+
+        :param path: Directory of spool segment files
+        :param segment_size: Size of segment file in bytes
+        :param batch_size: Maximum number of puts replayed in one round
+                           trip
+        :param interval: Seconds between replay attempts
+        :param sync: Flush every spooled put to disk
+        :param max_bytes: Maximum size of segment files (None - unlimited)
+        :param on_full: Policy for puts which don't fit in: 'raise' or
+                        'drop' (see :class:`Spool
+                        <tarantool_queue.spool.Spool>`)
+        :rtype: started `Spool` instance
+        """
+        spool = Spool(self, path, segment_size, batch_size, interval, sync,
+                      max_bytes, on_full)
+        self.spool = spool
+        return spool.start()
+
+    @property
+    def _producers(self):
+        # started producers of tubes, reset in child process after fork()
+        if '_producerset' not in self.__dict__:
+            self._producerset = weakref.WeakSet()
+        return self._producerset
+
+    # ----------------
+    def _tube_of(self, name):
+        # existing tube object by name from tuple (bytes on python 3)
+        if not isinstance(name, str) and isinstance(name, bytes):
+            name = name.decode('utf-8')
+        return self.tubes.get(name)
+
+    def _connect(self):
+        return self.tarantool_connection(self.host, self.port,
+                                         schema=self.schema)
+
+    def _check_fork(self):
+        """
+        Reset the queue, if it's used in a child process first time.
+        It's needed only without `os.register_at_fork`, which runs
+        `_after_fork` in the child itself.
+        """
+        if _AT_FORK:
+            return
+        pid = os.getpid()
+        if self.__dict__.setdefault('_pid', pid) != pid:
+            self._after_fork()
+
+    def _after_fork(self):
+        """
+        Drop connections inherited from the parent process after `fork()`,
+        so the child opens its own ones instead of sharing sockets.
+        Background threads aren't inherited, so their state is reset and
+        they are started again in the child. Spool files are written by
+        the parent, so the child has no spool.
+        """
+        self._pid = os.getpid()
+        self.__dict__.pop('_tnt', None)
+        if self.__dict__.pop('_lockdefault', False):
+            self.__dict__.pop('_lockinst', None)
+        self.__dict__.pop('_local', None)
+        if hasattr(self, '_pool'):
+            self._pool.reset()
+        if hasattr(self, '_long_poll'):
+            self._long_poll.reset()
+        if hasattr(self, '_tracker'):
+            self._tracker.reset()
+        if hasattr(self, '_lease_keeper'):
+            self._lease_keeper.reset()
+        if hasattr(self, '_spool'):
+            self.__dict__.pop('_spool').reset()
+        for producer in list(self._producers):
+            producer.reset()
+
+    def _background(self, func):
+        """
+        Wrap func run by background thread (task tracker, lease keeper):
+        its requests go through separate connection of that thread, so
+        the shared connection is never used by two threads at once.
+        """
+        def wrapper(*args, **kwargs):
+            if '_local' not in self.__dict__:
+                with self.tarantool_lock:
+                    if '_local' not in self.__dict__:
+                        self._local = threading.local()
+            self._local.background = True
+            return func(*args, **kwargs)
+        return wrapper
+
+    @property
+    def tnt(self):
+        if not _AT_FORK:
+            self._check_fork()
+        attrs = self.__dict__
+        pool = attrs.get('_pool')
+        if pool is not None:
+            return pool
+        local = attrs.get('_local')
+        if local is not None and getattr(local, 'background', False):
+            if getattr(local, 'tnt', None) is None:
+                local.tnt = self._connect()
+            return local.tnt
+        tnt = attrs.get('_tnt')
+        if tnt is None:
+            with self.tarantool_lock:
+                if not hasattr(self, '_tnt'):
+                    self._tnt = self._connect()
+            tnt = self._tnt
+        return tnt
+
+    def _call(self, method, args, call=None):
+        """
+        Call stored procedure through interceptors. Every single call of
+        the queue goes through here, with `call` of long-poll connection
+        for blocking takes and `tnt.call` otherwise.
+        """
+        if call is None:
+            call = self.tnt.call
+        invoke = self.__dict__.get('_invoke')
+        if invoke is None:
+            return call(method, args)
+        return invoke(call, method, args)
+
+    def _call_async(self, method, args):
+        """
+        Call stored procedure without waiting for response, through
+        interceptors. Connections with `submit` (see
+        :class:`MultiplexedConnection
+        <tarantool_queue.mux.MultiplexedConnection>`) send the call and
+        return at once, with others the call is blocking.
+
+        :rtype: `concurrent.futures.Future` of response
+        """
+        tnt = self.tnt
+        submit = getattr(tnt, 'submit', None)
+        if submit is None:
+            submit = mux.call_now(tnt.call)
+        return self._call(method, args, submit)
+
+    def _call_many(self, calls):
+        """
+        Run list of (procedure name, args) calls in as few round trips
+        as possible. See :func:`tarantool_queue.pipeline.call_many`.
+        """
+        invoke_many = self.__dict__.get('_invoke_many')
+        try:
+            if invoke_many is None:
+                return call_many(self.tnt, calls)
+            return invoke_many(functools.partial(call_many, self.tnt),
+                               calls)
+        except tarantool.NetworkError:
+            # pipelined batch closes broken connection
+            self._drop_connection()
+            raise
+
+    def _put(self, method, args):
+        """
+        Call put procedure, or append it to spool (if it's set), when the
+        server is unreachable or spooled puts aren't replayed yet.
+        Returns None for spooled put.
+        """
+        spool = self.__dict__.get('_spool')
+        if spool is None:
+            return self._call(method, args)
+        if len(spool):
+            spool.append(method, args)
+            return None
+        try:
+            return self._call(method, args)
+        except tarantool.NetworkError:
+            self._drop_connection()
+            spool.append(method, args)
+            return None
+
+    def _put_many(self, calls):
+        """
+        Same as `_put` for list of (procedure name, args) puts, spooled
+        puts have None result. When the batch breaks partway, only puts
+        without response are spooled.
+        """
+        spool = self.__dict__.get('_spool')
+        if spool is None:
+            return self._call_many(calls)
+        if len(spool):
+            spool.extend(calls)
+            return [None] * len(calls)
+        try:
+            return self._call_many(calls)
+        except tarantool.NetworkError as e:
+            # connection is dropped by `_call_many`
+            results = getattr(e, 'results', None)
+            if results is None or len(results) != len(calls):
+                results = [None] * len(calls)
+        spool.extend([call for call, result in zip(calls, results)
+                      if result is None])
+        return results
+
+    def _drop_connection(self):
+        """
+        Forget connection of current thread after network error, so the
+        next call opens new one (pool drops broken connections itself).
+        """
+        if hasattr(self, '_pool'):
+            return
+        local = self.__dict__.get('_local')
+        if local is not None and getattr(local, 'background', False):
+            local.tnt = None
+        else:
+            self.__dict__.pop('_tnt', None)
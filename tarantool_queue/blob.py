@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Stores of large task payloads kept outside of tarantool.
+"""
+import os
+import re
+import mmap
+import uuid
+import errno
+import hashlib
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+class DirectoryBlobStore(object):
+    """
+    Content-addressed blob store in local (or shared) directory.
+
+    Blob is kept once in `objects/` under its sha1, every reference to
+    it is a hard link in `refs/`, so the number of links counts the
+    references. Blob is removed when its last reference is deleted.
+    References are read through `mmap`, nothing is copied until used.
+
+    Any object with the same `put`, `get` and `delete` methods may be
+    used as blob store of :class:`Queue <tarantool_queue.Queue>`.
+
+    :param path: Directory of the store (created if missing)
+    """
+    _reference = re.compile(r"^[0-9a-f]{40}\.[0-9a-f]{32}$")
+
+    def __init__(self, path):
+        self.path = path
+        _makedirs(os.path.join(path, 'objects'))
+        _makedirs(os.path.join(path, 'refs'))
+
+    def _path(self, kind, name):
+        return os.path.join(self.path, kind, name[:2], name)
+
+    def _check(self, reference):
+        if not self._reference.match(reference):
+            raise ValueError("bad blob reference %r" % (reference,))
+
+    def _write(self, obj, data):
+        _makedirs(os.path.dirname(obj))
+        tmp = "%s.%s.tmp" % (obj, uuid.uuid4().hex)
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.rename(tmp, obj)
+
+    def put(self, data):
+        """
+        Store data.
+
+        :rtype: string (reference)
+        """
+        key = hashlib.sha1(data).hexdigest()
+        reference = "%s.%s" % (key, uuid.uuid4().hex)
+        obj, ref = self._path('objects', key), self._path('refs', reference)
+        _makedirs(os.path.dirname(ref))
+        while True:
+            try:
+                os.link(obj, ref)
+                return reference
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+            self._write(obj, data)
+
+    def get(self, reference):
+        """
+        Map blob into memory.
+
+        :rtype: read-only `mmap` (empty bytes for empty blob)
+        """
+        self._check(reference)
+        with open(self._path('refs', reference), 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def delete(self, reference):
+        """
+        Delete reference, and the blob if it was the last one.
+
+        :rtype: boolean (False if there was no such reference)
+        """
+        self._check(reference)
+        try:
+            os.unlink(self._path('refs', reference))
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return False
+        obj = self._path('objects', reference.split('.')[0])
+        try:
+            if os.stat(obj).st_nlink == 1:
+                os.unlink(obj)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        return True
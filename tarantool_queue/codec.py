@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Registry of codecs and compressions for task data.
+
+Payload written by :class:`Codec` starts with a two byte envelope:
+marker byte 0xc1 (it's never used by msgpack, so plain msgpack payloads
+are told apart) and header byte with compression id in the high four
+bits and codec id in the low four bits. :func:`decode` reads envelope
+and picks the decoder, so producers may change codec of a live tube
+while consumers keep working.
+"""
+import bz2
+import json
+import zlib
+import struct
+import operator
+
+import msgpack
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+try:
+    _view = buffer
+except NameError:
+    def _view(data, offset):
+        return memoryview(data)[offset:]
+
+MARKER = 0xc1
+#: codec id of payload with reference to blob store instead of data
+REFERENCE = 7
+REFERENCE_PREFIX = bytes(bytearray([MARKER, REFERENCE]))
+
+#: codec id -> (name, encode, decode)
+codecs = {}
+#: compression id -> (name, compress, decompress)
+compressions = {}
+
+
+def _lookup(registry, name, kind):
+    for key, entry in registry.items():
+        if entry[0] == name:
+            return key
+    raise ValueError("unknown %s %r" % (kind, name))
+
+
+def register_codec(codec_id, name, encode, decode):
+    """
+    Register codec. Ids 0-15 are allowed, 0-7 are reserved for codecs
+    of this module.
+
+    :param encode: Callable, object -> bytes
+    :param decode: Callable, bytes -> object
+    """
+    if not 0 <= codec_id <= 15:
+        raise ValueError("codec_id must be between 0 and 15")
+    if codec_id == REFERENCE:
+        raise ValueError("codec_id %d is reserved for blob references"
+                         % REFERENCE)
+    codecs[codec_id] = (name, encode, decode)
+
+
+def register_compression(compression_id, name, compress, decompress):
+    """
+    Register compression. Ids 1-15 are allowed, 1-7 are reserved for
+    compressions of this module (0 means no compression).
+
+    :param compress: Callable, (bytes, level) -> bytes
+    :param decompress: Callable, bytes -> bytes
+    """
+    if not 1 <= compression_id <= 15:
+        raise ValueError("compression_id must be between 1 and 15")
+    compressions[compression_id] = (name, compress, decompress)
+
+
+def _json_encode(data):
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def _json_decode(data):
+    return json.loads(bytes(data).decode("utf-8"))
+
+
+register_codec(0, "msgpack", msgpack.packb, msgpack.unpackb)
+register_codec(1, "json", _json_encode, _json_decode)
+register_compression(1, "zlib",
+                     lambda data, level: zlib.compress(data, level or 6),
+                     zlib.decompress)
+register_compression(2, "bz2",
+                     lambda data, level: bz2.compress(data, level or 9),
+                     bz2.decompress)
+if lzma is not None:
+    register_compression(3, "lzma",
+                         lambda data, level: lzma.compress(data,
+                                                           preset=level),
+                         lzma.decompress)
+
+
+class Codec(object):
+    """
+    Serialize function writing enveloped payloads. Set it as serialize
+    function of Queue or Tube, deserialization is done automatically by
+    :meth:`Queue.basic_deserialize`:
+
+        >>> tube.serialize = Codec('json', compression='zlib')
+
+    :param codec: name of registered codec
+    :param compression: name of registered compression or None
+    :param threshold: payloads shorter than threshold bytes aren't
+                      compressed
+    :param level: compression level (default of compression if None)
+    """
+    def __init__(self, codec='msgpack', compression=None, threshold=1024,
+                 level=None):
+        self.codec_id = _lookup(codecs, codec, 'codec')
+        self.compression_id = 0
+        if compression is not None:
+            self.compression_id = _lookup(compressions, compression,
+                                          'compression')
+        self.threshold = threshold
+        self.level = level
+        self._encode = codecs[self.codec_id][1]
+        self._plain = bytes(bytearray([MARKER, self.codec_id]))
+        self._compressed = bytes(bytearray(
+            [MARKER, self.compression_id << 4 | self.codec_id]))
+
+    def __call__(self, data):
+        payload = self._encode(data)
+        if self.compression_id and len(payload) >= self.threshold:
+            compress = compressions[self.compression_id][1]
+            compressed = compress(payload, self.level)
+            if len(compressed) < len(payload):
+                return self._compressed + compressed
+        return self._plain + payload
+
+    def __repr__(self):
+        compression = None
+        if self.compression_id:
+            compression = compressions[self.compression_id][0]
+        return "Codec({0!r}, compression={1!r}, threshold={2})".format(
+            codecs[self.codec_id][0], compression, self.threshold)
+
+
+def is_enveloped(payload):
+    return bool(payload) and bytearray(payload[:1])[0] == MARKER
+
+
+def pack_reference(reference):
+    """
+    Envelope reference to blob store.
+    """
+    return REFERENCE_PREFIX + reference.encode("ascii")
+
+
+def unpack_reference(payload):
+    """
+    :rtype: string (reference to blob store) or None if payload
+            isn't a reference
+    """
+    if not payload or payload[:2] != REFERENCE_PREFIX:
+        return None
+    return bytes(payload[2:]).decode("ascii")
+
+
+def decode(payload):
+    """
+    Decode payload written by :class:`Codec` or plain msgpack.
+    """
+    if not is_enveloped(payload):
+        return msgpack.unpackb(payload)
+    header = bytearray(payload[1:2])[0]
+    if header == REFERENCE:
+        raise ValueError("payload is a reference to blob store, "
+                         "it must be resolved before decoding")
+    codec_id, compression_id = header & 0x0f, header >> 4
+    if codec_id not in codecs:
+        raise ValueError("unknown codec id %d" % codec_id)
+    body = _view(payload, 2)
+    if compression_id:
+        if compression_id not in compressions:
+            raise ValueError("unknown compression id %d" % compression_id)
+        body = compressions[compression_id][2](body)
+    return codecs[codec_id][2](body)
+
+
+class StructCodec(object):
+    """
+    Serializer of records with fixed fields, compiled from schema into
+    one `struct.Struct`. Fixed size fields are packed in place, `str`
+    and `bytes` fields are stored as uint32 length in the fixed part and
+    appended after it. Records are dicts, they are deserialized to dicts.
+    `serialize` and `deserialize` are generated for the schema once, so
+    they don't loop over fields.
+
+        >>> event = StructCodec([('id', 'uint64'), ('kind', 'uint8'),
+        ...                      ('score', 'double'), ('name', 'str')])
+        >>> tube.serialize = event.serialize
+        >>> tube.deserialize = event.deserialize
+
+    It may be registered with :func:`register_codec` to be used in
+    envelope by :class:`Codec` as well.
+
+    :param fields: list of (name, type), type is one of `TYPES`
+    """
+    TYPES = {
+        'int8': 'b', 'uint8': 'B', 'int16': 'h', 'uint16': 'H',
+        'int32': 'i', 'uint32': 'I', 'int64': 'q', 'uint64': 'Q',
+        'float': 'f', 'double': 'd', 'bool': '?',
+        'str': 'I', 'bytes': 'I',
+    }
+
+    def __init__(self, fields):
+        if not fields:
+            raise ValueError("fields must be not empty")
+        for name, kind in fields:
+            if kind not in self.TYPES:
+                raise ValueError("unknown type %r of field %r, must be "
+                                 "one of %s" % (kind, name,
+                                                sorted(self.TYPES)))
+        self.fields = list(fields)
+        self.names = tuple([name for name, _ in fields])
+        self.struct = struct.Struct(
+            "<" + "".join([self.TYPES[kind] for _, kind in fields]))
+        namespace = {'pack': self.struct.pack,
+                     'unpack_from': self.struct.unpack_from,
+                     'size': self.struct.size, 'bytes': bytes}
+        exec(self._source(), namespace)
+        self.serialize = namespace['serialize']
+        self.serialize.__doc__ = "Pack record (dict with all fields)."
+        self.deserialize = namespace['deserialize']
+        self.deserialize.__doc__ = "Unpack record into dict."
+
+    def _source(self):
+        encode, packed, tail, decode, record = [], [], [], [], []
+        for index, (name, kind) in enumerate(self.fields):
+            field = "f%d" % index
+            value = "data[%r]" % (name,)
+            record.append("%r: %s" % (name, field))
+            if kind not in ('str', 'bytes'):
+                packed.append(value)
+                continue
+            text = kind == 'str'
+            encode.append("    %s = %s%s" % (
+                field, value, ".encode('utf-8')" if text else ""))
+            packed.append("len(%s)" % field)
+            tail.append(field)
+            decode.append("    end = offset + %s" % field)
+            decode.append("    %s = bytes(payload[offset:end])%s" % (
+                field, ".decode('utf-8')" if text else ""))
+            decode.append("    offset = end")
+        fixed = "pack(%s)" % ", ".join(packed)
+        lines = ["def serialize(data):"] + encode
+        if tail:
+            lines.append("    return b''.join((%s, %s))" % (
+                fixed, ", ".join(tail)))
+        else:
+            lines.append("    return " + fixed)
+        lines.append("def deserialize(payload):")
+        lines.append("    %s, = unpack_from(payload, 0)" % ", ".join(
+            ["f%d" % index for index in range(len(self.fields))]))
+        if decode:
+            lines.append("    offset = size")
+        lines.extend(decode)
+        lines.append("    return {%s}" % ", ".join(record))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Interceptors run around every call of
+:class:`Queue <tarantool_queue.Queue>` and
+:class:`TQueue <tarantool_queue.TQueue>`.
+"""
+
+
+class Interceptor(object):
+    """
+    Base interceptor, passes calls through unchanged. Subclasses override
+    `call` for single calls and `call_many` for pipelined batches; they
+    may inspect or change method and args, measure, retry, raise instead
+    of calling, or change result.
+
+        >>> class SlowCalls(Interceptor):
+        ...     def call(self, call, method, args):
+        ...         start = time.time()
+        ...         try:
+        ...             return call(method, args)
+        ...         finally:
+        ...             if time.time() - start > 0.1:
+        ...                 print("slow %s" % method)
+        >>> queue.add_interceptor(SlowCalls())
+
+    `CallMetrics <tarantool_queue.metrics.CallMetrics>` is an interceptor
+    as well.
+    """
+    def call(self, call, method, args):
+        """
+        Intercept single call.
+
+        :param call: Next callable of the chain, `call(method, args)`
+        :param method: Stored procedure name
+        :param args: Tuple of args
+
+        For asynchronous calls (`put_async`, `ack_async`) `call` returns
+        `concurrent.futures.Future` of the response.
+        """
+        return call(method, args)
+
+    def call_many(self, call_many, calls):
+        """
+        Intercept pipelined batch of calls.
+
+        :param call_many: Next callable of the chain, `call_many(calls)`
+        :param calls: list of (procedure name, tuple of args)
+        :rtype: list of responses or exception instances
+        """
+        return call_many(calls)
+
+
+def is_interceptor(obj):
+    return all(hasattr(getattr(obj, method, None), '__call__')
+               for method in ('call', 'call_many'))
+
+
+def _link(intercept, inner):
+    def invoke(call, method, args):
+        return intercept(lambda method, args: inner(call, method, args),
+                         method, args)
+    return invoke
+
+
+def _link_many(intercept, inner):
+    def invoke(call_many, calls):
+        return intercept(lambda calls: inner(call_many, calls), calls)
+    return invoke
+
+
+def chain(interceptors):
+    """
+    Compose interceptors once, so calls don't loop over them. The first
+    interceptor is the outermost one.
+
+    :rtype: tuple of `invoke(call, method, args)` and
+            `invoke_many(call_many, calls)`, or (None, None) for empty
+            list of interceptors
+    """
+    invoke = invoke_many = None
+    for interceptor in reversed(interceptors):
+        if invoke is None:
+            invoke, invoke_many = interceptor.call, interceptor.call_many
+        else:
+            invoke = _link(interceptor.call, invoke)
+            invoke_many = _link_many(interceptor.call_many, invoke_many)
+    return invoke, invoke_many
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Minimal codec for the Tarantool 1.5 binary protocol (iproto).
+
+Only CALL and PING requests are supported, which is all the queue
+procedures need. It is used wherever the client has to talk to the wire
+directly: pipelined batches, multiplexed connections and test servers.
+"""
+import struct
+
+import tarantool
+
+try:
+    text_type = unicode
+    integer_types = (int, long)
+except NameError:
+    text_type = str
+    integer_types = (int,)
+
+REQUEST_TYPE_CALL = 22
+REQUEST_TYPE_PING = 65280
+
+COMPLETION_OK = 0
+COMPLETION_TRY_AGAIN = 1
+COMPLETION_ERROR = 2
+
+struct_L = struct.Struct("<L")
+struct_Q = struct.Struct("<Q")
+struct_q = struct.Struct("<q")
+struct_LL = struct.Struct("<LL")
+struct_LLL = struct.Struct("<LLL")
+
+HEADER_SIZE = struct_LLL.size
+
+
+def pack_int_base128(value):
+    """
+    Pack unsigned integer as BER (the most significant 7-bit group first).
+    """
+    if value < 0x80:
+        return struct.pack("<B", value)
+    groups = [value & 0x7f]
+    value >>= 7
+    while value:
+        groups.append((value & 0x7f) | 0x80)
+        value >>= 7
+    groups.reverse()
+    return struct.pack("<%dB" % len(groups), *groups)
+
+
+def unpack_int_base128(buff, offset):
+    """
+    Unpack BER integer from buff at offset.
+
+    :rtype: tuple (value, new offset)
+    """
+    value = 0
+    while True:
+        byte = struct.unpack_from("<B", buff, offset)[0]
+        offset += 1
+        value = (value << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            return value, offset
+
+
+def pack_field(value):
+    if isinstance(value, integer_types):
+        if 0 <= value <= 0xffffffff:
+            data = struct_L.pack(value)
+        elif 0 <= value <= 0xffffffffffffffff:
+            data = struct_Q.pack(value)
+        else:
+            data = struct_q.pack(value)
+    elif isinstance(value, text_type):
+        data = value.encode("utf-8")
+    else:
+        data = bytes(value)
+    return pack_int_base128(len(data)) + data
+
+
+def pack_tuple(values):
+    fields = b"".join([pack_field(value) for value in values])
+    return struct_L.pack(len(values)) + fields
+
+
+def unpack_tuple(buff, offset, cardinality):
+    row = []
+    for _ in range(cardinality):
+        length, offset = unpack_int_base128(buff, offset)
+        row.append(bytes(buff[offset:offset + length]))
+        offset += length
+    return tuple(row), offset
+
+
+def pack_call(sync, name, args, flags=1):
+    """
+    Pack CALL request of stored procedure `name` with `args`.
+    """
+    body = struct_L.pack(flags) + pack_field(name) + pack_tuple(args)
+    return struct_LLL.pack(REQUEST_TYPE_CALL, len(body), sync) + body
+
+
+def pack_ping(sync):
+    return struct_LLL.pack(REQUEST_TYPE_PING, 0, sync)
+
+
+def unpack_call(body):
+    """
+    Unpack body of CALL request.
+
+    :rtype: tuple (flags, procedure name, tuple of args)
+    """
+    flags = struct_L.unpack_from(body, 0)[0]
+    length, offset = unpack_int_base128(body, 4)
+    name = bytes(body[offset:offset + length]).decode("utf-8")
+    offset += length
+    cardinality = struct_L.unpack_from(body, offset)[0]
+    args, offset = unpack_tuple(body, offset + 4, cardinality)
+    return flags, name, args
+
+
+def pack_response(sync, rows=(), request_type=REQUEST_TYPE_CALL,
+                  return_code=0, message=None):
+    """
+    Pack response to a request. If message is not None, then it's an error
+    response with `return_code` error code.
+    """
+    if request_type == REQUEST_TYPE_PING:
+        return struct_LLL.pack(request_type, 0, sync)
+    if message is not None:
+        if isinstance(message, text_type):
+            message = message.encode("utf-8")
+        code = (return_code << 8) | COMPLETION_ERROR
+        body = struct_L.pack(code) + message + b"\x00"
+    else:
+        chunks = [struct_LL.pack(0, len(rows))]
+        for row in rows:
+            fields = b"".join([pack_field(value) for value in row])
+            chunks.append(struct_LL.pack(len(fields), len(row)))
+            chunks.append(fields)
+        body = b"".join(chunks)
+    return struct_LLL.pack(request_type, len(body), sync) + body
+
+
+class Response(list):
+    """
+    List of tuples returned by server. Mimics the interface of
+    `tarantool.response.Response` that is used by queue wrappers.
+    """
+    def __init__(self, rows=(), return_code=0, return_message=None,
+                 completion_status=COMPLETION_OK):
+        super(Response, self).__init__(rows)
+        self.return_code = return_code
+        self.return_message = return_message
+        self.completion_status = completion_status
+
+    @property
+    def rowcount(self):
+        return len(self)
+
+    def error(self):
+        """
+        :rtype: `tarantool.DatabaseError` instance for error response
+                or None
+        """
+        if self.completion_status != COMPLETION_OK:
+            return tarantool.DatabaseError(self.return_code,
+                                           self.return_message)
+        return None
+
+    def check(self):
+        """
+        Raise `tarantool.DatabaseError` if it's an error response.
+
+        :rtype: `Response` instance
+        """
+        error = self.error()
+        if error is not None:
+            raise error
+        return self
+
+
+def unpack_header(header):
+    """
+    :rtype: tuple (request type, body length, sync)
+    """
+    return struct_LLL.unpack(header)
+
+
+def unpack_response(body):
+    """
+    Unpack response body (without header) into `Response`.
+    """
+    if not body:
+        return Response()
+    code = struct_L.unpack_from(body, 0)[0]
+    status, return_code = code & 0xff, code >> 8
+    if status != COMPLETION_OK:
+        message = bytes(body[4:]).rstrip(b"\x00").decode("utf-8", "replace")
+        return Response((), return_code, message, status)
+    if len(body) < 8:
+        return Response((), return_code)
+    count = struct_L.unpack_from(body, 4)[0]
+    offset = 8
+    rows = []
+    for _ in range(count):
+        cardinality = struct_LL.unpack_from(body, offset)[1]
+        row, offset = unpack_tuple(body, offset + 8, cardinality)
+        rows.append(row)
+    return Response(rows, return_code)
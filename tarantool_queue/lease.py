@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Background renewal of TTR of taken tasks.
+"""
+import time
+import weakref
+import threading
+
+import tarantool
+
+
+class _Lease(object):
+    __slots__ = ('task', 'ttr', 'renew_at')
+
+    def __init__(self, task, taken_at):
+        self.task = task
+        self.ttr = None
+        self.renew_at = taken_at
+
+
+class LeaseKeeper(object):
+    """
+    Keep taken tasks alive: one background thread touches every tracked
+    task when `margin` part of its TTR has passed since it was taken or
+    touched. TTRs of new tasks and touches of all due tasks are sent in
+    batches (one round trip per tick).
+
+    Task isn't renewed any more when it's acked, released, buried
+    (or otherwise modified), garbage collected or touch fails.
+
+        >>> queue.create_lease_keeper(margin=0.5)
+        >>> task = tube.take()          # renewed until acked
+        >>> task.ack()
+
+    :param queue: `Queue` instance
+    :param margin: Part of TTR after which task is touched
+    :param interval: Seconds between checks of tracked tasks
+    """
+    def __init__(self, queue, margin=0.5, interval=0.1):
+        if not 0 < margin < 1:
+            raise ValueError("margin must be between 0 and 1")
+        self.queue = queue
+        self.margin = margin
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._leases = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._counters = {
+            'tracked': 0,
+            'touched': 0,
+            'failed': 0,
+            'expired': 0,
+        }
+
+    def start(self):
+        """
+        Start background thread.
+
+        :rtype: `LeaseKeeper` instance
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def run(self):
+        """
+        Renew leases in current thread until stopped.
+        """
+        renew = self.queue._background(self.renew)
+        while not self._stop.wait(self.interval):
+            try:
+                renew()
+            except Exception:
+                with self._lock:
+                    self._counters['failed'] += 1
+
+    def stop(self, timeout=None):
+        """
+        Stop background thread and forget all tasks.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        with self._lock:
+            self._leases.clear()
+
+    close = stop
+
+    def reset(self):
+        """
+        Forget all tasks and start background thread again, if it was
+        started. It's used in child process after `fork()`.
+        """
+        self._lock = threading.Lock()
+        self._leases = {}
+        self._stop = threading.Event()
+        if self._thread is not None:
+            self.start()
+
+    def keep(self, task):
+        """
+        Start renewing lease of taken task.
+        """
+        lease = _Lease(weakref.ref(task), time.time())
+        with self._lock:
+            self._leases[id(task)] = lease
+            self._counters['tracked'] += 1
+
+    def forget(self, task):
+        """
+        Stop renewing lease of task.
+        """
+        with self._lock:
+            self._leases.pop(id(task), None)
+
+    def __len__(self):
+        return len(self._leases)
+
+    def _collect(self):
+        # drops finished tasks, returns (leases without TTR, due leases)
+        now = time.time()
+        fresh, due = [], []
+        with self._lock:
+            for key, lease in list(self._leases.items()):
+                task = lease.task()
+                if task is None or task.modified:
+                    del self._leases[key]
+                elif lease.ttr is None:
+                    fresh.append((key, lease, task))
+                elif lease.renew_at <= now:
+                    due.append((key, lease, task))
+        return fresh, due
+
+    def _drop(self, key, lease, counter):
+        with self._lock:
+            if self._leases.get(key) is lease:
+                del self._leases[key]
+            self._counters[counter] += 1
+
+    def renew(self):
+        """
+        Fetch TTR of new tasks and touch tasks due for renewal.
+        """
+        fresh, due = self._collect()
+        if fresh:
+            ttrs = self.queue._ttr_many([task.task_id
+                                         for _, _, task in fresh])
+            for (key, lease, task), ttr in zip(fresh, ttrs):
+                if not ttr:
+                    self._drop(key, lease, 'expired')
+                    continue
+                lease.ttr = ttr
+                lease.renew_at += ttr * self.margin
+                if lease.renew_at <= time.time():
+                    due.append((key, lease, task))
+        if not due:
+            return
+        now = time.time()
+        results = self.queue.touch_many([task for _, _, task in due])
+        for (key, lease, task), result in zip(due, results):
+            if result is True:
+                lease.renew_at = now + lease.ttr * self.margin
+                with self._lock:
+                    self._counters['touched'] += 1
+            elif isinstance(result, tarantool.NetworkError):
+                with self._lock:
+                    self._counters['failed'] += 1
+            else:
+                # task is gone or isn't taken any more
+                self._drop(key, lease, 'expired')
+
+    def stats(self):
+        """
+        Return keeper counters: number of tasks tracked since start and
+        tracked now (active), successful and failed touches, and tasks
+        dropped because they have no TTR or are gone from the queue.
+
+        :rtype: dict
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats['active'] = len(self._leases)
+        return stats
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Latency, error and payload size metrics of stored procedure calls.
+"""
+import time
+import bisect
+import threading
+
+try:
+    _timer = time.perf_counter
+except AttributeError:
+    _timer = time.time
+
+#: Upper bounds (seconds) of latency histogram buckets.
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _size(fields):
+    # bytes of string fields of args tuple or response row
+    size = 0
+    for field in fields:
+        if isinstance(field, (bytes, str)):
+            size += len(field)
+    return size
+
+
+def _response_size(response):
+    size = 0
+    for row in response:
+        size += _size(row)
+    return size
+
+
+class _MethodStats(object):
+    __slots__ = ('buckets', 'count', 'total', 'errors', 'sent', 'received')
+
+    def __init__(self, size):
+        self.buckets = [0] * size
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.sent = 0
+        self.received = 0
+
+
+class CallMetrics(object):
+    """
+    Per procedure metrics of calls made by
+    :class:`Queue <tarantool_queue.Queue>`: latency histogram with fixed
+    buckets, number of errors and bytes of string fields sent in args and
+    received in responses. Every call of pipelined batch is observed with
+    latency of the whole batch.
+
+        >>> metrics = queue.create_metrics()
+        >>> tube.put("data")
+        >>> metrics.snapshot()['queue.put']['count']
+        1
+        >>> print(metrics.to_prometheus())
+
+    :param buckets: Ascending upper bounds of latency buckets in seconds
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        buckets = tuple(buckets)
+        if not buckets or list(buckets) != sorted(set(buckets)):
+            raise ValueError("buckets must be ascending and not empty")
+        self.buckets = buckets
+        self._methods = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method, elapsed, error=False, sent=0, received=0):
+        """
+        Record one call.
+
+        :param elapsed: Seconds the call took
+        :param error: The call failed
+        :param sent: Bytes sent
+        :param received: Bytes received
+        """
+        index = bisect.bisect_left(self.buckets, elapsed)
+        with self._lock:
+            stats = self._methods.get(method)
+            if stats is None:
+                stats = _MethodStats(len(self.buckets) + 1)
+                self._methods[method] = stats
+            stats.buckets[index] += 1
+            stats.count += 1
+            stats.total += elapsed
+            stats.sent += sent
+            stats.received += received
+            if error:
+                stats.errors += 1
+
+    def call(self, call, method, args):
+        """
+        Make call `call(method, args)` and observe it. Asynchronous call
+        (returning future) is observed when the future is done.
+        """
+        start = _timer()
+        try:
+            response = call(method, args)
+        except Exception:
+            self.observe(method, _timer() - start, True, _size(args))
+            raise
+        if hasattr(response, 'add_done_callback'):
+            response.add_done_callback(
+                lambda future: self._observe_future(method, start, args,
+                                                    future))
+            return response
+        self.observe(method, _timer() - start, False, _size(args),
+                     _response_size(response))
+        return response
+
+    def _observe_future(self, method, start, args, future):
+        if future.exception() is not None:
+            self.observe(method, _timer() - start, True, _size(args))
+        else:
+            self.observe(method, _timer() - start, False, _size(args),
+                         _response_size(future.result()))
+
+    def call_many(self, call_many, calls):
+        """
+        Make batch call `call_many(calls)` and observe every call of it.
+        """
+        start = _timer()
+        try:
+            results = call_many(calls)
+        except Exception:
+            elapsed = _timer() - start
+            for method, args in calls:
+                self.observe(method, elapsed, True, _size(args))
+            raise
+        elapsed = _timer() - start
+        for (method, args), result in zip(calls, results):
+            if isinstance(result, Exception):
+                self.observe(method, elapsed, True, _size(args))
+            else:
+                self.observe(method, elapsed, False, _size(args),
+                             _response_size(result))
+        return results
+
+    def reset(self):
+        """
+        Forget all observed calls.
+        """
+        with self._lock:
+            self._methods = {}
+
+    def snapshot(self):
+        """
+        Return metrics of every called procedure: number of calls and
+        errors, total seconds, bytes sent and received and cumulative
+        histogram as list of (upper bound, count), the last bound is
+        `inf`.
+
+        :rtype: dict of procedure name and its metrics
+        """
+        bounds = self.buckets + (float('inf'),)
+        ans = {}
+        with self._lock:
+            for method, stats in self._methods.items():
+                cumulative, total = [], 0
+                for bound, count in zip(bounds, stats.buckets):
+                    total += count
+                    cumulative.append((bound, total))
+                ans[method] = {
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'sum': stats.total,
+                    'sent_bytes': stats.sent,
+                    'received_bytes': stats.received,
+                    'buckets': cumulative,
+                }
+        return ans
+
+    def to_prometheus(self, prefix='tarantool_queue'):
+        """
+        Render metrics in Prometheus text exposition format.
+
+        :rtype: string
+        """
+        snapshot = self.snapshot()
+        duration = prefix + '_call_duration_seconds'
+        errors = prefix + '_call_errors_total'
+        payload = prefix + '_call_payload_bytes_total'
+        lines = ['# HELP %s Latency of stored procedure calls.' % duration,
+                 '# TYPE %s histogram' % duration]
+        for method in sorted(snapshot):
+            stats = snapshot[method]
+            for bound, count in stats['buckets']:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('%s_bucket{method="%s",le="%s"} %d' % (
+                    duration, method, le, count))
+            lines.append('%s_sum{method="%s"} %r' % (
+                duration, method, stats['sum']))
+            lines.append('%s_count{method="%s"} %d' % (
+                duration, method, stats['count']))
+        lines.append('# HELP %s Failed stored procedure calls.' % errors)
+        lines.append('# TYPE %s counter' % errors)
+        for method in sorted(snapshot):
+            lines.append('%s{method="%s"} %d' % (
+                errors, method, snapshot[method]['errors']))
+        lines.append('# HELP %s Bytes of string fields of calls.' % payload)
+        lines.append('# TYPE %s counter' % payload)
+        for method in sorted(snapshot):
+            for direction in ('sent', 'received'):
+                lines.append('%s{method="%s",direction="%s"} %d' % (
+                    payload, method, direction,
+                    snapshot[method][direction + '_bytes']))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Connection multiplexing requests of many threads over one socket.
+"""
+import time
+import socket
+import itertools
+import threading
+from concurrent.futures import Future, TimeoutError
+
+import tarantool
+
+from . import iproto
+
+
+def then(future, func):
+    """
+    Return future of `func(result of future)`, exceptions are passed
+    through. `func` is run by the thread completing `future`: for
+    :class:`MultiplexedConnection` it's the reader thread, so `func`
+    must not block. Blocking call on the same connection from `func`
+    deadlocks, as its response would be read by this very thread.
+    """
+    result = Future()
+    result.set_running_or_notify_cancel()
+
+    def done(future):
+        try:
+            value = func(future.result())
+        except Exception as e:
+            result.set_exception(e)
+        else:
+            result.set_result(value)
+    future.add_done_callback(done)
+    return result
+
+
+def call_now(call):
+    """
+    Wrap blocking `call(name, args)` into `submit(name, args)` returning
+    already completed future, for connections without `submit`.
+    """
+    def submit(name, args):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(call(name, args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return submit
+
+
+class MultiplexedConnection(object):
+    """
+    Connection to tarantool shared by any number of threads with requests
+    in flight at the same time. Requests are tagged with sync id, written
+    by a writer thread (requests queued meanwhile go in one write) and
+    responses are matched back to callers by a reader thread, so a slow
+    request (e.g. blocking take) doesn't hold others.
+
+    It's set as connection class of Queue or TQueue:
+
+        >>> queue.tarantool_connection = MultiplexedConnection
+        >>> future = tube.put_async([1, 2, 3])
+        >>> task = future.result()
+
+    Connection is reopened on the next request after network error, all
+    requests in flight fail with `tarantool.NetworkError`.
+
+    Futures are completed by the reader thread, and so are callbacks
+    added to them (and functions of :func:`then`): a callback must not
+    make blocking calls on this connection, they would deadlock.
+
+    :param timeout: Seconds `call` waits for response (None - forever),
+                    then `concurrent.futures.TimeoutError` is raised and
+                    late response is dropped
+    """
+    def __init__(self, host, port, schema=None, connect_now=True,
+                 timeout=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._cond = threading.Condition(threading.Lock())
+        self._sock = None
+        self._pending = {}
+        self._outbox = []
+        self._sync = itertools.count(1)
+        if connect_now:
+            self.connect()
+
+    def connect(self):
+        with self._cond:
+            self._connect()
+
+    def _connect(self):
+        if self._sock is not None:
+            return
+        try:
+            sock = socket.create_connection((self.host, self.port))
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except socket.error as e:
+            raise tarantool.NetworkError(e)
+        self._sock = sock
+        for target in (self._write_loop, self._read_loop):
+            thread = threading.Thread(target=target, args=(sock,))
+            thread.daemon = True
+            thread.start()
+
+    def _submit(self, packets):
+        # packets: functions packing request with given sync,
+        # returns list of (sync, future)
+        futures = []
+        with self._cond:
+            self._connect()
+            for pack in packets:
+                sync = next(self._sync) & 0xffffffff
+                future = Future()
+                future.set_running_or_notify_cancel()
+                self._pending[sync] = future
+                self._outbox.append(pack(sync))
+                futures.append((sync, future))
+            self._cond.notify()
+        return futures
+
+    def _wait(self, sync, future):
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            # response coming later is skipped by the reader
+            with self._cond:
+                self._pending.pop(sync, None)
+            raise
+
+    def submit(self, name, args):
+        """
+        Send call of stored procedure without waiting for response.
+
+        :rtype: `concurrent.futures.Future` of
+                `tarantool_queue.iproto.Response`
+        """
+        return self._submit([
+            lambda sync: iproto.pack_call(sync, name, args)])[0][1]
+
+    def call(self, name, args):
+        """
+        Call stored procedure and wait for its response.
+
+        :rtype: `tarantool_queue.iproto.Response` instance
+        """
+        sync, future = self._submit([
+            lambda sync: iproto.pack_call(sync, name, args)])[0]
+        return self._wait(sync, future)
+
+    def call_many(self, calls):
+        """
+        Send batch of calls at once and wait for all responses.
+
+        :rtype: list of responses or `tarantool.DatabaseError` instances
+        """
+        futures = self._submit([
+            (lambda sync, name=name, args=args:
+             iproto.pack_call(sync, name, args))
+            for name, args in calls])
+        results = []
+        for i, (sync, future) in enumerate(futures):
+            try:
+                results.append(self._wait(sync, future))
+            except TimeoutError:
+                with self._cond:
+                    for sync, _ in futures[i + 1:]:
+                        self._pending.pop(sync, None)
+                raise
+            except tarantool.NetworkError:
+                raise
+            except tarantool.DatabaseError as e:
+                results.append(e)
+        return results
+
+    def ping(self):
+        start = time.time()
+        self._wait(*self._submit([iproto.pack_ping])[0])
+        return time.time() - start
+
+    @property
+    def in_flight(self):
+        """
+        Number of requests waiting for response.
+        """
+        return len(self._pending)
+
+    def close(self):
+        """
+        Close connection, requests in flight fail with NetworkError.
+        """
+        with self._cond:
+            sock = self._sock
+        if sock is not None:
+            self._abort(sock, tarantool.NetworkError("connection closed"))
+
+    def _abort(self, sock, exc):
+        with self._cond:
+            if self._sock is not sock:
+                return
+            self._sock = None
+            pending, self._pending = self._pending, {}
+            self._outbox = []
+            self._cond.notify_all()
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        sock.close()
+        for future in pending.values():
+            future.set_exception(exc)
+
+    def _write_loop(self, sock):
+        while True:
+            with self._cond:
+                while not self._outbox and self._sock is sock:
+                    self._cond.wait()
+                if self._sock is not sock:
+                    return
+                data, self._outbox = b"".join(self._outbox), []
+            try:
+                sock.sendall(data)
+            except socket.error as e:
+                self._abort(sock, tarantool.NetworkError(e))
+                return
+
+    def _read_loop(self, sock):
+        stream = sock.makefile("rb")
+        future = None
+        try:
+            while True:
+                future = None
+                header = stream.read(iproto.HEADER_SIZE)
+                if len(header) < iproto.HEADER_SIZE:
+                    raise socket.error("Lost connection to server")
+                _, length, sync = iproto.unpack_header(header)
+                body = stream.read(length) if length else b""
+                if len(body) < length:
+                    raise socket.error("Lost connection to server")
+                with self._cond:
+                    future = self._pending.pop(sync, None)
+                if future is None:
+                    continue
+                response = iproto.unpack_response(body)
+                error = response.error()
+                if error is None:
+                    future.set_result(response)
+                else:
+                    future.set_exception(error)
+        except Exception as e:
+            # any error leaves the stream at unknown position
+            error = tarantool.NetworkError(e)
+            if future is not None and not future.done():
+                future.set_exception(error)
+            self._abort(sock, error)
+        finally:
+            stream.close()
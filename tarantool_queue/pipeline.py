@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Batching of stored procedure calls.
+
+A batch of calls is written to the connection socket at once and the
+responses are read afterwards, so the whole batch costs one round trip
+instead of one per call.
+"""
+import socket
+import itertools
+
+import tarantool
+
+from . import iproto
+
+
+# syncs of pipelined requests: unique within the process, so a response
+# left on the socket by another batch (or by the connector) is detected
+_syncs = itertools.count(1)
+
+
+def _recv(sock, size):
+    chunks = []
+    while size > 0:
+        try:
+            chunk = sock.recv(size)
+        except socket.error as e:
+            raise tarantool.NetworkError(e)
+        if not chunk:
+            raise tarantool.NetworkError(
+                socket.error("Lost connection to server during query"))
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def call_sequential(tnt, calls):
+    """
+    Run calls one by one through `tnt.call`.
+    Failed calls are returned as exception instances.
+    """
+    results = []
+    for method, args in calls:
+        try:
+            results.append(tnt.call(method, args))
+        except tarantool.NetworkError as e:
+            e.results = results + [None] * (len(calls) - len(results))
+            raise
+        except tarantool.DatabaseError as e:
+            results.append(e)
+    return results
+
+
+def call_pipelined(sock, calls):
+    """
+    Write all calls into the socket, then read all responses.
+    Failed calls are returned as exception instances. Every request has
+    its own sync, a response with unknown sync raises `NetworkError`.
+
+    `NetworkError` raised after some responses are read has `results`
+    attribute: list of responses read so far, with None for calls
+    without response (the server may have run them or not).
+    """
+    indexes = {}
+    chunks = []
+    for index, (method, args) in enumerate(calls):
+        sync = next(_syncs) & 0xffffffff
+        indexes[sync] = index
+        chunks.append(iproto.pack_call(sync, method, args))
+    try:
+        sock.sendall(b"".join(chunks))
+    except socket.error as e:
+        raise tarantool.NetworkError(e)
+    results = [None] * len(calls)
+    try:
+        for _ in calls:
+            header = _recv(sock, iproto.HEADER_SIZE)
+            _, body_length, sync = iproto.unpack_header(header)
+            body = _recv(sock, body_length) if body_length else b""
+            index = indexes.pop(sync, None)
+            if index is None:
+                raise tarantool.NetworkError(socket.error(
+                    "Unexpected response with sync %d" % sync))
+            response = iproto.unpack_response(body)
+            results[index] = response.error() or response
+    except Exception as e:
+        if not isinstance(e, tarantool.NetworkError):
+            e = tarantool.NetworkError(e)
+        e.results = results
+        raise e
+    return results
+
+
+def call_many(tnt, calls):
+    """
+    Run a batch of stored procedure calls on connection `tnt` in as few
+    round trips as possible. Connections providing `call_many` method are
+    asked directly, `tarantool.Connection` is pipelined through its socket,
+    any other connection class falls back to sequential calls.
+
+    If pipelined batch fails, responses of the rest of it may be left
+    unread on the socket, so the connection is closed and `NetworkError`
+    is raised: the connection must not be used any more.
+
+    :param calls: list of (procedure name, tuple of args)
+    :rtype: list of responses or `Queue.DataBaseError` instances
+            in the order of calls
+    """
+    if not calls:
+        return []
+    if hasattr(tnt, 'call_many'):
+        return tnt.call_many(calls)
+    sock = getattr(tnt, '_socket', None)
+    if sock is None:
+        return call_sequential(tnt, calls)
+    try:
+        return call_pipelined(sock, calls)
+    except Exception as e:
+        try:
+            tnt.close()
+        except Exception:
+            pass
+        if isinstance(e, tarantool.NetworkError):
+            raise
+        raise tarantool.NetworkError(e)
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+Pool of tarantool connections shared by threads.
+"""
+import time
+import weakref
+import threading
+import contextlib
+import collections
+
+import tarantool
+
+from .pipeline import call_many
+
+
+def _close(connection):
+    close = getattr(connection, 'close', None)
+    if close is None:
+        return
+    try:
+        close()
+    except Exception:
+        pass
+
+
+# handoff of waiters woken up by `ConnectionPool.close`
+_CLOSED = (None, None)
+
+
+class _Waiter(object):
+    __slots__ = ('event', 'handoff')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.handoff = None
+
+
+class ConnectionPool(object):
+    """
+    Thread-safe pool of tarantool connections. It quacks like a single
+    connection: `call` and `call_many` take connection from the pool,
+    run request and put connection back.
+
+    Connections idle for more than `idle_timeout` seconds are closed
+    on acquire and release (but no less than `min_size` are kept).
+    Connection idle for more than
+    `check_interval` seconds is pinged before use and replaced if it's
+    dead. Connections broken with network error are dropped.
+
+    :param connect: Callable without params returning new connection
+    :param min_size: Number of connections kept open
+    :param max_size: Maximum number of connections
+    :param idle_timeout: Seconds after idle connection is closed
+    :param check_interval: Seconds of idleness after connection is checked
+    :param timeout: Seconds to wait for free connection (None - forever)
+    """
+
+    class PoolTimeout(Exception):
+        pass
+
+    class PoolClosed(Exception):
+        pass
+
+    def __init__(self, connect, min_size=1, max_size=8, idle_timeout=60.0,
+                 check_interval=30.0, timeout=None):
+        if not hasattr(connect, '__call__'):
+            raise TypeError("connect must be Callable, "
+                            "but not " + str(type(connect)))
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("pool size must be 0 <= min_size <= max_size"
+                             " and max_size > 0")
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._waiters = collections.deque()
+        self._idle = []
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._counters = {
+            'created': 0,
+            'closed': 0,
+            'evicted': 0,
+            'failed_checks': 0,
+            'acquired': 0,
+            'waited': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def warm_up(self):
+        """
+        Open connections up to `min_size`.
+        """
+        with self._lock:
+            count = max(self.min_size - self._size, 0)
+            self._size += count
+        created = []
+        try:
+            for _ in range(count):
+                created.append(self.connect())
+        finally:
+            now = time.time()
+            with self._lock:
+                self._size -= count - len(created)
+                self._counters['created'] += len(created)
+                self._idle.extend((now, conn) for conn in created)
+                while self._waiters and self._idle:
+                    self._in_use += 1
+                    waiter = self._waiters.popleft()
+                    waiter.handoff = self._idle.pop()
+                    waiter.event.set()
+
+    def _evict(self, now):
+        # must be called with lock held; returns connections to close
+        evicted = []
+        while (self._idle and self._size > self.min_size and
+               now - self._idle[0][0] > self.idle_timeout):
+            evicted.append(self._idle.pop(0)[1])
+            self._size -= 1
+        self._counters['evicted'] += len(evicted)
+        self._counters['closed'] += len(evicted)
+        return evicted
+
+    def _check(self, connection):
+        ping = getattr(connection, 'ping', None)
+        if ping is None:
+            return True
+        try:
+            ping()
+        except Exception:
+            return False
+        return True
+
+    def acquire(self, timeout=None):
+        """
+        Take connection from the pool, opening new one if there are no
+        idle connections and the pool isn't full. Otherwise wait for
+        released connection: waiters are served in FIFO order.
+
+        :param timeout: Seconds to wait (pool's `timeout` if None)
+        :rtype: connection
+        """
+        timeout = self.timeout if timeout is None else timeout
+        start = time.time()
+        waiter = handoff = None
+        with self._lock:
+            if self._closed:
+                raise ConnectionPool.PoolClosed("pool is closed")
+            evicted = self._evict(start)
+            if not self._waiters:
+                if self._idle:
+                    handoff = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    handoff = (None, None)
+            if handoff is not None:
+                self._in_use += 1
+            else:
+                waiter = _Waiter()
+                self._waiters.append(waiter)
+        for old in evicted:
+            _close(old)
+        if waiter is not None:
+            if not waiter.event.wait(timeout):
+                with self._lock:
+                    if waiter.handoff is None:
+                        self._waiters.remove(waiter)
+                        raise ConnectionPool.PoolTimeout(
+                            "no free connection in %s seconds" % timeout)
+            handoff = waiter.handoff
+            if handoff is _CLOSED:
+                raise ConnectionPool.PoolClosed("pool is closed")
+        self._account(time.time() - start, waiter is not None)
+        last_used, connection = handoff
+        if (connection is not None and
+                start - last_used > self.check_interval and
+                not self._check(connection)):
+            with self._lock:
+                self._counters['failed_checks'] += 1
+                self._counters['closed'] += 1
+            _close(connection)
+            connection = None
+        if connection is None:
+            try:
+                connection = self.connect()
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                    self._size -= 1
+                    self._hand_slot()
+                raise
+            with self._lock:
+                self._counters['created'] += 1
+        return connection
+
+    def _account(self, wait_time, waited):
+        with self._lock:
+            counters = self._counters
+            counters['acquired'] += 1
+            if waited:
+                counters['waited'] += 1
+            counters['wait_time_total'] += wait_time
+            if wait_time > counters['wait_time_max']:
+                counters['wait_time_max'] = wait_time
+
+    def _hand_slot(self):
+        # must be called with lock held: lets the first waiter open
+        # new connection in place of the closed one
+        if self._waiters and self._size < self.max_size:
+            self._size += 1
+            self._in_use += 1
+            waiter = self._waiters.popleft()
+            waiter.handoff = (None, None)
+            waiter.event.set()
+
+    def release(self, connection, broken=False):
+        """
+        Put connection back to the pool (or hand it to the first waiter).
+        Broken connection and connection of closed pool are closed.
+        """
+        evicted = []
+        now = time.time()
+        with self._lock:
+            self._in_use -= 1
+            broken = broken or self._closed
+            if broken:
+                self._size -= 1
+                self._counters['closed'] += 1
+                self._hand_slot()
+            elif self._waiters:
+                self._in_use += 1
+                waiter = self._waiters.popleft()
+                waiter.handoff = (now, connection)
+                waiter.event.set()
+            else:
+                evicted = self._evict(now)
+                self._idle.append((now, connection))
+        if broken:
+            _close(connection)
+        for old in evicted:
+            _close(old)
+
+    @contextlib.contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager taking connection from the pool for a while.
+        Connection is dropped, if network error is raised.
+        """
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        except tarantool.NetworkError:
+            self.release(connection, broken=True)
+            raise
+        except BaseException:
+            self.release(connection)
+            raise
+        else:
+            self.release(connection)
+
+    def call(self, *args, **kwargs):
+        with self.connection() as connection:
+            return connection.call(*args, **kwargs)
+
+    def call_many(self, calls):
+        with self.connection() as connection:
+            return call_many(connection, calls)
+
+    def clear(self):
+        """
+        Close all idle connections. Connections in use are returned
+        to the pool as usual.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._counters['closed'] += len(idle)
+        for _, connection in idle:
+            _close(connection)
+
+    def close(self):
+        """
+        Close the pool: idle connections are closed at once, connections
+        in use are closed when released. Waiting and later `acquire`
+        raise :class:`ConnectionPool.PoolClosed`.
+        """
+        with self._lock:
+            self._closed = True
+            waiters, self._waiters = self._waiters, collections.deque()
+        for waiter in waiters:
+            waiter.handoff = _CLOSED
+            waiter.event.set()
+        self.clear()
+
+    def reset(self):
+        """
+        Forget all connections without closing them. It's used in child
+        process after `fork()`: sockets are shared with the parent, so
+        they must be neither used nor shut down by the child.
+        """
+        self._lock = threading.Lock()
+        self._waiters = collections.deque()
+        self._idle = []
+        self._size = 0
+        self._in_use = 0
+
+    def stats(self):
+        """
+        Return pool counters: size, idle and in-use connections, number
+        of created, closed, evicted connections and failed health checks,
+        number of acquires, how many of them had to wait for a free
+        connection and total/max seconds spent acquiring.
+
+        :rtype: dict
+        """
+        with self._lock:
+            stats = dict(self._counters)
+            stats.update(size=self._size, idle=len(self._idle),
+                         in_use=self._in_use)
+        return stats
+
+
+class LongPollConnections(object):
+    """
+    Connections dedicated to long blocking requests (`take` with timeout),
+    so short requests never wait behind them.
+
+    With `per='thread'` every thread gets its own connection, with
+    `per='tube'` every tube gets its own `ConnectionPool` of up to
+    `max_size` connections.
+
+    :param connect: Callable without params returning new connection
+    :param per: 'thread' or 'tube'
+    :param max_size: Maximum number of connections per tube
+    """
+    def __init__(self, connect, per='thread', max_size=8):
+        if per not in ('thread', 'tube'):
+            raise ValueError("per must be 'thread' or 'tube', "
+                             "but not " + repr(per))
+        self.connect = connect
+        self.per = per
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        self._pools = {}
+
+    def _thread_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self.connect()
+            self._local.connection = connection
+            with self._lock:
+                self._connections.add(connection)
+        return connection
+
+    def _tube_pool(self, tube):
+        pool = self._pools.get(tube)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(tube)
+                if pool is None:
+                    pool = ConnectionPool(self.connect, min_size=0,
+                                          max_size=self.max_size)
+                    self._pools[tube] = pool
+        return pool
+
+    def call(self, tube, method, args):
+        """
+        Call stored procedure on long-poll connection for tube.
+        """
+        if self.per == 'tube':
+            return self._tube_pool(tube).call(method, args)
+        connection = self._thread_connection()
+        try:
+            return connection.call(method, args)
+        except tarantool.NetworkError:
+            self._local.connection = None
+            _close(connection)
+            raise
+
+    def reset(self):
+        """
+        Forget all connections without closing them, see
+        :meth:`ConnectionPool.reset`.
+        """
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = weakref.WeakSet()
+        self._pools = {}
+
+    def close(self):
+        """
+        Close all long-poll connections.
+        """
+        with self._lock:
+            connections = list(self._connections)
+            self._connections.clear()
+            pools, self._pools = list(self._pools.values()), {}
+        self._local = threading.local()
+        for connection in connections:
+            _close(connection)
+        for pool in pools:
+            pool.close()
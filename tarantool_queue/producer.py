@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Write-behind producer: puts are buffered and sent in batches by a
+background thread.
+"""
+import time
+import threading
+import collections
+from concurrent.futures import Future
+
+
+class BufferedProducer(object):
+    """
+    Buffer puts to tube and send them in pipelined batches from background
+    thread, so `put` returns future at once instead of waiting a round
+    trip. Batch is sent when `batch_size` puts are buffered or the oldest
+    one has waited `linger` seconds, whichever is first.
+
+    Data is serialized by the caller of `put`, so serialization errors
+    are raised there. Failed puts (database or network errors) fail their
+    futures; nothing is retried. If the queue has :class:`Spool
+    <tarantool_queue.spool.Spool>`, puts failed by network are spooled
+    and their futures have None result.
+
+    At most `max_buffered` puts wait in the buffer. When it's full, `put`
+    blocks until there is room (`on_full='block'`, at most `block_timeout`
+    seconds) or rejects put with future failed with
+    :class:`BufferedProducer.BufferFull` (`on_full='drop'`).
+
+        >>> producer = tube.create_producer(batch_size=256, linger=0.005)
+        >>> future = producer.put({"event": "click"})
+        >>> producer.close()           # flushes buffered puts
+        >>> future.result()            # `Task` (task id for TTube)
+
+    :param tube: `Tube` or `TTube` instance
+    :param batch_size: Maximum number of puts sent in one round trip
+    :param linger: Seconds the oldest buffered put waits for a batch
+    :param max_buffered: Maximum number of buffered puts
+    :param on_full: 'block' or 'drop'
+    :param block_timeout: Seconds `put` blocks on full buffer
+                          (None - forever)
+    """
+    POLICIES = ('block', 'drop')
+
+    class BufferFull(Exception):
+        """
+        Put is rejected because the buffer is full.
+        """
+        pass
+
+    class Closed(Exception):
+        """
+        Put is made after producer is closed.
+        """
+        pass
+
+    def __init__(self, tube, batch_size=512, linger=0.005,
+                 max_buffered=10000, on_full='block', block_timeout=None):
+        if on_full not in self.POLICIES:
+            raise TypeError("on_full must be one of %s, "
+                            "but not %r" % (self.POLICIES, on_full))
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        if max_buffered < batch_size:
+            raise ValueError("max_buffered must be at least batch_size")
+        self.tube = tube
+        self.batch_size = batch_size
+        self.linger = linger
+        self.max_buffered = max_buffered
+        self.on_full = on_full
+        self.block_timeout = block_timeout
+        self._cond = threading.Condition(threading.Lock())
+        # (time of put, procedure name, args, future)
+        self._buffer = collections.deque()
+        self._added = 0
+        self._completed = 0
+        self._flush_to = 0
+        self._closed = False
+        self._thread = None
+        self._counters = {
+            'put': 0,
+            'sent': 0,
+            'failed': 0,
+            'dropped': 0,
+            'batches': 0,
+        }
+
+    def start(self):
+        """
+        Start background flusher thread.
+
+        :rtype: `BufferedProducer` instance
+        """
+        self.tube.queue._producers.add(self)
+        self._thread = threading.Thread(
+            target=self.tube.queue._background(self.run))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def reset(self):
+        """
+        Forget puts buffered by the parent process and start flusher
+        thread again, if it was started. It's used in child process
+        after `fork()`: buffered puts are sent by the parent.
+        """
+        self._cond = threading.Condition(threading.Lock())
+        self._buffer = collections.deque()
+        self._added = self._completed = self._flush_to = 0
+        if self._thread is not None and not self._closed:
+            self.start()
+
+    def put(self, data, **kwargs):
+        """
+        Buffer put of a task. Options are the same as for `put` of the
+        tube.
+
+        :rtype: `concurrent.futures.Future` of `Task` instance
+                (task id for `TTube`)
+        """
+        method, args = self.tube._put_call(data, kwargs)
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with self._cond:
+            if self._closed:
+                raise BufferedProducer.Closed("producer is closed")
+            if len(self._buffer) >= self.max_buffered:
+                if self.on_full == 'drop' or not self._wait_room():
+                    self._counters['dropped'] += 1
+                    future.set_exception(
+                        BufferedProducer.BufferFull("buffer is full"))
+                    return future
+            self._buffer.append((time.time(), method, args, future))
+            self._added += 1
+            self._counters['put'] += 1
+            if len(self._buffer) == 1 or \
+                    len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+        return future
+
+    def _wait_room(self):
+        # called with the lock held
+        deadline = None
+        if self.block_timeout is not None:
+            deadline = time.time() + self.block_timeout
+        while len(self._buffer) >= self.max_buffered:
+            if self._closed:
+                raise BufferedProducer.Closed("producer is closed")
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.time()
+                if timeout <= 0:
+                    return False
+            self._cond.wait(timeout)
+        return True
+
+    def _next_batch(self):
+        # wait for full batch, lingered put, flush or close
+        with self._cond:
+            while True:
+                if self._buffer:
+                    if len(self._buffer) >= self.batch_size or \
+                            self._flush_to > self._completed or \
+                            self._closed:
+                        break
+                    timeout = self._buffer[0][0] + self.linger - time.time()
+                    if timeout <= 0:
+                        break
+                elif self._closed:
+                    return None
+                else:
+                    timeout = None
+                self._cond.wait(timeout)
+            count = min(len(self._buffer), self.batch_size)
+            batch = [self._buffer.popleft() for _ in range(count)]
+            # room in buffer for blocked puts
+            self._cond.notify_all()
+        return batch
+
+    def run(self):
+        """
+        Send buffered puts in current thread until closed.
+        """
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            self._send(batch)
+
+    def _send(self, batch):
+        calls = [(method, args) for _, method, args, _ in batch]
+        try:
+            results = self.tube.queue._put_many(calls)
+        except Exception as e:
+            results = [e] * len(batch)
+        failed = 0
+        for (_, _, _, future), the_tuple in zip(batch, results):
+            if the_tuple is None:
+                # spooled, see `Spool`
+                future.set_result(None)
+                continue
+            if not isinstance(the_tuple, Exception):
+                try:
+                    future.set_result(self.tube._put_result(the_tuple))
+                    continue
+                except Exception as e:
+                    the_tuple = e
+            future.set_exception(the_tuple)
+            failed += 1
+        with self._cond:
+            self._completed += len(batch)
+            self._counters['batches'] += 1
+            self._counters['sent'] += len(batch) - failed
+            self._counters['failed'] += failed
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """
+        Send buffered puts right now and wait until all puts made before
+        are done.
+
+        :param timeout: Seconds to wait (None - forever)
+        :rtype: boolean (True if all puts are done)
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            target = self._added
+            self._flush_to = max(self._flush_to, target)
+            self._cond.notify_all()
+            while self._completed < target:
+                if self._thread is None:
+                    return False
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """
+        Stop accepting puts, send buffered ones and stop flusher thread.
+        Puts blocked on full buffer fail with
+        :class:`BufferedProducer.Closed`.
+
+        :param timeout: Seconds to wait (None - forever)
+        :rtype: boolean (True if all puts are done)
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        thread = self._thread
+        if thread is None:
+            return not self._buffer
+        thread.join(timeout)
+        return not thread.is_alive()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def stats(self):
+        """
+        Return producer counters: number of accepted puts, puts sent
+        successfully, failed and dropped ones, batches sent and puts
+        buffered now.
+
+        :rtype: dict
+        """
+        with self._cond:
+            stats = dict(self._counters)
+            stats['buffered'] = len(self._buffer)
+        return stats
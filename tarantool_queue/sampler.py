@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Periodic sampling of queue statistics with rates computed from history.
+"""
+import time
+import array
+import threading
+
+
+class RingBuffer(object):
+    """
+    Fixed-size ring of numbers backed by `array.array`: memory doesn't
+    grow, the oldest value is overwritten when it's full.
+
+    :param size: Maximum number of values
+    :param typecode: `array` typecode of values
+    """
+    __slots__ = ('size', '_values', '_next', '_count')
+
+    def __init__(self, size, typecode='d'):
+        if size < 2:
+            raise ValueError("size must be at least 2")
+        self.size = size
+        self._values = array.array(typecode, [0]) * size
+        self._next = 0
+        self._count = 0
+
+    def append(self, value):
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.size
+        if self._count < self.size:
+            self._count += 1
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        """
+        Value by age: 0 is the oldest kept value, -1 is the latest one.
+        """
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("ring buffer index out of range")
+        return self._values[(self._next - self._count + index) % self.size]
+
+    def values(self):
+        """
+        :rtype: list of values from the oldest to the latest
+        """
+        start = (self._next - self._count) % self.size
+        if start + self._count <= self.size:
+            return self._values[start:start + self._count].tolist()
+        return (self._values[start:].tolist() +
+                self._values[:self._next].tolist())
+
+
+class _Series(object):
+    # history of one tube: sample times and one ring per counter
+    __slots__ = ('times', 'rings')
+
+    def __init__(self, names, size):
+        self.times = RingBuffer(size)
+        self.rings = dict((name, RingBuffer(size)) for name in names)
+
+    def window(self, seconds):
+        # index of the oldest sample inside window, but never the latest
+        # one: rate over window shorter than interval uses two samples
+        count = len(self.times)
+        if seconds is None or count < 2:
+            return 0
+        since = self.times[-1] - seconds
+        index = count - 2
+        while index > 0 and self.times[index - 1] >= since:
+            index -= 1
+        return index
+
+
+class StatsSampler(object):
+    """
+    Poll :meth:`Queue.statistics() <tarantool_queue.Queue.statistics>`
+    every `interval` seconds and keep last `size` samples of counters of
+    every tube in ring buffers, so memory is bounded however long it runs.
+    Rates, backlog growth and time to drain are computed from history.
+
+        >>> sampler = StatsSampler(queue, interval=1.0).start()
+        >>> sampler.rates('holy_grail', window=60)
+        {'put': 120.5, 'ack': 118.0, ..., 'backlog': 310,
+         'backlog_growth': 2.5, 'time_to_drain': None}
+
+    :param queue: `Queue` instance
+    :param interval: Seconds between samples
+    :param size: Number of samples kept for every tube
+    :param tubes: Names of sampled tubes (all tubes of space if None)
+    """
+    COUNTERS = ('put', 'urgent', 'take', 'take_timeout', 'ack', 'release',
+                'delete', 'bury')
+    STATES = ('ready', 'delayed', 'taken', 'buried', 'done', 'total')
+
+    def __init__(self, queue, interval=1.0, size=300, tubes=None):
+        self.queue = queue
+        self.interval = interval
+        self.size = size
+        self.tubes = None if tubes is None else list(tubes)
+        self._names = self.COUNTERS + self.STATES
+        self._series = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Start sampling in background thread.
+
+        :rtype: `StatsSampler` instance
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def run(self):
+        """
+        Sample in current thread until stopped.
+        """
+        sample = self.queue._background(self.sample)
+        while True:
+            try:
+                sample()
+            except Exception:
+                pass
+            if self._stop.wait(self.interval):
+                return
+
+    def stop(self, timeout=None):
+        """
+        Stop background sampling. History is kept.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def sample(self):
+        """
+        Take one sample of statistics right now.
+        """
+        if self.tubes is None:
+            stats = self.queue.statistics()
+        else:
+            stats = self.queue.statistics_many(self.tubes)
+        now = time.time()
+        with self._lock:
+            for tube, tube_stats in stats.items():
+                series = self._series.get(tube)
+                if series is None:
+                    series = _Series(self._names, self.size)
+                    self._series[tube] = series
+                series.times.append(now)
+                tasks = tube_stats.get('tasks', {})
+                for name in self.COUNTERS:
+                    series.rings[name].append(tube_stats.get(name, 0))
+                for name in self.STATES:
+                    series.rings[name].append(tasks.get(name, 0))
+
+    def history(self, tube, name):
+        """
+        :param name: counter (e.g. 'put') or task state (e.g. 'ready')
+        :rtype: list of (time, value) from the oldest to the latest
+        """
+        with self._lock:
+            series = self._series.get(tube)
+            if series is None:
+                return []
+            return list(zip(series.times.values(),
+                            series.rings[name].values()))
+
+    def _slope(self, series, name, window):
+        start = series.window(window)
+        elapsed = series.times[-1] - series.times[start]
+        if elapsed <= 0:
+            return None
+        ring = series.rings[name]
+        return (ring[-1] - ring[start]) / elapsed
+
+    def rate(self, tube, name, window=None):
+        """
+        Per second rate of counter over last `window` seconds (whole
+        history if None). Counters reset by server restart give 0.
+
+        :rtype: float or None if there are less than two samples
+        """
+        with self._lock:
+            series = self._series.get(tube)
+            if series is None or len(series.times) < 2:
+                return None
+            return max(self._slope(series, name, window) or 0.0, 0.0)
+
+    def backlog_growth(self, tube, window=None):
+        """
+        Per second change of ready tasks (negative when backlog shrinks).
+
+        :rtype: float or None if there are less than two samples
+        """
+        with self._lock:
+            series = self._series.get(tube)
+            if series is None or len(series.times) < 2:
+                return None
+            return self._slope(series, 'ready', window)
+
+    def time_to_drain(self, tube, window=None):
+        """
+        Seconds until ready tasks are drained at current backlog change.
+
+        :rtype: float, 0 for empty backlog or None if backlog doesn't
+                shrink
+        """
+        with self._lock:
+            series = self._series.get(tube)
+            if series is None or not len(series.times):
+                return None
+            backlog = series.rings['ready'][-1]
+        if not backlog:
+            return 0.0
+        growth = self.backlog_growth(tube, window)
+        if growth is None or growth >= 0:
+            return None
+        return backlog / -growth
+
+    def rates(self, tube, window=None):
+        """
+        Summary of tube: rates of all counters per second, backlog
+        (ready tasks), its growth per second and time to drain.
+
+        :rtype: dict
+        """
+        ans = dict((name, self.rate(tube, name, window))
+                   for name in self.COUNTERS)
+        with self._lock:
+            series = self._series.get(tube)
+            backlog = series.rings['ready'][-1] if series else None
+        ans['backlog'] = backlog
+        ans['backlog_growth'] = self.backlog_growth(tube, window)
+        ans['time_to_drain'] = self.time_to_drain(tube, window)
+        return ans
+
+    def snapshot(self, window=None):
+        """
+        :meth:`StatsSampler.rates` of all sampled tubes.
+
+        :rtype: dict of tube name and its rates
+        """
+        with self._lock:
+            tubes = list(self._series)
+        return dict((tube, self.rates(tube, window)) for tube in tubes)
@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""
+Queue spread over several tarantool nodes.
+"""
+import time
+import bisect
+import hashlib
+import threading
+
+from .tarantool_queue import Queue
+
+
+def _hash(key):
+    return int(hashlib.md5(key.encode('utf-8')).hexdigest()[:16], 16)
+
+
+def _node_key(node):
+    return "{0}:{1}".format(*node)
+
+
+class HashRing(object):
+    """
+    Consistent hash ring: every node is placed on the ring `replicas`
+    times, key belongs to the first node clockwise from its hash. Adding
+    or removing one of N nodes remaps only about 1/N of keys.
+    """
+    def __init__(self, nodes=(), replicas=160):
+        self.replicas = replicas
+        self._hashes = []
+        self._nodes = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node):
+        key = _node_key(node)
+        for i in range(self.replicas):
+            point = _hash("{0}#{1}".format(key, i))
+            if point in self._nodes:
+                continue
+            bisect.insort(self._hashes, point)
+            self._nodes[point] = node
+
+    def remove(self, node):
+        key = _node_key(node)
+        for i in range(self.replicas):
+            point = _hash("{0}#{1}".format(key, i))
+            if self._nodes.get(point) == node:
+                del self._nodes[point]
+                self._hashes.remove(point)
+
+    def node(self, key):
+        """
+        Return node for key or None if ring is empty.
+        """
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key))
+        if index == len(self._hashes):
+            index = 0
+        return self._nodes[self._hashes[index]]
+
+
+def _merge_stats(total, stats):
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            _merge_stats(total.setdefault(key, {}), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+class ShardedTube(object):
+    """
+    Tube of `ShardedQueue`. Pinned tube lives on one node chosen by
+    consistent hashing of its name. Striped tube lives on all nodes:
+    tasks are put in round robin and `take` polls shards in fair rotation.
+
+    .. warning::
+
+        Don't instantiate it with your bare hands
+    """
+
+    #: Seconds of blocking take on one shard of striped tube before
+    #: moving to the next one.
+    poll_interval = 0.1
+
+    def __init__(self, queue, name, stripe=False, **kwargs):
+        self.queue = queue
+        self.name = name
+        self.stripe = stripe
+        self.opt = dict(kwargs)
+        self._serialize = None
+        self._deserialize = None
+        self._lock = threading.Lock()
+        self._next = 0
+        # node: Tube of the node, options are compiled once
+        self._tubes = {}
+
+    def _tube(self, node):
+        queue = self.queue.queues[node]
+        tube = self._tubes.get(node)
+        if tube is None or tube.queue is not queue:
+            tube = queue.tube(self.name, **self.opt)
+            tube.serialize = self._serialize
+            tube.deserialize = self._deserialize
+            self._tubes[node] = tube
+        return tube
+
+    @property
+    def tubes(self):
+        """
+        Tubes on all shards of this tube.
+        """
+        if self.stripe:
+            return [self._tube(node) for node in self.queue.nodes]
+        return [self._tube(self.queue.ring.node(self.name))]
+
+    def _rotate(self):
+        tubes = self.tubes
+        with self._lock:
+            start = self._next % len(tubes)
+            self._next = start + 1
+        return tubes[start:] + tubes[:start]
+
+    # ----------------
+    @property
+    def serialize(self):
+        """
+        Serialize function: must be Callable or None. Sets None when deleted
+        """
+        if self._serialize is None:
+            return self.queue.serialize
+        return self._serialize
+
+    @serialize.setter
+    def serialize(self, func):
+        if not (hasattr(func, '__call__') or func is None):
+            raise TypeError("func must be Callable "
+                            "or None, but not " + str(type(func)))
+        self._serialize = func
+        for tube in self._tubes.values():
+            tube.serialize = func
+
+    # ----------------
+    @property
+    def deserialize(self):
+        """
+        Deserialize function: must be Callable or None. Sets None when deleted
+        """
+        if self._deserialize is None:
+            return self.queue.deserialize
+        return self._deserialize
+
+    @deserialize.setter
+    def deserialize(self, func):
+        if not (hasattr(func, '__call__') or func is None):
+            raise TypeError("func must be Callable "
+                            "or None, but not " + str(type(func)))
+        self._deserialize = func
+        for tube in self._tubes.values():
+            tube.deserialize = func
+
+    # ----------------
+    def update_options(self, **kwargs):
+        """
+        Update options for current tube (such as ttl, ttr, pri and delay)
+        """
+        self.opt.update(kwargs)
+        for tube in self._tubes.values():
+            tube.update_options(**kwargs)
+
+    def put(self, data, **kwargs):
+        """
+        See :meth:`Tube.put() <tarantool_queue.Tube.put>`.
+        """
+        return self._rotate()[0].put(data, **kwargs)
+
+    def put_unique(self, data, **kwargs):
+        """
+        See :meth:`Tube.put_unique() <tarantool_queue.Tube.put_unique>`.
+        Uniqueness is checked only on the shard the task is put to.
+        """
+        return self._rotate()[0].put_unique(data, **kwargs)
+
+    def urgent(self, data=None, **kwargs):
+        """
+        See :meth:`Tube.urgent() <tarantool_queue.Tube.urgent>`.
+        """
+        return self._rotate()[0].urgent(data, **kwargs)
+
+    def take(self, timeout=0):
+        """
+        Take a task from shards in fair rotation, see
+        :meth:`Tube.take() <tarantool_queue.Tube.take>`. Striped tube
+        checks all shards, then waits on them in turn by `poll_interval`.
+
+        :rtype: `Task` instance or None
+        """
+        tubes = self._rotate()
+        if len(tubes) == 1:
+            return tubes[0].take(timeout)
+        for tube in tubes:
+            task = tube.take(0)
+            if task is not None:
+                return task
+        if timeout == 0:
+            return None
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            for tube in tubes:
+                wait = self.poll_interval
+                if deadline is not None:
+                    wait = min(wait, deadline - time.time())
+                    if wait <= 0:
+                        return None
+                task = tube.take(wait)
+                if task is not None:
+                    return task
+
+    def kick(self, count=None):
+        """
+        'Dig up' count tasks on every shard of tube.
+
+        :rtype boolean
+        """
+        return all([tube.kick(count) for tube in self.tubes])
+
+    def statistics(self):
+        """
+        Statistics of tube summed over its shards.
+        """
+        return self.queue.statistics(tube=self.name)
+
+    def truncate(self):
+        """
+        Truncate tube on all shards, return quantity of deleted tasks
+        """
+        return sum([tube.truncate() for tube in self.tubes])
+
+
+class ShardedQueue(object):
+    """
+    Queue over several tarantool nodes. Each node has its own `Queue`
+    in `queues`, tasks are acked and released on the node they came from.
+
+        >>> queue = ShardedQueue([('10.0.0.1', 33013), ('10.0.0.2', 33013)])
+        >>> tube = queue.tube('holy_grail')           # lives on one node
+        >>> wide = queue.tube('spam', stripe=True)   # lives on all nodes
+
+    :param nodes: list of (host, port)
+    :param space: queue space on every node
+    :param stripe: default for tubes created by :meth:`ShardedQueue.tube`
+    :param replicas: number of points of every node on hash ring
+    """
+    def __init__(self, nodes, space=0, schema=None, stripe=False,
+                 replicas=160):
+        if not nodes:
+            raise Queue.BadConfigException("nodes must be not empty")
+        self.space = space
+        self.schema = schema
+        self.stripe = stripe
+        self.nodes = []
+        self.queues = {}
+        self.ring = HashRing(replicas=replicas)
+        self.tubes = {}
+        self._serialize = Queue.basic_serialize
+        self._deserialize = Queue.basic_deserialize
+        for node in nodes:
+            self.add_node(node)
+
+    # ----------------
+    @property
+    def serialize(self):
+        """
+        Serialize function: must be Callable. If sets to None, then
+        it will use msgpack for serializing.
+        """
+        return self._serialize
+
+    @serialize.setter
+    def serialize(self, func):
+        if not (hasattr(func, '__call__') or func is None):
+            raise TypeError("func must be Callable "
+                            "or None, but not " + str(type(func)))
+        self._serialize = func if func is not None else Queue.basic_serialize
+        for queue in self.queues.values():
+            queue.serialize = self._serialize
+
+    # ----------------
+    @property
+    def deserialize(self):
+        """
+        Deserialize function: must be Callable. If sets to None,
+        then it will use msgpack for deserializing.
+        """
+        return self._deserialize
+
+    @deserialize.setter
+    def deserialize(self, func):
+        if not (hasattr(func, '__call__') or func is None):
+            raise TypeError("func must be Callable "
+                            "or None, but not " + str(type(func)))
+        self._deserialize = (func
+                             if func is not None
+                             else Queue.basic_deserialize)
+        for queue in self.queues.values():
+            queue.deserialize = self._deserialize
+
+    # ----------------
+    def add_node(self, node):
+        """
+        Add node (host, port). Only tubes moved to it on the hash ring
+        change their node.
+
+        :rtype: `Queue` instance of node
+        """
+        node = tuple(node)
+        if node in self.queues:
+            return self.queues[node]
+        queue = Queue(node[0], node[1], self.space, self.schema)
+        queue.serialize = self._serialize
+        queue.deserialize = self._deserialize
+        self.queues[node] = queue
+        self.nodes.append(node)
+        self.ring.add(node)
+        return queue
+
+    def remove_node(self, node):
+        """
+        Remove node (host, port). Tasks left on it are not moved.
+
+        :rtype: `Queue` instance of removed node
+        """
+        node = tuple(node)
+        self.ring.remove(node)
+        self.nodes.remove(node)
+        return self.queues.pop(node)
+
+    def node(self, tube):
+        """
+        Return node (host, port) of not striped tube.
+        """
+        return self.ring.node(tube)
+
+    def statistics(self, tube=None):
+        """
+        Statistics summed over all nodes. Statistics of a tube are
+        asked only from its nodes. See
+        :meth:`Queue.statistics() <tarantool_queue.Queue.statistics>`.
+        """
+        total = {}
+        if tube is None:
+            for node in self.nodes:
+                _merge_stats(total, self.queues[node].statistics())
+            return total
+        for node in self._nodes_of(tube):
+            try:
+                stats = self.queues[node].statistics(tube)
+            except KeyError:
+                continue
+            _merge_stats(total, stats)
+        return total
+
+    def _nodes_of(self, tube):
+        # nodes holding tasks of tube
+        stripe = self.tubes[tube].stripe if tube in self.tubes \
+            else self.stripe
+        return list(self.nodes) if stripe else [self.node(tube)]
+
+    def statistics_many(self, tubes):
+        """
+        Statistics of many tubes summed over all nodes. See
+        :meth:`Queue.statistics_many()
+        <tarantool_queue.Queue.statistics_many>`.
+        """
+        total = {}
+        for node in self.nodes:
+            _merge_stats(total, self.queues[node].statistics_many(tubes))
+        return total
+
+    def truncate(self, tube):
+        """
+        Truncate tube on all nodes, return quantity of deleted tasks
+        """
+        return sum([queue.truncate(tube) for queue in self.queues.values()])
+
+    def tube(self, name, stripe=None, **kwargs):
+        """
+        Create ShardedTube object, if not created before, and set kwargs.
+        If existed, return existed ShardedTube.
+        See :meth:`Queue.tube() <tarantool_queue.Queue.tube>` for options.
+
+        :param stripe: spread tube over all nodes (default of queue if None)
+        :rtype: `ShardedTube` instance
+        """
+        if name in self.tubes:
+            tube = self.tubes[name]
+            tube.update_options(**kwargs)
+        else:
+            stripe = self.stripe if stripe is None else stripe
+            tube = ShardedTube(self, name, stripe, **kwargs)
+            self.tubes[name] = tube
+        return tube
@@ -0,0 +1,477 @@
+# -*- coding: utf-8 -*-
+"""
+Local durable spool of puts made while the queue server is unreachable.
+"""
+import os
+import re
+import mmap
+import time
+import zlib
+import errno
+import struct
+import threading
+import collections
+
+import msgpack
+import tarantool
+
+#: Size of one segment file of the spool.
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+# record: length of body, crc32 of body, body (msgpack of method, args)
+_HEADER = struct.Struct('<II')
+# cursor: segment number, offset of the first record not replayed
+_CURSOR = struct.Struct('<QQ')
+_SEGMENT = re.compile(r'^[0-9a-f]{16}\.seg$')
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def _allocate(f, size):
+    # reserve disk blocks of the whole file: writes to memory map of
+    # sparse file are killed by SIGBUS, when the disk is full
+    start = os.fstat(f.fileno()).st_size
+    if start >= size:
+        return
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(f.fileno(), start, size - start)
+            return
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+    # file system without fallocate: blocks are written with zeros
+    f.seek(start)
+    zeros = b'\0' * 65536
+    while start < size:
+        start += f.write(zeros[:size - start])
+    f.flush()
+
+
+def _record(buf, offset, end):
+    # return (body, offset of the next record) or None at the end of
+    # written records (zero length, torn or corrupted record)
+    if offset + _HEADER.size > end:
+        return None
+    length, crc = _HEADER.unpack_from(buf, offset)
+    start = offset + _HEADER.size
+    if not length or start + length > end:
+        return None
+    body = buf[start:start + length]
+    if zlib.crc32(body) & 0xffffffff != crc:
+        return None
+    return body, start + length
+
+
+class _Segment(object):
+    __slots__ = ('seq', 'path', 'size', 'map')
+
+    def __init__(self, path, seq, size):
+        self.seq = seq
+        self.path = os.path.join(path, '%016x.seg' % seq)
+        with open(self.path, 'a+b') as f:
+            # grows new (or torn) segment, never shrinks bigger one
+            try:
+                _allocate(f, size)
+            except (IOError, OSError):
+                if not os.fstat(f.fileno()).st_size:
+                    os.unlink(self.path)
+                raise
+            self.size = os.fstat(f.fileno()).st_size
+            self.map = mmap.mmap(f.fileno(), self.size)
+
+    def close(self):
+        self.map.close()
+
+    def remove(self):
+        self.map.close()
+        os.unlink(self.path)
+
+
+class Spool(object):
+    """
+    Append-only spool of puts in memory-mapped segment files. When it's
+    set to :class:`Queue <tarantool_queue.Queue>` or
+    :class:`TQueue <tarantool_queue.TQueue>`, puts failed with
+    `NetworkError` are appended to the spool instead, and so are all puts
+    made until the spool is drained, to keep their order. Spooled put
+    returns None instead of task.
+
+    Background thread replays spooled puts in order, in pipelined
+    batches, once the server is reachable again. Position of replay is
+    saved after every batch, so spool survives restart of the process.
+    Replay is at-least-once: batch sent, but not saved as replayed (the
+    process crashed or connection broke meanwhile) is sent again, that's
+    harmless for `put_unique` (the server ignores duplicates), but
+    duplicates tasks of `put`. Puts rejected by the server on replay are
+    counted as failed and skipped.
+
+        >>> queue.create_spool("/var/spool/myapp")
+        >>> tube.put("data")       # None, if the server is down
+        >>> queue.spool.stats()['depth']
+
+    Records are written to memory, so puts are spooled at memory speed
+    and are written to disk by OS; with `sync` every put is flushed to
+    disk before it returns. Disk space of a segment file is allocated
+    when the file is created.
+
+    Size of all segment files is limited by `max_bytes`. When puts don't
+    fit in (or the disk is full), `on_full` policy applies:
+
+    * 'raise' - none of the puts is spooled, :class:`Spool.Full` is
+      raised by the put
+    * 'drop' - puts which don't fit are dropped and counted as dropped,
+      the put returns None as for a spooled one
+
+    :param queue: `Queue` or `TQueue` instance
+    :param path: Directory of segment files (created if missing)
+    :param segment_size: Size of segment file in bytes
+    :param batch_size: Maximum number of puts replayed in one round trip
+    :param interval: Seconds between replay attempts
+    :param sync: Flush every put to disk
+    :param max_bytes: Maximum size of segment files (None - unlimited)
+    :param on_full: Policy for puts which don't fit in: 'raise' or 'drop'
+    """
+    #: Seconds replay rate is averaged over.
+    RATE_WINDOW = 10.0
+
+    POLICIES = ('raise', 'drop')
+
+    class Full(Exception):
+        """
+        Spool has no room for the puts: `max_bytes` is reached or the
+        disk is full.
+        """
+        pass
+
+    def __init__(self, queue, path, segment_size=SEGMENT_SIZE,
+                 batch_size=512, interval=0.5, sync=False, max_bytes=None,
+                 on_full='raise'):
+        if segment_size <= _HEADER.size:
+            raise ValueError("segment_size is too small")
+        if max_bytes is not None and max_bytes < segment_size:
+            raise ValueError("max_bytes is less than segment_size")
+        if on_full not in self.POLICIES:
+            raise ValueError("on_full must be one of %s, but not %r" %
+                             (self.POLICIES, on_full))
+        self.queue = queue
+        self.path = path
+        self.segment_size = segment_size
+        self.batch_size = batch_size
+        self.interval = interval
+        self.sync = sync
+        self.max_bytes = max_bytes
+        self.on_full = on_full
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._replays = collections.deque()
+        self._counters = {
+            'spooled': 0,
+            'replayed': 0,
+            'failed': 0,
+            'dropped': 0,
+            'errors': 0,
+        }
+        self._open()
+
+    # ----------------
+    def _open(self):
+        _makedirs(self.path)
+        seqs = sorted(int(name[:16], 16) for name in os.listdir(self.path)
+                      if _SEGMENT.match(name))
+        seq, offset = seqs[0] if seqs else 0, 0
+        try:
+            with open(os.path.join(self.path, 'cursor'), 'rb') as f:
+                seq, offset = _CURSOR.unpack(f.read(_CURSOR.size))
+        except (IOError, OSError, struct.error):
+            pass
+        if seq not in seqs:
+            seq, offset = seqs[0] if seqs else seq, 0
+        self._segments = collections.OrderedDict()
+        for number in seqs:
+            if number < seq:
+                os.unlink(os.path.join(self.path, '%016x.seg' % number))
+            else:
+                self._segments[number] = _Segment(self.path, number,
+                                                  self.segment_size)
+        if not self._segments:
+            self._segments[seq] = _Segment(self.path, seq,
+                                           self.segment_size)
+        self._write = self._segments[max(self._segments)]
+        self._bytes = sum([segment.size
+                           for segment in self._segments.values()])
+        self._read_seq, self._read_offset = seq, offset
+        # find the end of written records and number of spooled ones
+        self._write_offset = 0
+        depth = 0
+        for segment in self._segments.values():
+            position = offset if segment.seq == seq else 0
+            while True:
+                record = _record(segment.map, position, segment.size)
+                if record is None:
+                    break
+                position = record[1]
+                depth += 1
+            if segment is self._write:
+                self._write_offset = position
+        self._depth = depth
+
+    def _fit(self, sizes):
+        # number of records (by size) fitting in max_bytes, in order;
+        # called with the lock held
+        if self.max_bytes is None:
+            return len(sizes)
+        total, offset, end = self._bytes, self._write_offset, self._write.size
+        for count, size in enumerate(sizes):
+            if offset + size > end:
+                end = max(self.segment_size, size)
+                if total + end > self.max_bytes:
+                    return count
+                total, offset = total + end, 0
+            offset += size
+        return len(sizes)
+
+    def _rotate(self, size):
+        # called with the lock held
+        if self.sync:
+            self._write.map.flush()
+        seq = self._write.seq + 1
+        try:
+            segment = _Segment(self.path, seq, max(self.segment_size, size))
+        except (IOError, OSError) as e:
+            if e.errno != errno.ENOSPC:
+                raise
+            raise Spool.Full("no space left for spool segment")
+        self._write = self._segments[seq] = segment
+        self._bytes += segment.size
+        self._write_offset = 0
+
+    def _truncate(self, seq, offset):
+        # forget records written after the position; called with the
+        # lock held
+        for number in list(self._segments):
+            if number > seq:
+                segment = self._segments.pop(number)
+                self._bytes -= segment.size
+                segment.remove()
+        self._write = self._segments[seq]
+        self._write_offset = offset
+        if offset + _HEADER.size <= self._write.size:
+            self._write.map[offset:offset + _HEADER.size] = \
+                b'\0' * _HEADER.size
+
+    def append(self, method, args):
+        """
+        Append put to the spool.
+
+        :param method: Stored procedure name
+        :param args: Tuple of args
+        """
+        self.extend([(method, args)])
+
+    def extend(self, calls):
+        """
+        Append list of (procedure name, args) puts to the spool.
+        """
+        records = []
+        for method, args in calls:
+            body = msgpack.packb((method, args))
+            records.append(_HEADER.pack(len(body),
+                                        zlib.crc32(body) & 0xffffffff))
+            records.append(body)
+        with self._lock:
+            count = self._fit([_HEADER.size + len(body)
+                               for body in records[1::2]])
+            if count < len(calls) and self.on_full == 'raise':
+                raise Spool.Full("spool is over max_bytes")
+            start = (self._write.seq, self._write_offset)
+            written = 0
+            try:
+                for i in range(0, 2 * count, 2):
+                    size = _HEADER.size + len(records[i + 1])
+                    if self._write_offset + size > self._write.size:
+                        self._rotate(size)
+                    offset = self._write_offset
+                    buf = self._write.map
+                    # header goes last: record without it isn't replayed
+                    buf[offset + _HEADER.size:offset + size] = \
+                        records[i + 1]
+                    buf[offset:offset + _HEADER.size] = records[i]
+                    self._write_offset += size
+                    written += 1
+            except Spool.Full:
+                # the disk is full
+                if self.on_full == 'raise':
+                    self._truncate(*start)
+                    raise
+            if self.sync:
+                self._write.map.flush()
+            self._depth += written
+            self._counters['spooled'] += written
+            self._counters['dropped'] += len(calls) - written
+
+    def __len__(self):
+        return self._depth
+
+    # ----------------
+    def _peek(self, count):
+        # return up to count spooled puts and position after them
+        calls = []
+        with self._lock:
+            seq, offset = self._read_seq, self._read_offset
+            while len(calls) < count:
+                segment = self._segments[seq]
+                last = segment is self._write
+                end = self._write_offset if last else segment.size
+                record = _record(segment.map, offset, end)
+                if record is None:
+                    if last:
+                        break
+                    seq, offset = next(number for number in self._segments
+                                       if number > seq), 0
+                    continue
+                body, offset = record
+                method, args = msgpack.unpackb(body)
+                calls.append((method, tuple(args)))
+        return calls, (seq, offset)
+
+    def _commit(self, position, count):
+        seq, offset = position
+        with self._lock:
+            for number in list(self._segments):
+                if number >= seq:
+                    break
+                segment = self._segments.pop(number)
+                self._bytes -= segment.size
+                segment.remove()
+            self._read_seq, self._read_offset = seq, offset
+            self._depth -= count
+        tmp = os.path.join(self.path, 'cursor.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(_CURSOR.pack(seq, offset))
+        os.rename(tmp, os.path.join(self.path, 'cursor'))
+
+    def replay(self):
+        """
+        Send spooled puts to the queue in order, until the spool is empty
+        or the server is unreachable.
+
+        :rtype: int (number of replayed puts)
+        """
+        replayed = 0
+        with self._replay_lock:
+            while True:
+                calls, position = self._peek(self.batch_size)
+                if not calls:
+                    break
+                try:
+                    results = self.queue._call_many(calls)
+                except tarantool.NetworkError:
+                    self.queue._drop_connection()
+                    with self._lock:
+                        self._counters['errors'] += 1
+                    break
+                failed = len([result for result in results
+                              if isinstance(result, Exception)])
+                self._commit(position, len(calls))
+                replayed += len(calls)
+                with self._lock:
+                    self._counters['replayed'] += len(calls) - failed
+                    self._counters['failed'] += failed
+                    self._replays.append((time.time(), len(calls)))
+        return replayed
+
+    # ----------------
+    def start(self):
+        """
+        Start background replay thread.
+
+        :rtype: `Spool` instance
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def run(self):
+        """
+        Replay spooled puts in current thread until stopped.
+        """
+        replay = self.queue._background(self.replay)
+        while not self._stop.wait(self.interval):
+            if not self._depth:
+                continue
+            try:
+                replay()
+            except Exception:
+                with self._lock:
+                    self._counters['errors'] += 1
+
+    def stop(self, timeout=None):
+        """
+        Stop background thread.
+
+        :rtype: boolean (True if thread has stopped)
+        """
+        self._stop.set()
+        if self._thread is None:
+            return True
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def close(self, timeout=None):
+        """
+        Stop background thread and close segment files. Spooled puts are
+        kept on disk and replayed by a spool opened on the same path.
+        """
+        self.stop(timeout)
+        with self._lock:
+            for segment in self._segments.values():
+                segment.map.flush()
+                segment.close()
+            self._segments.clear()
+
+    def reset(self):
+        """
+        Unmap segment files without flushing them and forget background
+        thread. It's used in child process after `fork()`: the files are
+        written by the parent, so the child must not touch them.
+        """
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._thread = None
+        for segment in self._segments.values():
+            segment.close()
+        self._segments.clear()
+
+    def stats(self):
+        """
+        Return spool counters: number of puts spooled now (depth) and
+        since start, replayed and failed (rejected by the server) puts,
+        puts dropped by 'drop' policy, failed replay attempts, replayed
+        puts per second over the last `RATE_WINDOW` seconds, number and
+        size of segment files.
+
+        :rtype: dict
+        """
+        now = time.time()
+        with self._lock:
+            while self._replays and \
+                    self._replays[0][0] < now - self.RATE_WINDOW:
+                self._replays.popleft()
+            stats = dict(self._counters)
+            stats['depth'] = self._depth
+            stats['segments'] = len(self._segments)
+            stats['bytes'] = self._bytes
+            stats['replay_rate'] = sum(
+                [count for _, count in self._replays]) / self.RATE_WINDOW
+        return stats
@@ -1,11 +1,21 @@
 # -*- coding: utf-8 -*-
-import re
+import time
 import struct
 import msgpack
+import functools
+import itertools
 import threading
+import collections
 
 import tarantool
 
+from . import codec
+from .base import QueueBase
+from . import mux
+from .lease import LeaseKeeper
+from .worker import Worker
+from .producer import BufferedProducer
+
 
 def unpack_long_long(value):
     return struct.unpack("<q", value)[0]
@@ -15,6 +25,71 @@ def unpack_long(value):
     return struct.unpack("<l", value)[0]
 
 
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return value
+
+
+_statistics_keys = {}
+
+#: Maximum number of parsed statistics keys kept in cache.
+STATISTICS_KEYS_CACHE = 65536
+
+
+def _parse_statistics_key(key):
+    """
+    Split `space<N>.<tube>[.tasks].<counter>` key into
+    (space, tube, 'tasks' or None, counter). Key may be bytes (it's
+    decoded as utf-8). Parsed keys are cached, as the same keys come
+    in every response.
+    """
+    parsed = _statistics_keys.get(key)
+    if parsed is not None:
+        return parsed
+    head, _, counter = _text(key).rpartition('.')
+    space, _, tube = head.partition('.')
+    if not (space.startswith('space') and tube and counter):
+        raise Queue.ZeroTupleException('stats: error when parsing '
+                                       'response key %r' % (key,))
+    group = None
+    if tube.endswith('.tasks'):
+        tube, group = tube[:-6], 'tasks'
+    parsed = (int(space[5:]), tube, group, counter)
+    if len(_statistics_keys) >= STATISTICS_KEYS_CACHE:
+        _statistics_keys.clear()
+    _statistics_keys[key] = parsed
+    return parsed
+
+
+def parse_statistics(space, row, tubes=None):
+    """
+    Parse flat list of `queue.statistics` keys and values into
+    dict of tube statistics for space in one pass. Counters are ints.
+    Keys and values may be str or bytes.
+
+    :param tubes: collection of tube names to parse (all if None)
+    """
+    ans = {}
+    fields = iter(row)
+    for key, value in zip(fields, fields):
+        key_space, tube, group, counter = _parse_statistics_key(key)
+        if key_space != space or (tubes is not None and
+                                  tube not in tubes):
+            continue
+        stats = ans.get(tube)
+        if stats is None:
+            stats = ans[tube] = {'tasks': {}}
+        if group is None:
+            stats[counter] = int(value)
+        else:
+            stats[group][counter] = int(value)
+    return ans
+
+
+_MISSING = object()
+
+
 class Task(object):
     """
     Tarantool queue task wrapper.
@@ -23,16 +98,37 @@ class Task(object):
 
         Don't instantiate it with your bare hands
     """
+    __slots__ = ('task_id', 'tube', 'status', 'raw_data', 'space', 'queue',
+                 '_deserialize', '_data', '_modified', '_tracked',
+                 '__weakref__')
+
     def __init__(self, queue, space=0, task_id=0,
-                 tube="", status="", raw_data=None):
+                 tube="", status="", raw_data=None, deserialize=None):
         self.task_id = task_id
         self.tube = tube
         self.status = status
         self.raw_data = raw_data
         self.space = space
         self.queue = queue
+        self._deserialize = deserialize
+        self._data = _MISSING
+        self._tracked = None
         self.modified = False
 
+    @property
+    def modified(self):
+        """
+        True if the task is acked, released, buried etc. Tasks taken, but
+        not modified are released, when garbage collected.
+        """
+        return self._modified
+
+    @modified.setter
+    def modified(self, value):
+        self._modified = value
+        if value and self._tracked is not None:
+            self.queue.task_tracker.forget(self)
+
     def ack(self):
         """
         Confirm completion of a task. Before marking a task as complete
@@ -40,7 +136,30 @@ class Task(object):
         :rtype: `Task` instance
         """
         self.modified = True
-        return self.queue._ack(self.task_id)
+        result = self.queue._ack(self.task_id)
+        if result:
+            self.queue._blob_delete([self], [result])
+        return result
+
+    def ack_async(self):
+        """
+        Same as :meth:`Task.ack() <tarantool_queue.Task.ack>`, but
+        doesn't wait for the response (see
+        :class:`MultiplexedConnection
+        <tarantool_queue.mux.MultiplexedConnection>`).
+
+        :rtype: `concurrent.futures.Future` of bool
+        """
+        self.modified = True
+        future = self.queue._call_async(
+            "queue.ack", (str(self.queue.space), self.task_id))
+
+        def acked(the_tuple):
+            result = the_tuple.return_code == 0
+            if result:
+                self.queue._blob_delete([self], [result])
+            return result
+        return mux.then(future, acked)
 
     def release(self, **kwargs):
         """
@@ -62,7 +181,10 @@ class Task(object):
         :rtype: boolean
         """
         self.modified = True
-        return self.queue._delete(self.task_id)
+        result = self.queue._delete(self.task_id)
+        if result:
+            self.queue._blob_delete([self], [result])
+        return result
 
     def requeue(self):
         """
@@ -85,9 +207,9 @@ class Task(object):
         :rtype: boolean
         """
         self.modified = True
-        the_tuple = self.queue.tnt.call("queue.done", (
+        the_tuple = self.queue._call("queue.done", (
             str(self.queue.space),
-            str(self.task_id),
+            self.task_id,
             self.queue.tube(self.tube).serialize(data))
         )
         return the_tuple.return_code == 0
@@ -130,14 +252,30 @@ class Task(object):
         """
         return self.queue._touch(self.task_id)
 
+    @property
+    def payload(self):
+        """
+        Raw task data as `memoryview` (without copying). Payload kept in
+        blob store is mapped into memory.
+        """
+        if self.raw_data is None:
+            return None
+        return memoryview(self.queue._blob_get(self.tube, self.raw_data))
+
     @property
     def data(self):
+        """
+        Task data deserialized on first access.
+        """
         if not self.raw_data:
             return None
-        if not hasattr(self, '_decoded_data'):
-            data = self.queue.tube(self.tube).deserialize(self.raw_data)
-            self._decoded_data = data
-        return self._decoded_data
+        if self._data is _MISSING:
+            deserialize = self._deserialize
+            if deserialize is None:
+                deserialize = self.queue._deserializer(self.tube)
+            self._data = deserialize(
+                self.queue._blob_get(self.tube, self.raw_data))
+        return self._data
 
     def __str__(self):
         args = (
@@ -145,10 +283,6 @@ class Task(object):
         )
         return "Task (id: {0}, tube:{1}, status: {2}, space:{3})".format(*args)
 
-    def __del__(self):
-        if self.status == 'taken' and not self.modified:
-            self.release()
-
     @classmethod
     def from_tuple(cls, queue, the_tuple):
         if the_tuple is None:
@@ -159,10 +293,11 @@ class Task(object):
         return cls(
             queue,
             space=queue.space,
-            task_id=row[0],
+            task_id=_text(row[0]),
             tube=row[1],
             status=row[2],
             raw_data=row[3],
+            deserialize=queue._deserializer(row[1]),
         )
 
 
@@ -185,8 +320,26 @@ class Tube(object):
             'tube': name
         }
         self.opt.update(kwargs)
+        self._compile()
         self._serialize = None
         self._deserialize = None
+        self._prefetch = 0
+        self._prefetched = collections.deque()
+        self._prefetch_lock = threading.Lock()
+        self._reaper_lock = threading.Lock()
+        self._reaper = None
+
+    #: Prefetched task is released back, when less than this number
+    #: of seconds is left before its TTR expires.
+    prefetch_margin = 1.0
+
+    #: Seconds between checks of prefetched tasks for TTR expiration.
+    reap_interval = 0.1
+
+    #: Options passed to `queue.put` after space, in order of arguments.
+    PUT_OPTIONS = ('tube', 'delay', 'ttl', 'ttr', 'pri')
+    _put_index = dict((name, index + 1)
+                      for index, name in enumerate(PUT_OPTIONS))
 
     # ----------------
     @property
@@ -222,12 +375,143 @@ class Tube(object):
                             "or None, but not " + str(type(func)))
         self._deserialize = func
 
+    # ----------------
+    @property
+    def prefetch(self):
+        """
+        Size of client-side prefetch buffer: must be non-negative int.
+        When it's positive, :meth:`Tube.take() <tarantool_queue.Tube.take>`
+        takes up to `prefetch` tasks in one round trip and returns them
+        from the buffer one by one. Tasks with less than `prefetch_margin`
+        seconds left before TTR are released back by background thread
+        (or by the next take) instead of being returned. Setting 0
+        disables prefetching and releases the buffer.
+        """
+        return self._prefetch
+
+    @prefetch.setter
+    def prefetch(self, size):
+        if not isinstance(size, int) or size < 0:
+            raise TypeError("prefetch must be non-negative int, "
+                            "but not " + repr(size))
+        self._prefetch = size
+        if not size:
+            self.release_prefetched()
+
+    def release_prefetched(self):
+        """
+        Release all tasks from prefetch buffer back to the queue.
+
+        :rtype: int (number of released tasks)
+        """
+        released = 0
+        while self._prefetched:
+            try:
+                deadline, task = self._prefetched.popleft()
+            except IndexError:
+                break
+            released += self._drop_prefetched(task)
+        return released
+
+    @staticmethod
+    def _drop_prefetched(task):
+        # TTR of buffered task may be over already, then the server has
+        # made it ready itself and release fails with 'task is ready'
+        try:
+            task.release()
+        except tarantool.DatabaseError:
+            return False
+        return True
+
+    def _pop_prefetched(self):
+        now = time.time()
+        while self._prefetched:
+            try:
+                deadline, task = self._prefetched.popleft()
+            except IndexError:
+                break
+            if deadline - now > self.prefetch_margin:
+                return task
+            self._drop_prefetched(task)
+        return None
+
+    def _release_stale(self):
+        # release buffered tasks close to TTR, keep the rest in order
+        with self._prefetch_lock:
+            now = time.time()
+            kept = []
+            while self._prefetched:
+                try:
+                    deadline, task = self._prefetched.popleft()
+                except IndexError:
+                    break
+                if deadline - now > self.prefetch_margin:
+                    kept.append((deadline, task))
+                else:
+                    self._drop_prefetched(task)
+            self._prefetched.extendleft(reversed(kept))
+
+    def _reap(self):
+        # background thread: runs while prefetch buffer isn't empty
+        while True:
+            time.sleep(self.reap_interval)
+            try:
+                self._release_stale()
+            except Exception:
+                pass
+            with self._reaper_lock:
+                if not self._prefetched:
+                    self._reaper = None
+                    return
+
+    def _fill_prefetched(self, timeout):
+        tasks = self.queue._take_many(self.opt['tube'],
+                                      self._prefetch, timeout)
+        if not tasks:
+            return
+        # TTR of every task, it may be set by put, not by tube default
+        now = time.time()
+        ttrs = self.queue._ttr_many([task.task_id for task in tasks])
+        for task, ttr in zip(tasks, ttrs):
+            deadline = now + ttr if ttr else float('inf')
+            self._prefetched.append((deadline, task))
+        with self._reaper_lock:
+            if self._reaper is None:
+                self._reaper = threading.Thread(
+                    target=self.queue._background(self._reap))
+                self._reaper.daemon = True
+                self._reaper.start()
+
     # ----------------
     def update_options(self, **kwargs):
         """
-        Update options for current tube (such as ttl, ttr, pri and delay)
+        Update options for current tube (such as ttl, ttr, pri and delay).
+        Options must be changed here, not in `opt` directly, as arguments
+        of put are encoded once for all puts here.
         """
         self.opt.update(kwargs)
+        self._compile()
+
+    def _compile(self):
+        # arguments of put with default options, all but payload
+        self._args = (str(self.queue.space),) + tuple(
+            [str(self.opt[name]) for name in self.PUT_OPTIONS])
+        self._threshold = self.opt.get("blob_threshold")
+
+    def _options(self, kwargs):
+        """
+        Return arguments of put (all but payload) and blob threshold with
+        options overridden by kwargs. Without overrides they are taken
+        as is from precompiled ones.
+        """
+        if not kwargs:
+            return self._args, self._threshold
+        args = list(self._args)
+        for name, value in kwargs.items():
+            index = self._put_index.get(name)
+            if index is not None:
+                args[index] = str(value)
+        return tuple(args), kwargs.get("blob_threshold", self._threshold)
 
     def _produce(self, method, data, **kwargs):
         """
@@ -247,19 +531,42 @@ class Tube(object):
         :type tube: string
         :rtype: `Task` instance
         """
-        opt = dict(self.opt, **kwargs)
+        args, threshold = self._options(kwargs)
+        the_tuple = self.queue._put(
+            method, self._produce_args(data, args, threshold))
+        return Task.from_tuple(self.queue, the_tuple)
 
-        the_tuple = self.queue.tnt.call(method, (
-            str(self.queue.space),
-            str(opt["tube"]),
-            str(opt["delay"]),
-            str(opt["ttl"]),
-            str(opt["ttr"]),
-            str(opt["pri"]),
-            self.serialize(data))
-        )
+    def _produce_args(self, data, args, threshold=None):
+        payload = self.serialize(data)
+        if threshold is not None and len(payload) >= threshold:
+            payload = self.queue._blob_put(payload)
+        return args + (payload,)
 
-        return Task.from_tuple(self.queue, the_tuple)
+    def _produce_many(self, method, iterable, chunk_size=512, **kwargs):
+        """
+        Generic enqueue of many tasks. Tasks are sent in chunks of
+        `chunk_size`, every chunk is pipelined in one round trip.
+        Returns list of results in the order of input: `Task` instance
+        for enqueued task or exception instance for failed one.
+        """
+        args, threshold = self._options(kwargs)
+        iterator = iter(iterable)
+        result = []
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                break
+            calls = [(method, self._produce_args(data, args, threshold))
+                     for data in chunk]
+            for the_tuple in self.queue._put_many(calls):
+                if isinstance(the_tuple, Exception):
+                    result.append(the_tuple)
+                    continue
+                try:
+                    result.append(Task.from_tuple(self.queue, the_tuple))
+                except Queue.ZeroTupleException as e:
+                    result.append(e)
+        return result
 
     def put(self, data, **kwargs):
         """
@@ -277,7 +584,8 @@ class Tube(object):
         :type delay: int
         :type ttr: int
         :type tube: string
-        :rtype: `Task` instance
+        :rtype: `Task` instance (None if the put is spooled, see
+                :attr:`Queue.spool <tarantool_queue.Queue.spool>`)
         """
 
         method = "queue.put"
@@ -287,6 +595,44 @@ class Tube(object):
 
         return self._produce("queue.put", data, **kwargs)
 
+    def put_async(self, data, **kwargs):
+        """
+        Same as :meth:`Tube.put() <tarantool_queue.Tube.put>`, but doesn't
+        wait for the response (see :class:`MultiplexedConnection
+        <tarantool_queue.mux.MultiplexedConnection>`).
+
+        :rtype: `concurrent.futures.Future` of `Task` instance
+        """
+        method, args = self._put_call(data, kwargs)
+        return mux.then(self.queue._call_async(method, args),
+                        self._put_result)
+
+    def _put_call(self, data, kwargs):
+        # procedure and args of put, used by put_async and producer
+        args, threshold = self._options(kwargs)
+        return "queue.put", self._produce_args(data, args, threshold)
+
+    def _put_result(self, the_tuple):
+        return Task.from_tuple(self.queue, the_tuple)
+
+    def create_producer(self, batch_size=512, linger=0.005,
+                        max_buffered=10000, on_full='block',
+                        block_timeout=None):
+        """
+        Create and start :class:`BufferedProducer
+        <tarantool_queue.producer.BufferedProducer>` sending puts to this
+        tube in batches from background thread.
+
+        :param batch_size: Maximum number of puts sent in one round trip
+        :param linger: Seconds the oldest buffered put waits for a batch
+        :param max_buffered: Maximum number of buffered puts
+        :param on_full: 'block' or 'drop' puts when buffer is full
+        :param block_timeout: Seconds `put` blocks on full buffer
+        :rtype: started `BufferedProducer` instance
+        """
+        return BufferedProducer(self, batch_size, linger, max_buffered,
+                                on_full, block_timeout).start()
+
     def put_unique(self, data, **kwargs):
         """
         Same as :meth:`Tube.put() <tarantool_queue.Tube.put>` put,
@@ -302,6 +648,42 @@ class Tube(object):
         kwargs['delay'] = 0
         return self._produce("queue.urgent", data, **kwargs)
 
+    def put_many(self, iterable, chunk_size=512, **kwargs):
+        """
+        Enqueue many tasks at once. Tasks are pipelined in chunks,
+        so every chunk costs one network round trip.
+        Options are the same as for :meth:`Tube.put()
+        <tarantool_queue.Tube.put>` and are applied to every task.
+
+        :param iterable: Iterable with data for pushing into queue
+        :param chunk_size: Number of tasks sent in one round trip
+        :type chunk_size: int
+        :rtype: list of `Task` instances and exceptions for failed tasks
+                (`Queue.DataBaseError` or `Queue.ZeroTupleException`)
+                in the order of input
+        """
+        return self._produce_many("queue.put", iterable,
+                                  chunk_size, **kwargs)
+
+    def put_unique_many(self, iterable, chunk_size=512, **kwargs):
+        """
+        Same as :meth:`Tube.put_many() <tarantool_queue.Tube.put_many>`,
+        but uses :meth:`Tube.put_unique() <tarantool_queue.Tube.put_unique>`
+        for every task.
+        """
+        return self._produce_many("queue.put_unique", iterable,
+                                  chunk_size, **kwargs)
+
+    def urgent_many(self, iterable, chunk_size=512, **kwargs):
+        """
+        Same as :meth:`Tube.put_many() <tarantool_queue.Tube.put_many>`,
+        but uses :meth:`Tube.urgent() <tarantool_queue.Tube.urgent>`
+        for every task.
+        """
+        kwargs['delay'] = 0
+        return self._produce_many("queue.urgent", iterable,
+                                  chunk_size, **kwargs)
+
     def take(self, timeout=0):
         """
         If there are tasks in the queue ready for execution,
@@ -316,7 +698,53 @@ class Tube(object):
         :type timeout: int or None
         :rtype: `Task` instance or None
         """
-        return self.queue._take(self.opt['tube'], timeout)
+        if not self._prefetch:
+            return self.queue._take(self.opt['tube'], timeout)
+        task = self._pop_prefetched()
+        if task is not None:
+            return task
+        with self._prefetch_lock:
+            task = self._pop_prefetched()
+            if task is None:
+                self._fill_prefetched(timeout)
+                task = self._pop_prefetched()
+        return task
+
+    def take_many(self, count, timeout=0):
+        """
+        Take up to `count` tasks in one round trip. Waits for the first
+        task like :meth:`Tube.take() <tarantool_queue.Tube.take>`,
+        the rest is taken only if they are ready. Prefetched tasks are
+        returned first.
+
+        :param count: maximum number of tasks to take
+        :param timeout: timeout to wait for the first task
+        :type count: int
+        :type timeout: int or None
+        :rtype: list of `Task` instances (empty on timeout)
+        """
+        tasks = []
+        while len(tasks) < count:
+            task = self._pop_prefetched()
+            if task is None:
+                break
+            tasks.append(task)
+        if len(tasks) < count:
+            if tasks:
+                timeout = 0
+            tasks.extend(self.queue._take_many(self.opt['tube'],
+                                               count - len(tasks), timeout))
+        return tasks
+
+    def __iter__(self):
+        """
+        Iterate over ready tasks (drains prefetch buffer, if enabled)
+        until the tube is empty.
+        """
+        task = self.take()
+        while task is not None:
+            yield task
+            task = self.take()
 
     def kick(self, count=None):
         """
@@ -327,6 +755,25 @@ class Tube(object):
         """
         return self.queue._kick(self.opt['tube'], count)
 
+    def consume(self, handler, concurrency=1, **kwargs):
+        """
+        Start :class:`Worker <tarantool_queue.worker.Worker>` processing
+        tasks of this tube by handler in `concurrency` threads.
+        Successfully processed tasks are acked, failed ones are treated
+        by `on_error` policy.
+
+        :param handler: Callable processing `Task`
+        :param concurrency: Number of threads
+        :param on_error: 'release', 'bury', 'delete' or
+                         callable(task, exception)
+        :param release_delay: Delay for released failed tasks
+        :param take_timeout: Seconds to wait for task in one take
+        :param processes: Run handler in this number of forked processes,
+                          handler gets task data instead of task
+        :rtype: started `Worker` instance
+        """
+        return Worker(self, handler, concurrency, **kwargs).start()
+
     def statistics(self):
         """
         See :meth:`Queue.statistics() <tarantool_queue.Queue.statistics>`
@@ -340,7 +787,7 @@ class Tube(object):
         """
         return self.queue.truncate(tube=self.opt['tube'])
 
-class Queue(object):
+class Queue(QueueBase):
     """
     Tarantool queue wrapper. Surely pinned to space. May create tubes.
     By default it uses msgpack for serialization, but you may redefine
@@ -387,7 +834,7 @@ class Queue(object):
 
     @staticmethod
     def basic_deserialize(data):
-        return msgpack.unpackb(data)
+        return codec.decode(data)
 
     def __init__(self, host="localhost", port=33013, space=0, schema=None):
         if not(host and port):
@@ -400,6 +847,7 @@ class Queue(object):
         if not isinstance(space, int):
             raise Queue.BadConfigException("space must be int")
 
+        super(Queue, self).__init__()
         self.host = host
         self.port = port
         self.space = space
@@ -454,88 +902,181 @@ class Queue(object):
     def deserialize(self):
         self._deserialize = self.basic_deserialize
 
-    # ----------------
-    @property
-    def tarantool_connection(self):
-        """
-        Tarantool Connection class: must be class with methods call and
-        __init__. If it sets to None or deleted - it will use the default
-        tarantool.Connection class for connection.
-        """
-        if not hasattr(self, '_conclass'):
-            self._conclass = tarantool.Connection
-        return self._conclass
-
-    @tarantool_connection.setter
-    def tarantool_connection(self, cls):
-        if 'call' not in dir(cls) or '__init__' not in dir(cls):
-            if cls is not None:
-                raise TypeError("Connection class must have"
-                                " connect and call methods or be None")
-        self._conclass = cls if cls is not None else tarantool.Connection
-        if hasattr(self, '_tnt'):
-            self.__dict__.pop('_tnt')
-
-    @tarantool_connection.deleter
-    def tarantool_connection(self):
-        if hasattr(self, '_conclass'):
-            self.__dict__.pop('_conclass')
-        if hasattr(self, '_tnt'):
-            self.__dict__.pop('_tnt')
+    def _deserializer(self, tube):
+        # deserialize function of tube without creating Tube object
+        tube = self._tube_of(tube)
+        if tube is None:
+            return self.deserialize
+        return tube.deserialize
 
     # ----------------
     @property
-    def tarantool_lock(self):
+    def lease_keeper(self):
         """
-        Locking class: must be locking instance with methods __enter__
-        and __exit__. If it sets to None or delete - it will use default
-        threading.Lock() instance for locking in the connecting.
+        Lease keeper: must be `LeaseKeeper` instance or None. When it's set,
+        every taken task is touched in background until it's acked,
+        released, buried or deleted. If it sets to None or deleted - keeper
+        is stopped.
         """
-        if not hasattr(self, '_lockinst'):
-            self._lockinst = threading.Lock()
-        return self._lockinst
-
-    @tarantool_lock.setter
-    def tarantool_lock(self, lock):
-        if '__enter__' not in dir(lock) or '__exit__' not in dir(lock):
-            if lock is not None:
-                raise TypeError("Lock class must have `__enter__`"
-                                " and `__exit__` methods or be None")
-        self._lockinst = lock if lock is not None else threading.Lock()
+        return self.__dict__.get('_lease_keeper')
+
+    @lease_keeper.setter
+    def lease_keeper(self, keeper):
+        if not (isinstance(keeper, LeaseKeeper) or keeper is None):
+            raise TypeError("keeper must be LeaseKeeper "
+                            "or None, but not " + str(type(keeper)))
+        del self.lease_keeper
+        if keeper is not None:
+            self._lease_keeper = keeper
+
+    @lease_keeper.deleter
+    def lease_keeper(self):
+        if hasattr(self, '_lease_keeper'):
+            self.__dict__.pop('_lease_keeper').stop()
+
+    def create_lease_keeper(self, margin=0.5, interval=0.1):
+        """
+        Renew TTR of all tasks taken from this Queue in background.
 
-    @tarantool_lock.deleter
-    def tarantool_lock(self):
-        if hasattr(self, '_lockinst'):
-            self.__dict__.pop('_lockinst')
+        :param margin: Part of TTR after which task is touched
+        :param interval: Seconds between checks of taken tasks
+        :type margin: float
+        :rtype: started `LeaseKeeper` instance
+        """
+        keeper = LeaseKeeper(self, margin, interval)
+        self.lease_keeper = keeper
+        return keeper.start()
 
     # ----------------
     @property
-    def tnt(self):
-        if not hasattr(self, '_tnt'):
-            with self.tarantool_lock:
-                if not hasattr(self, '_tnt'):
-                    self._tnt = self.tarantool_connection(self.host, self.port,
-                                                          schema=self.schema)
-        return self._tnt
+    def blob_store(self):
+        """
+        Store of large payloads: must have `put`, `get` and `delete`
+        methods (see :class:`DirectoryBlobStore
+        <tarantool_queue.blob.DirectoryBlobStore>`) or be None. Tubes with
+        `blob_threshold` option keep bigger payloads in the store and put
+        only references to them into the queue. Blob is deleted when its
+        task is acked or deleted (but not when it's truncated or expired).
+        References are resolved only for tubes with `blob_threshold`, so
+        consumers must create the tube with this option too; payloads of
+        other tubes are never taken for references.
+        """
+        return self.__dict__.get('_blob_store')
+
+    @blob_store.setter
+    def blob_store(self, store):
+        if store is not None:
+            for method in ('put', 'get', 'delete'):
+                if not hasattr(getattr(store, method, None), '__call__'):
+                    raise TypeError("blob store must have put, get and "
+                                    "delete methods or be None")
+        del self.blob_store
+        if store is not None:
+            self._blob_store = store
+
+    @blob_store.deleter
+    def blob_store(self):
+        if hasattr(self, '_blob_store'):
+            self.__dict__.pop('_blob_store')
+
+    def _blob_put(self, payload):
+        if not hasattr(self, '_blob_store'):
+            raise Queue.BadConfigException("blob_threshold is set, "
+                                           "but blob_store is not")
+        return codec.pack_reference(self._blob_store.put(payload))
+
+    def _blob_reference(self, tube, raw_data):
+        # reference to blob store, if the tube keeps blobs there
+        tube = self._tube_of(tube)
+        if tube is None or tube._threshold is None:
+            return None
+        return codec.unpack_reference(raw_data)
+
+    def _blob_get(self, tube, raw_data):
+        reference = self._blob_reference(tube, raw_data)
+        if reference is None:
+            return raw_data
+        if not hasattr(self, '_blob_store'):
+            raise Queue.BadConfigException("task data is in blob store, "
+                                           "but blob_store is not set")
+        return self._blob_store.get(reference)
+
+    def _blob_delete(self, tasks, results):
+        # deletes blobs of successfully acked or deleted tasks
+        if not hasattr(self, '_blob_store'):
+            return
+        for task, result in zip(tasks, results):
+            if result is not True or not hasattr(task, 'raw_data'):
+                continue
+            reference = self._blob_reference(task.tube, task.raw_data)
+            if reference is not None:
+                self._blob_store.delete(reference)
 
     def _take(self, tube, timeout=0):
         args = [str(self.space), str(tube)]
         if timeout is not None:
             args.append(str(timeout))
-        the_tuple = self.tnt.call("queue.take", tuple(args))
+        if timeout != 0 and hasattr(self, '_long_poll'):
+            self._check_fork()
+            call = functools.partial(self._long_poll.call, tube)
+            the_tuple = self._call("queue.take", tuple(args), call)
+        else:
+            the_tuple = self._call("queue.take", tuple(args))
         if the_tuple.rowcount == 0:
             return None
-        return Task.from_tuple(self, the_tuple)
+        task = Task.from_tuple(self, the_tuple)
+        self.task_tracker.track(task)
+        if hasattr(self, '_lease_keeper'):
+            self._lease_keeper.keep(task)
+        return task
+
+    def _take_many(self, tube, count, timeout=0):
+        task = self._take(tube, timeout)
+        if task is None:
+            return []
+        tasks = [task]
+        if count > 1:
+            args = (str(self.space), str(tube), '0')
+            calls = [("queue.take", args)] * (count - 1)
+            try:
+                results = self._call_many(calls)
+            except Exception:
+                self._release_taken(tasks)
+                raise
+            error = None
+            for the_tuple in results:
+                if isinstance(the_tuple, Exception):
+                    error = error or the_tuple
+                elif the_tuple.rowcount:
+                    tasks.append(Task.from_tuple(self, the_tuple))
+            if error is not None:
+                # the caller never gets tasks taken in this batch
+                self._release_taken(tasks)
+                raise error
+        for task in tasks[1:]:
+            self.task_tracker.track(task)
+            if hasattr(self, '_lease_keeper'):
+                self._lease_keeper.keep(task)
+        return tasks
+
+    def _release_taken(self, tasks):
+        # best effort: tasks not released come back after their TTR
+        for task in tasks:
+            task.modified = True
+        try:
+            self.release_many(tasks)
+        except Exception:
+            pass
 
     def _ack(self, task_id):
         args = (str(self.space), task_id)
-        the_tuple = self.tnt.call("queue.ack", args)
+        the_tuple = self._call("queue.ack", args)
         return the_tuple.return_code == 0
 
     def _release(self, task_id, delay=0, ttl=0):
-        the_tuple = self.tnt.call("queue.release", (
+        the_tuple = self._call("queue.release", (
             str(self.space),
-            str(task_id),
+            task_id,
             str(delay),
             str(ttl)
         ))
@@ -543,22 +1084,41 @@ class Queue(object):
 
     def _requeue(self, task_id):
         args = (str(self.space), task_id)
-        the_tuple = self.tnt.call("queue.requeue", args)
+        the_tuple = self._call("queue.requeue", args)
         return the_tuple.return_code == 0
 
     def _bury(self, task_id):
         args = (str(self.space), task_id)
-        the_tuple = self.tnt.call("queue.bury", args)
+        the_tuple = self._call("queue.bury", args)
         return the_tuple.return_code == 0
 
     def _delete(self, task_id):
         args = (str(self.space), task_id)
-        the_tuple = self.tnt.call("queue.delete", args)
+        the_tuple = self._call("queue.delete", args)
         return the_tuple.return_code == 0
 
     def _meta(self, task_id):
         args = (str(self.space), task_id)
-        the_tuple = self.tnt.call("queue.meta", args)
+        the_tuple = self._call("queue.meta", args)
+        return self._meta_from_tuple(the_tuple)
+
+    def _ttr_many(self, task_ids):
+        """
+        Return TTR of tasks in seconds (0 if TTR isn't set or the task
+        is gone) in one round trip.
+        """
+        calls = [("queue.meta", (str(self.space), task_id))
+                 for task_id in task_ids]
+        ttrs = []
+        for the_tuple in self._call_many(calls):
+            meta = None
+            if not isinstance(the_tuple, Exception):
+                meta = self._meta_from_tuple(the_tuple)
+            ttrs.append(meta['ttr'] / 1000000.0 if meta else 0)
+        return ttrs
+
+    @staticmethod
+    def _meta_from_tuple(the_tuple):
         if the_tuple.rowcount:
             row = list(the_tuple[0])
             for index in [3, 7, 8, 9, 10, 11, 12]:
@@ -582,19 +1142,19 @@ class Queue(object):
         :rtype: `Task` instance
         """
         args = (str(self.space), task_id)
-        the_tuple = self.tnt.call("queue.peek", args)
+        the_tuple = self._call("queue.peek", args)
         return Task.from_tuple(self, the_tuple)
 
     def _dig(self, task_id):
         args = (str(self.space), task_id)
-        the_tuple = self.tnt.call("queue.dig", args)
+        the_tuple = self._call("queue.dig", args)
         return the_tuple.return_code == 0
 
     def _kick(self, tube, count=None):
         args = [str(self.space), str(tube)]
         if count:
             args.append(str(count))
-        the_tuple = self.tnt.call("queue.kick", tuple(args))
+        the_tuple = self._call("queue.kick", tuple(args))
         return the_tuple.return_code == 0
 
     def truncate(self, tube):
@@ -606,7 +1166,7 @@ class Queue(object):
         :rtype: int
         """
         args = (str(self.space), tube)
-        deleted = self.tnt.call("queue.truncate", args)
+        deleted = self._call("queue.truncate", args)
         return unpack_long(deleted[0][0])
 
     def statistics(self, tube=None):
@@ -620,34 +1180,34 @@ class Queue(object):
             >>> tube.statistics()
             # or queue.statistics('tube0')
             # or queue.statistics(tube.opt['tube'])
-            {'ack': '233',
-            'meta': '35',
-            'put': '153',
-            'release': '198',
-            'take': '431',
-            'take_timeout': '320',
-            'tasks': {'buried': '0',
-                    'delayed': '0',
-                    'done': '0',
-                    'ready': '0',
-                    'taken': '0',
-                    'total': '0'},
-            'urgent': '80'}
+            {'ack': 233,
+            'meta': 35,
+            'put': 153,
+            'release': 198,
+            'take': 431,
+            'take_timeout': 320,
+            'tasks': {'buried': 0,
+                    'delayed': 0,
+                    'done': 0,
+                    'ready': 0,
+                    'taken': 0,
+                    'total': 0},
+            'urgent': 80}
             or
             >>> queue.statistics()
-            {'tube0': {'ack': '233',
-                    'meta': '35',
-                    'put': '153',
-                    'release': '198',
-                    'take': '431',
-                    'take_timeout': '320',
-                    'tasks': {'buried': '0',
-                            'delayed': '0',
-                            'done': '0',
-                            'ready': '0',
-                            'taken': '0',
-                            'total': '0'},
-                    'urgent': '80'}}
+            {'tube0': {'ack': 233,
+                    'meta': 35,
+                    'put': 153,
+                    'release': 198,
+                    'take': 431,
+                    'take_timeout': 320,
+                    'tasks': {'buried': 0,
+                            'delayed': 0,
+                            'done': 0,
+                            'ready': 0,
+                            'taken': 0,
+                            'total': 0},
+                    'urgent': 80}}
 
         :param tube: Name of tube
         :type tube: string or None
@@ -655,33 +1215,150 @@ class Queue(object):
         """
         args = (str(self.space),)
         args = args if tube is None else args + (tube,)
-        stat = self.tnt.call("queue.statistics", args)
+        stat = self._call("queue.statistics", args)
         ans = {}
         if stat.rowcount > 0:
-            for k, v in dict(zip(stat[0][0::2], stat[0][1::2])).iteritems():
-                k_t = list(
-                    re.match(r'space([^.]*)\.(.*)\.([^.]*)', k).groups()
-                )
-                if int(k_t[0]) != self.space:
-                    continue
-                if k_t[1].endswith('.tasks'):
-                    k_t = k_t[0:1] + k_t[1].split('.') + k_t[2:3]
-                if k_t[1] not in ans:
-                    ans[k_t[1]] = {'tasks': {}}
-                if len(k_t) == 4:
-                    ans[k_t[1]]['tasks'][k_t[-1]] = v
-                elif len(k_t) == 3:
-                    ans[k_t[1]][k_t[-1]] = v
-                else:
-                    raise Queue.ZeroTupleException('stats: \
-                            error when parsing respons')
+            tubes = None if tube is None else (tube,)
+            ans = parse_statistics(self.space, stat[0], tubes)
         return ans[tube] if tube else ans
 
+    def statistics_many(self, tubes):
+        """
+        Return statistics of many tubes, fetched and parsed in one pass.
+        Tubes without statistics get empty dict.
+
+        :param tubes: Names of tubes
+        :type tubes: iterable
+        :rtype: dict of tube name and its statistics
+        """
+        tubes = set(tubes)
+        stat = self._call("queue.statistics", (str(self.space),))
+        ans = {}
+        if stat.rowcount > 0:
+            ans = parse_statistics(self.space, stat[0], tubes)
+        for tube in tubes:
+            ans.setdefault(tube, {})
+        return ans
+
     def _touch(self, task_id):
         args = (str(self.space), task_id)
-        the_tuple = self.tnt.call("queue.touch", tuple(args))
+        the_tuple = self._call("queue.touch", tuple(args))
         return the_tuple.return_code == 0
 
+    def touch_many(self, tasks):
+        """
+        Same as :meth:`Task.touch() <tarantool_queue.Task.touch>` for many
+        tasks in one round trip.
+
+        :param tasks: list of `Task` instances or task ids
+        :rtype: list of booleans (or exceptions for failed touches)
+        """
+        task_ids = [getattr(task, 'task_id', task) for task in tasks]
+        calls = [("queue.touch", (str(self.space), task_id))
+                 for task_id in task_ids]
+        return [self._bulk_result(the_tuple)
+                for the_tuple in self._call_many(calls)]
+
+    # ----------------
+    @staticmethod
+    def _task_ids(tasks):
+        task_ids = []
+        for task in tasks:
+            if isinstance(task, Task):
+                task.modified = True
+                task = task.task_id
+            task_ids.append(task)
+        return task_ids
+
+    @staticmethod
+    def _bulk_result(the_tuple):
+        if isinstance(the_tuple, Exception):
+            return the_tuple
+        return the_tuple.return_code == 0
+
+    def _bulk(self, method, tasks):
+        calls = [(method, (str(self.space), task_id))
+                 for task_id in self._task_ids(tasks)]
+        return [self._bulk_result(the_tuple)
+                for the_tuple in self._call_many(calls)]
+
+    def ack_many(self, tasks):
+        """
+        Same as :meth:`Task.ack() <tarantool_queue.Task.ack>` for many tasks
+        at once, in one round trip.
+
+        :param tasks: `Task` instances or task ids
+        :type tasks: iterable
+        :rtype: list of booleans or `Queue.DataBaseError` instances
+                for failed tasks in the order of input
+        """
+        tasks = list(tasks)
+        results = self._bulk("queue.ack", tasks)
+        self._blob_delete(tasks, results)
+        return results
+
+    def release_many(self, tasks, delay=0, ttl=0):
+        """
+        Same as :meth:`Task.release() <tarantool_queue.Task.release>`
+        for many tasks at once, in one round trip.
+
+        :param tasks: `Task` instances or task ids
+        :param ttl: new time to live
+        :param delay: new delay for tasks
+        :type tasks: iterable
+        :type ttl: int
+        :type delay: int
+        :rtype: list of `Task` instances or exceptions for failed tasks
+                in the order of input
+        """
+        calls = [("queue.release", (
+            str(self.space), task_id, str(delay), str(ttl)
+        )) for task_id in self._task_ids(tasks)]
+        result = []
+        for the_tuple in self._call_many(calls):
+            if not isinstance(the_tuple, Exception):
+                try:
+                    the_tuple = Task.from_tuple(self, the_tuple)
+                except Queue.ZeroTupleException as e:
+                    the_tuple = e
+            result.append(the_tuple)
+        return result
+
+    def bury_many(self, tasks):
+        """
+        Same as :meth:`Task.bury() <tarantool_queue.Task.bury>` for many
+        tasks at once. See :meth:`Queue.ack_many()
+        <tarantool_queue.Queue.ack_many>` for params and result.
+        """
+        return self._bulk("queue.bury", tasks)
+
+    def delete_many(self, tasks):
+        """
+        Same as :meth:`Task.delete() <tarantool_queue.Task.delete>` for many
+        tasks at once. See :meth:`Queue.ack_many()
+        <tarantool_queue.Queue.ack_many>` for params and result.
+        """
+        tasks = list(tasks)
+        results = self._bulk("queue.delete", tasks)
+        self._blob_delete(tasks, results)
+        return results
+
+    def requeue_many(self, tasks):
+        """
+        Same as :meth:`Task.requeue() <tarantool_queue.Task.requeue>` for
+        many tasks at once. See :meth:`Queue.ack_many()
+        <tarantool_queue.Queue.ack_many>` for params and result.
+        """
+        return self._bulk("queue.requeue", tasks)
+
+    def dig_many(self, tasks):
+        """
+        Same as :meth:`Task.dig() <tarantool_queue.Task.dig>` for many
+        tasks at once. See :meth:`Queue.ack_many()
+        <tarantool_queue.Queue.ack_many>` for params and result.
+        """
+        return self._bulk("queue.dig", tasks)
+
     def tube(self, name, **kwargs):
         """
         Create Tube object, if not created before, and set kwargs.
@@ -692,11 +1369,15 @@ class Queue(object):
         :param ttl: default TTL for Tube tasks (Not necessary, will be 0)
         :param ttr: default TTR for Tube tasks (Not necessary, will be 0)
         :param pri: default priority for Tube tasks (Not necessary)
+        :param blob_threshold: payloads of this size or bigger are kept in
+                               `blob_store`, set it for consumers too
+                               (Not necessary, no blobs)
         :type name: string
         :type ttl: int
         :type delay: int
         :type ttr: int
         :type pri: int
+        :type blob_threshold: int
         :rtype: `Tube` instance
         """
         if name in self.tubes:
@@ -1,10 +1,17 @@
 # -*- coding: utf-8 -*-
 import struct
 import msgpack
-import threading
+import functools
+import itertools
 
 import tarantool
 
+from . import codec
+from .base import QueueBase
+from . import mux
+from .worker import Worker
+from .producer import BufferedProducer
+
 
 def unpack_long_long(value):
     return struct.unpack("<q", value)[0]
@@ -14,6 +21,17 @@ def unpack_long(value):
     return struct.unpack("<l", value)[0]
 
 
+def _task_arg(task_id):
+    # id of task as procedure argument: packed ids given by user are
+    # unpacked, as `TTask.task_id` is
+    if isinstance(task_id, bytes):
+        task_id = unpack_long_long(task_id)
+    return str(task_id)
+
+
+_MISSING = object()
+
+
 class TTask(object):
     """
     Tarantool queue task wrapper.
@@ -22,14 +40,34 @@ class TTask(object):
 
         Don't instantiate it with your bare hands
     """
+    __slots__ = ('task_id', 'tube', 'raw_data', 'queue', '_deserialize',
+                 '_data', '_modified', '_tracked', '__weakref__')
+
     def __init__(self, queue, task_id=0,
-                 tube="", raw_data=None):
-        self.task_id = unpack_long_long(task_id)
+                 tube="", raw_data=None, deserialize=None):
+        self.task_id = task_id
         self.tube = tube
         self.raw_data = raw_data
         self.queue = queue
+        self._deserialize = deserialize
+        self._data = _MISSING
+        self._tracked = None
         self.modified = False
 
+    @property
+    def modified(self):
+        """
+        True if the task is acked, released, buried etc. Tasks taken, but
+        not modified are released, when garbage collected.
+        """
+        return self._modified
+
+    @modified.setter
+    def modified(self, value):
+        self._modified = value
+        if value and self._tracked is not None:
+            self.queue.task_tracker.forget(self)
+
     def ack(self):
         """
         Confirm completion of a task. Before marking a task as complete
@@ -39,6 +77,21 @@ class TTask(object):
         self.modified = True
         return self.queue._ack(self.task_id)
 
+    def ack_async(self):
+        """
+        Same as :meth:`TTask.ack() <tarantool_queue.TTask.ack>`, but
+        doesn't wait for the response (see
+        :class:`MultiplexedConnection
+        <tarantool_queue.mux.MultiplexedConnection>`).
+
+        :rtype: `concurrent.futures.Future` of bool
+        """
+        self.modified = True
+        future = self.queue._call_async(
+            "box.queue.ack", (str(self.queue.space), str(self.task_id)))
+        return mux.then(future,
+                        lambda the_tuple: the_tuple.return_code == 0)
+
     def release(self, **kwargs):
         """
         Return a task back to the queue: the task is not executed.
@@ -61,14 +114,28 @@ class TTask(object):
         self.modified = True
         return self.queue._delete(self.task_id)
 
+    @property
+    def payload(self):
+        """
+        Raw task data as `memoryview` (without copying).
+        """
+        if self.raw_data is None:
+            return None
+        return memoryview(self.raw_data)
+
     @property
     def data(self):
+        """
+        Task data deserialized on first access.
+        """
         if not self.raw_data:
             return None
-        if not hasattr(self, '_decoded_data'):
-            data = self.queue.tube(self.tube).deserialize(self.raw_data)
-            self._decoded_data = data
-        return self._decoded_data
+        if self._data is _MISSING:
+            deserialize = self._deserialize
+            if deserialize is None:
+                deserialize = self.queue._deserializer(self.tube)
+            self._data = deserialize(self.raw_data)
+        return self._data
 
     def __str__(self):
         args = (
@@ -76,10 +143,6 @@ class TTask(object):
         )
         return "Task (id: {0}, tube:{1}, space:{2})".format(*args)
 
-    def __del__(self):
-        if not self.modified:
-            self.release()
-
     @classmethod
     def from_tuple(cls, queue, the_tuple):
         if the_tuple is None:
@@ -91,9 +154,10 @@ class TTask(object):
             raise TQueue.NoDataException('no data in the task')
         return cls(
             queue,
-            task_id=row[0],
+            task_id=unpack_long_long(row[0]),
             tube=row[4],
             raw_data=row[8],
+            deserialize=queue._deserializer(row[4]),
         )
 
 
@@ -119,9 +183,16 @@ class TTube(object):
             'tube': name
         }
         self.opt.update(kwargs)
+        self._compile()
         self._serialize = None
         self._deserialize = None
 
+    #: Options passed to `box.queue.put` after space, in order of
+    #: arguments.
+    PUT_OPTIONS = ('tube', 'limits', 'pri', 'delay', 'ttr', 'ttl', 'retry')
+    _put_index = dict((name, index + 1)
+                      for index, name in enumerate(PUT_OPTIONS))
+
     # ----------------
     @property
     def serialize(self):
@@ -159,9 +230,32 @@ class TTube(object):
     # ----------------
     def update_options(self, **kwargs):
         """
-        Update options for current tube (such as ttl, ttr, pri and delay)
+        Update options for current tube (such as ttl, ttr, pri and delay).
+        Options must be changed here, not in `opt` directly, as arguments
+        of put are encoded once for all puts here.
         """
         self.opt.update(kwargs)
+        self._compile()
+
+    def _compile(self):
+        # arguments of put with default options, all but payload
+        self._args = (str(self.queue.space),) + tuple(
+            [str(self.opt[name]) for name in self.PUT_OPTIONS])
+
+    def _options(self, kwargs):
+        """
+        Return arguments of put (all but payload) with options overridden
+        by kwargs. Without overrides they are taken as is from precompiled
+        ones.
+        """
+        if not kwargs:
+            return self._args
+        args = list(self._args)
+        for name, value in kwargs.items():
+            index = self._put_index.get(name)
+            if index is not None:
+                args[index] = str(value)
+        return tuple(args)
 
     def put(self, data, **kwargs):
         """
@@ -184,25 +278,92 @@ class TTube(object):
         :type delay: int
         :type ttr: int
         :type tube: string
-        :rtype: int
+        :rtype: int (None if the put is spooled, see
+                :attr:`TQueue.spool <tarantool_queue.TQueue.spool>`)
         """
-        opt = dict(self.opt, **kwargs)
-
         method = "box.queue.put"
 
-        the_tuple = self.queue.tnt.call(method, (
-            str(self.queue.space),
-            str(opt["tube"]),
-            str(opt["limits"]),
-            str(opt["pri"]),
-            str(opt["delay"]),
-            str(opt["ttr"]),
-            str(opt["ttl"]),
-            str(opt["retry"]),
-            self.serialize(data))
-        )
+        the_tuple = self.queue._put(
+            method, self._put_args(data, self._options(kwargs)))
+        if the_tuple is None:
+            return None
+        return unpack_long_long(the_tuple[0][0])
+
+    def put_async(self, data, **kwargs):
+        """
+        Same as :meth:`TTube.put() <tarantool_queue.TTube.put>`, but
+        doesn't wait for the response (see :class:`MultiplexedConnection
+        <tarantool_queue.mux.MultiplexedConnection>`).
+
+        :rtype: `concurrent.futures.Future` of int
+        """
+        method, args = self._put_call(data, kwargs)
+        return mux.then(self.queue._call_async(method, args),
+                        self._put_result)
+
+    def _put_call(self, data, kwargs):
+        # procedure and args of put, used by put_async and producer
+        return "box.queue.put", self._put_args(data, self._options(kwargs))
+
+    @staticmethod
+    def _put_result(the_tuple):
+        if the_tuple.rowcount < 1:
+            raise TQueue.ZeroTupleException('error creating task')
         return unpack_long_long(the_tuple[0][0])
 
+    def create_producer(self, batch_size=512, linger=0.005,
+                        max_buffered=10000, on_full='block',
+                        block_timeout=None):
+        """
+        Create and start :class:`BufferedProducer
+        <tarantool_queue.producer.BufferedProducer>` sending puts to this
+        tube in batches from background thread.
+
+        :param batch_size: Maximum number of puts sent in one round trip
+        :param linger: Seconds the oldest buffered put waits for a batch
+        :param max_buffered: Maximum number of buffered puts
+        :param on_full: 'block' or 'drop' puts when buffer is full
+        :param block_timeout: Seconds `put` blocks on full buffer
+        :rtype: started `BufferedProducer` instance
+        """
+        return BufferedProducer(self, batch_size, linger, max_buffered,
+                                on_full, block_timeout).start()
+
+    def _put_args(self, data, args):
+        return args + (self.serialize(data),)
+
+    def put_many(self, iterable, chunk_size=512, **kwargs):
+        """
+        Enqueue many tasks at once. Tasks are pipelined in chunks,
+        so every chunk costs one network round trip.
+        Options are the same as for :meth:`TTube.put()
+        <tarantool_queue.TTube.put>` and are applied to every task.
+
+        :param iterable: Iterable with data for pushing into queue
+        :param chunk_size: Number of tasks sent in one round trip
+        :type chunk_size: int
+        :rtype: list of task ids (int) and exceptions for failed tasks
+                in the order of input
+        """
+        args = self._options(kwargs)
+        iterator = iter(iterable)
+        result = []
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                break
+            calls = [("box.queue.put", self._put_args(data, args))
+                     for data in chunk]
+            for the_tuple in self.queue._put_many(calls):
+                if the_tuple is None or isinstance(the_tuple, Exception):
+                    result.append(the_tuple)
+                elif the_tuple.rowcount < 1:
+                    result.append(TQueue.ZeroTupleException(
+                        'error creating task'))
+                else:
+                    result.append(unpack_long_long(the_tuple[0][0]))
+        return result
+
     def take(self, timeout=0):
         """
         If there are tasks in the queue ready for execution,
@@ -219,8 +380,27 @@ class TTube(object):
         """
         return self.queue._take(self.opt['tube'], timeout)
 
+    def consume(self, handler, concurrency=1, **kwargs):
+        """
+        Start :class:`Worker <tarantool_queue.worker.Worker>` processing
+        tasks of this tube by handler in `concurrency` threads.
+        Successfully processed tasks are acked, failed ones are treated
+        by `on_error` policy.
+
+        :param handler: Callable processing `TTask`
+        :param concurrency: Number of threads
+        :param on_error: 'release', 'bury', 'delete' or
+                         callable(task, exception)
+        :param release_delay: Delay for released failed tasks
+        :param take_timeout: Seconds to wait for task in one take
+        :param processes: Run handler in this number of forked processes,
+                          handler gets task data instead of task
+        :rtype: started `Worker` instance
+        """
+        return Worker(self, handler, concurrency, **kwargs).start()
+
 
-class TQueue(object):
+class TQueue(QueueBase):
     """
     Tarantool queue wrapper. Surely pinned to space. May create tubes.
     By default it uses msgpack for serialization, but you may redefine
@@ -270,7 +450,7 @@ class TQueue(object):
 
     @staticmethod
     def basic_deserialize(data):
-        return msgpack.unpackb(data)
+        return codec.decode(data)
 
     def __init__(self, host="localhost", port=33013, space=0, schema=None):
         if not(host and port):
@@ -283,6 +463,7 @@ class TQueue(object):
         if not isinstance(space, int):
             raise TQueue.BadConfigException("space must be int")
 
+        super(TQueue, self).__init__()
         self.host = host
         self.port = port
         self.space = space
@@ -337,96 +518,112 @@ class TQueue(object):
     def deserialize(self):
         self._deserialize = self.basic_deserialize
 
-    # ----------------
-    @property
-    def tarantool_connection(self):
-        """
-        Tarantool Connection class: must be class with methods call and
-        __init__. If it sets to None or deleted - it will use the default
-        tarantool.Connection class for connection.
-        """
-        if not hasattr(self, '_conclass'):
-            self._conclass = tarantool.Connection
-        return self._conclass
-
-    @tarantool_connection.setter
-    def tarantool_connection(self, cls):
-        if 'call' not in dir(cls) or '__init__' not in dir(cls):
-            if cls is not None:
-                raise TypeError("Connection class must have"
-                                " connect and call methods or be None")
-        self._conclass = cls if cls is not None else tarantool.Connection
-        if hasattr(self, '_tnt'):
-            self.__dict__.pop('_tnt')
-
-    @tarantool_connection.deleter
-    def tarantool_connection(self):
-        if hasattr(self, '_conclass'):
-            self.__dict__.pop('_conclass')
-        if hasattr(self, '_tnt'):
-            self.__dict__.pop('_tnt')
-
-    # ----------------
-    @property
-    def tarantool_lock(self):
-        """
-        Locking class: must be locking instance with methods __enter__
-        and __exit__. If it sets to None or delete - it will use default
-        threading.Lock() instance for locking in the connecting.
-        """
-        if not hasattr(self, '_lockinst'):
-            self._lockinst = threading.Lock()
-        return self._lockinst
-
-    @tarantool_lock.setter
-    def tarantool_lock(self, lock):
-        if '__enter__' not in dir(lock) or '__exit__' not in dir(lock):
-            if lock is not None:
-                raise TypeError("Lock class must have `__enter__`"
-                                " and `__exit__` methods or be None")
-        self._lockinst = lock if lock is not None else threading.Lock()
-
-    @tarantool_lock.deleter
-    def tarantool_lock(self):
-        if hasattr(self, '_lockinst'):
-            self.__dict__.pop('_lockinst')
-
-    # ----------------
-    @property
-    def tnt(self):
-        if not hasattr(self, '_tnt'):
-            with self.tarantool_lock:
-                if not hasattr(self, '_tnt'):
-                    self._tnt = self.tarantool_connection(self.host, self.port,
-                                                          schema=self.schema)
-        return self._tnt
+    def _deserializer(self, tube):
+        # deserialize function of tube without creating TTube object
+        tube = self._tube_of(tube)
+        if tube is None:
+            return self.deserialize
+        return tube.deserialize
 
     def _take(self, tube, timeout=0):
         args = [str(self.space), str(tube)]
         if timeout is not None:
             args.append(str(timeout))
-        the_tuple = self.tnt.call("box.queue.take", tuple(args))
+        if timeout != 0 and hasattr(self, '_long_poll'):
+            self._check_fork()
+            call = functools.partial(self._long_poll.call, tube)
+            the_tuple = self._call("box.queue.take", tuple(args), call)
+        else:
+            the_tuple = self._call("box.queue.take", tuple(args))
         if the_tuple.rowcount == 0:
             return None
-        return TTask.from_tuple(self, the_tuple)
+        task = TTask.from_tuple(self, the_tuple)
+        self.task_tracker.track(task)
+        return task
 
     def _ack(self, task_id):
-        args = (str(self.space), str(task_id))
-        the_tuple = self.tnt.call("box.queue.ack", args)
+        args = (str(self.space), _task_arg(task_id))
+        the_tuple = self._call("box.queue.ack", args)
         return the_tuple.return_code == 0
 
     def _release(self, task_id, prio=0x7fff, delay=0, ttr=300, ttl=0, retry=5):
-        the_tuple = self.tnt.call("box.queue.release", (
+        the_tuple = self._call("box.queue.release", (
             str(self.space),
-            str(task_id),
+            _task_arg(task_id),
         ))
         return TTask.from_tuple(self, the_tuple)
 
     def _delete(self, task_id):
-        args = (str(self.space), str(task_id))
-        the_tuple = self.tnt.call("box.queue.delete", args)
+        args = (str(self.space), _task_arg(task_id))
+        the_tuple = self._call("box.queue.delete", args)
         return the_tuple.return_code == 0
 
+    # ----------------
+    @staticmethod
+    def _task_ids(tasks):
+        task_ids = []
+        for task in tasks:
+            if isinstance(task, TTask):
+                task.modified = True
+                task = task.task_id
+            task_ids.append(_task_arg(task))
+        return task_ids
+
+    @staticmethod
+    def _bulk_result(the_tuple):
+        if isinstance(the_tuple, Exception):
+            return the_tuple
+        return the_tuple.return_code == 0
+
+    def _bulk(self, method, tasks):
+        calls = [(method, (str(self.space), task_id))
+                 for task_id in self._task_ids(tasks)]
+        return [self._bulk_result(the_tuple)
+                for the_tuple in self._call_many(calls)]
+
+    def ack_many(self, tasks):
+        """
+        Same as :meth:`TTask.ack() <tarantool_queue.TTask.ack>` for many
+        tasks at once, in one round trip.
+
+        :param tasks: `TTask` instances or task ids
+        :type tasks: iterable
+        :rtype: list of booleans or `TQueue.DataBaseError` instances
+                for failed tasks in the order of input
+        """
+        return self._bulk("box.queue.ack", tasks)
+
+    def release_many(self, tasks):
+        """
+        Same as :meth:`TTask.release() <tarantool_queue.TTask.release>`
+        for many tasks at once, in one round trip.
+
+        :param tasks: `TTask` instances or task ids
+        :type tasks: iterable
+        :rtype: list of `TTask` instances or exceptions for failed tasks
+                in the order of input
+        """
+        calls = [("box.queue.release", (str(self.space), task_id))
+                 for task_id in self._task_ids(tasks)]
+        result = []
+        for the_tuple in self._call_many(calls):
+            if not isinstance(the_tuple, Exception):
+                try:
+                    the_tuple = TTask.from_tuple(self, the_tuple)
+                except (TQueue.ZeroTupleException,
+                        TQueue.NoDataException) as e:
+                    the_tuple = e
+            result.append(the_tuple)
+        return result
+
+    def delete_many(self, tasks):
+        """
+        Same as :meth:`TTask.delete() <tarantool_queue.TTask.delete>` for
+        many tasks at once. See :meth:`TQueue.ack_many()
+        <tarantool_queue.TQueue.ack_many>` for params and result.
+        """
+        return self._bulk("box.queue.delete", tasks)
+
     def tube(self, name, **kwargs):
         """
         Create Tube object, if not created before, and set kwargs.
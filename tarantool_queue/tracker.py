@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Release of abandoned tasks: taken tasks garbage collected without ack.
+"""
+import time
+import weakref
+import threading
+import collections
+
+
+class TaskTracker(object):
+    """
+    Registry of taken tasks. When a tracked task is garbage collected
+    without being acked, released, buried etc. (it's leaked), it's
+    released back to the queue by a background flusher in batches.
+
+    Nothing is sent to the server from the garbage collector: weakref
+    callback only appends to a deque, so it never blocks on connection
+    or tracker locks. The flusher thread is started when the first task
+    is tracked and exits when nothing is tracked.
+
+    :param release_many: Callable releasing list of task ids, returns
+                         list of results (exceptions for failed tasks)
+    :param interval: Seconds between flushes
+    :param batch_size: Maximum number of tasks released in one round trip
+    """
+    def __init__(self, release_many, interval=0.1, batch_size=512):
+        if not hasattr(release_many, '__call__'):
+            raise TypeError("release_many must be Callable, "
+                            "but not " + str(type(release_many)))
+        self.release_many = release_many
+        self.interval = interval
+        self.batch_size = batch_size
+        self._entries = {}
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._counters = {
+            'tracked': 0,
+            'leaked': 0,
+            'auto_released': 0,
+            'failed': 0,
+        }
+
+    def _collected(self, ref):
+        # weakref callback: runs inside garbage collector, must not lock
+        self._pending.append(ref)
+
+    def track(self, task):
+        """
+        Start tracking taken task.
+        """
+        ref = weakref.ref(task, self._collected)
+        task._tracked = ref
+        with self._lock:
+            self._entries[ref] = task.task_id
+            self._counters['tracked'] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+
+    def forget(self, task):
+        """
+        Stop tracking task (it's acked, released, etc.).
+        """
+        ref = getattr(task, '_tracked', None)
+        if ref is not None:
+            self._entries.pop(ref, None)
+            task._tracked = None
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                pass
+            with self._lock:
+                if not self._entries and not self._pending:
+                    self._thread = None
+                    return
+
+    def flush(self):
+        """
+        Release leaked tasks right now.
+
+        :rtype: int (number of released tasks)
+        """
+        with self._flush_lock:
+            task_ids = []
+            while self._pending:
+                task_id = self._entries.pop(self._pending.popleft(), None)
+                if task_id is not None:
+                    task_ids.append(task_id)
+            released = failed = 0
+            for i in range(0, len(task_ids), self.batch_size):
+                chunk = task_ids[i:i + self.batch_size]
+                try:
+                    results = self.release_many(chunk)
+                except Exception as e:
+                    results = [e] * len(chunk)
+                ok = len([result for result in results
+                          if not isinstance(result, Exception)])
+                released += ok
+                failed += len(chunk) - ok
+        with self._lock:
+            self._counters['leaked'] += len(task_ids)
+            self._counters['auto_released'] += released
+            self._counters['failed'] += failed
+        return released
+
+    def reset(self):
+        """
+        Forget all tasks. It's used in child process after `fork()`.
+        """
+        self._entries = {}
+        self._pending = collections.deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+
+    def stats(self):
+        """
+        Return tracker counters: number of tracked tasks (since start and
+        now), leaked tasks, released leaked tasks and failed releases.
+
+        :rtype: dict
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        stats['active'] = len(self._entries)
+        stats['pending'] = len(self._pending)
+        return stats
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Worker runtime: takes tasks from a tube and runs handler in a thread pool.
+"""
+import time
+import logging
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+logger = logging.getLogger(__name__)
+
+_child_handler = None
+_child_deserialize = None
+
+
+def _init_child(handler, deserialize):
+    global _child_handler, _child_deserialize
+    _child_handler = handler
+    _child_deserialize = deserialize
+
+
+def _run_child(raw_data):
+    # runs in child process: returns None on success or traceback text,
+    # because exception raised by handler may be not picklable
+    try:
+        data = _child_deserialize(raw_data) if raw_data else None
+        _child_handler(data)
+    except Exception:
+        return traceback.format_exc()
+    return None
+
+
+def _fork_pool(processes, handler, deserialize):
+    context = multiprocessing.get_context('fork')
+    return ProcessPoolExecutor(processes, context, _init_child,
+                               (handler, deserialize))
+
+
+class Worker(object):
+    """
+    Take tasks from tube and process them by handler in `concurrency`
+    threads. Task is acked when handler returns, unless handler acked,
+    released or buried it itself. When handler raises, task is treated
+    by `on_error` policy:
+
+    * 'release' - release task back with `release_delay`
+    * 'bury' - bury task (not for `TTube`)
+    * 'delete' - delete task
+    * callable(task, exception) - custom policy
+
+    At most `concurrency` tasks are in flight: next task is taken only
+    when a thread is free. :meth:`Worker.stop` stops taking and waits for
+    in-flight tasks.
+
+        >>> worker = tube.consume(handler, concurrency=8)
+        >>> worker.stop()
+
+    For CPU-bound handlers use `processes`: tasks are taken and acked by
+    the worker, but handler runs in a pool of forked child processes.
+    Children get raw payload bytes and deserialize them themselves, so
+    handler is called with task data (not `Task`) and can't ack it. When
+    handler raises, task is treated by `on_error` policy with
+    :class:`Worker.HandlerError`. When a child dies, its task is treated
+    by the policy with `BrokenProcessPool` and the pool is started anew.
+    Queue connections inherited by children are dropped, so handler may
+    use the queue as well.
+
+        >>> worker = tube.consume(handler, processes=4)
+
+    :param tube: `Tube` or `TTube` instance
+    :param handler: Callable processing `Task`
+    :param concurrency: Number of threads
+    :param on_error: Policy for failed tasks
+    :param release_delay: Delay for released failed tasks
+    :param take_timeout: Seconds to wait for task in one take
+    :param processes: Number of child processes running handler
+                      (0 - run handler in threads)
+    """
+    POLICIES = ('release', 'bury', 'delete')
+
+    class HandlerError(Exception):
+        """
+        Handler raised exception in child process. Message is the
+        traceback from the child.
+        """
+        pass
+
+    def __init__(self, tube, handler, concurrency=1, on_error='release',
+                 release_delay=0, take_timeout=1, processes=0):
+        if not hasattr(handler, '__call__'):
+            raise TypeError("handler must be Callable, "
+                            "but not " + str(type(handler)))
+        if not (on_error in self.POLICIES or hasattr(on_error, '__call__')):
+            raise TypeError("on_error must be one of %s or Callable, "
+                            "but not %r" % (self.POLICIES, on_error))
+        from .tarantool_tqueue import TTube
+        if on_error == 'bury' and isinstance(tube, TTube):
+            raise TypeError("on_error can't be 'bury' for TTube, "
+                            "its tasks can't be buried")
+        if concurrency < 1:
+            raise ValueError("concurrency must be positive")
+        if processes < 0:
+            raise ValueError("processes must be non-negative")
+        self.tube = tube
+        self.handler = handler
+        self.concurrency = max(concurrency, processes)
+        self.processes = processes
+        self.on_error = on_error
+        self.release_delay = release_delay
+        self.take_timeout = take_timeout
+        self._slots = threading.Semaphore(self.concurrency)
+        self._stop = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._processes = None
+        self._processes_lock = threading.Lock()
+        self._started = None
+        self._counters = {
+            'taken': 0,
+            'acked': 0,
+            'failed': 0,
+            'released': 0,
+            'buried': 0,
+            'deleted': 0,
+            'errors': 0,
+            'processed': 0,
+            'latency_total': 0.0,
+            'latency_max': 0.0,
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def start(self):
+        """
+        Run worker in background thread.
+
+        :rtype: `Worker` instance
+        """
+        self._started = time.time()
+        self._thread = threading.Thread(target=self.run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def run(self):
+        """
+        Take and process tasks in current thread until stopped.
+        """
+        self._started = time.time()
+        if self.processes:
+            self._processes = _fork_pool(self.processes, self.handler,
+                                         self.tube.deserialize)
+        executor = ThreadPoolExecutor(self.concurrency)
+        try:
+            while not self._stop.is_set():
+                self._slots.acquire()
+                try:
+                    task = self.tube.take(self.take_timeout)
+                except Exception:
+                    self._slots.release()
+                    self._count('errors')
+                    self._stop.wait(self.take_timeout)
+                    continue
+                if task is None:
+                    self._slots.release()
+                    continue
+                self._count('taken')
+                executor.submit(self._process, task)
+        finally:
+            executor.shutdown(wait=True)
+            if self._processes is not None:
+                self._processes.shutdown(wait=True)
+            release_prefetched = getattr(self.tube, 'release_prefetched',
+                                         None)
+            if release_prefetched is not None:
+                release_prefetched()
+            self._stopped.set()
+
+    def _process(self, task):
+        start = time.time()
+        try:
+            try:
+                self._handle(task)
+            except Exception as e:
+                self._count('failed')
+                if not task.modified:
+                    self._fail(task, e)
+            else:
+                if not task.modified:
+                    task.ack()
+                    self._count('acked')
+        except Exception:
+            # the policy or ack failed: task comes back after its TTR
+            logger.exception("worker failed to finish task %s",
+                             task.task_id)
+            self._count('errors')
+        finally:
+            elapsed = time.time() - start
+            with self._lock:
+                self._counters['processed'] += 1
+                self._counters['latency_total'] += elapsed
+                if elapsed > self._counters['latency_max']:
+                    self._counters['latency_max'] = elapsed
+            self._slots.release()
+
+    def _handle(self, task):
+        if self._processes is None:
+            return self.handler(task)
+        raw_data = task.raw_data
+        blob_reference = getattr(task.queue, '_blob_reference', None)
+        if blob_reference is not None and \
+                blob_reference(task.tube, raw_data) is not None:
+            # children can't reach blob store of the queue
+            raw_data = task.payload.tobytes()
+        processes = self._processes
+        try:
+            error = processes.submit(_run_child, raw_data).result()
+        except BrokenProcessPool:
+            self._restart_processes(processes)
+            raise
+        if error is not None:
+            raise Worker.HandlerError(error)
+
+    def _restart_processes(self, broken):
+        # child died: the pool refuses all tasks, so it's replaced once
+        with self._processes_lock:
+            if self._processes is broken:
+                self._processes = _fork_pool(self.processes, self.handler,
+                                             self.tube.deserialize)
+        broken.shutdown(wait=False)
+
+    def _fail(self, task, exc):
+        if self.on_error == 'release':
+            if self.release_delay:
+                task.release(delay=self.release_delay)
+            else:
+                task.release()
+            self._count('released')
+        elif self.on_error == 'bury':
+            task.bury()
+            self._count('buried')
+        elif self.on_error == 'delete':
+            task.delete()
+            self._count('deleted')
+        else:
+            self.on_error(task, exc)
+
+    def stop(self, timeout=None):
+        """
+        Stop taking tasks and wait until in-flight tasks are processed.
+
+        :param timeout: Seconds to wait (None - forever)
+        :rtype: boolean (True if worker has stopped)
+        """
+        self._stop.set()
+        return self.join(timeout)
+
+    def join(self, timeout=None):
+        """
+        Wait until worker stops.
+
+        :rtype: boolean (True if worker has stopped)
+        """
+        if self._started is None:
+            return True
+        return self._stopped.wait(timeout)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def stats(self):
+        """
+        Return worker counters: number of taken, processed, acked, failed,
+        released, buried and deleted tasks, errors of worker itself, tasks
+        in flight, processing latency (avg and max seconds) and throughput
+        (processed tasks per second since start).
+
+        :rtype: dict
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        processed = stats['processed']
+        elapsed = time.time() - self._started if self._started else 0
+        stats['in_flight'] = stats['taken'] - processed
+        stats['latency_avg'] = (stats.pop('latency_total') / processed
+                                if processed else 0.0)
+        stats['throughput'] = processed / elapsed if elapsed else 0.0
+        return stats
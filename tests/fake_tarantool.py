@@ -0,0 +1,541 @@
+# -*- coding: utf-8 -*-
+"""
+In-process stand-in for tarantool with queue script. Speaks the
+Tarantool 1.5 binary protocol and implements `queue.*` and `box.queue.*`
+procedures, so clients can be tested and benchmarked without a live server.
+
+    >>> server = FakeTarantool().start()
+    >>> queue = Queue(server.host, server.port, 0)
+    >>> server.stop()
+"""
+import time
+import uuid
+import heapq
+import socket
+import struct
+import itertools
+import threading
+import collections
+
+from tarantool_queue import iproto
+
+ER_PROC_LUA = 32
+
+
+class ProcedureError(Exception):
+    pass
+
+
+def _str(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return value
+
+
+def _usec(seconds):
+    return struct.pack("<q", int(seconds * 1000000))
+
+
+class FakeQueue(object):
+    """
+    State of `queue.*` and `box.queue.*` procedures, tasks are kept in
+    memory. Ready tasks are taken by priority and in FIFO order within
+    the same priority (`queue.*`: higher `pri` first, `box.queue.*`:
+    lower `pri` first), urgent tasks go first. Delayed tasks become ready
+    after delay, taken tasks with TTR are returned to ready after it and
+    tasks with TTL are deleted after it. Timers are checked on every
+    call and while blocking take waits.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.cond = threading.Condition(self.lock)
+        self.tasks = {}
+        self.ready = collections.defaultdict(list)
+        self.timers = []
+        self.seq = itertools.count()
+        self.box_ids = itertools.count(1)
+        self.stats = collections.defaultdict(
+            lambda: collections.defaultdict(int))
+
+    # ---------------- engine
+    def _new(self, task_id, space, tube, data, delay, ttl, ttr, pri,
+             urgent=False, **extra):
+        now = time.time()
+        task = {
+            "task_id": task_id, "space": _str(space), "tube": _str(tube),
+            "status": "ready", "data": data, "pri": int(pri),
+            "ttl": float(ttl), "ttr": float(ttr), "created": now,
+            "cbury": 0, "ctaken": 0, "rank": None, "at": None,
+            "expires": now + float(ttl) if float(ttl) > 0 else None,
+        }
+        task.update(extra)
+        self.tasks[task_id] = task
+        if task["expires"] is not None:
+            self._timer(task["expires"], task, "ttl")
+        self._schedule(task, float(delay), urgent)
+        self._count(task, "urgent" if urgent else "put")
+        return task
+
+    def _timer(self, at, task, kind):
+        heapq.heappush(self.timers, (at, next(self.seq), task["task_id"],
+                                     kind))
+
+    def _schedule(self, task, delay=0, urgent=False, last=False):
+        # make task ready, or delayed if delay is set
+        if delay > 0:
+            task["status"], task["at"] = "delayed", time.time() + delay
+            self._timer(task["at"], task, "delay")
+            return
+        seq = next(self.seq)
+        if urgent:
+            rank = (0, 0, -seq)
+        elif last:
+            rank = (2, 0, seq)
+        else:
+            rank = (1, -task["pri"] if task.get("box") is None
+                    else task["pri"], seq)
+        task["status"], task["rank"], task["at"] = "ready", rank, None
+        heapq.heappush(self.ready[(task["space"], task["tube"])],
+                       (rank, task["task_id"]))
+        self.cond.notify_all()
+
+    def _tick(self):
+        now = time.time()
+        while self.timers and self.timers[0][0] <= now:
+            at, _, task_id, kind = heapq.heappop(self.timers)
+            task = self.tasks.get(task_id)
+            if task is None:
+                continue
+            if kind == "ttl" and task["expires"] == at:
+                del self.tasks[task_id]
+            elif kind == "delay" and task["status"] == "delayed" and \
+                    task["at"] == at:
+                self._schedule(task)
+            elif kind == "ttr" and task["status"] == "taken" and \
+                    task["at"] == at:
+                self._expired(task)
+
+    def _expired(self, task):
+        # TTR of taken task is over
+        retry = task.get("retry")
+        if retry is not None:
+            task["retry"] = retry - 1
+            if retry <= 0:
+                task["status"] = "buried"
+                return
+        self._schedule(task)
+
+    def _pop(self, space, tube):
+        ready = self.ready[(space, tube)]
+        while ready:
+            rank, task_id = heapq.heappop(ready)
+            task = self.tasks.get(task_id)
+            if task is not None and task["status"] == "ready" and \
+                    task["rank"] == rank:
+                return task
+        return None
+
+    def _wait(self, space, tube, timeout):
+        # pop ready task, waiting up to timeout (forever if None)
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            self._tick()
+            task = self._pop(space, tube)
+            if task is not None or timeout == 0:
+                return task
+            wait = None if deadline is None else deadline - time.time()
+            if wait is not None and wait <= 0:
+                return None
+            if self.timers:
+                due = self.timers[0][0] - time.time()
+                wait = due if wait is None else min(wait, due)
+            self.cond.wait(None if wait is None else max(wait, 0.001))
+
+    def _taken(self, task):
+        task["status"] = "taken"
+        task["ctaken"] += 1
+        task["rank"] = None
+        if task["ttr"] > 0:
+            task["at"] = time.time() + task["ttr"]
+            self._timer(task["at"], task, "ttr")
+        self._count(task, "take")
+
+    def _task(self, task_id):
+        self._tick()
+        task = self.tasks.get(_str(task_id))
+        if task is None:
+            raise ProcedureError("task not found")
+        return task
+
+    def _box_task(self, task_id):
+        self._tick()
+        if not task_id.isdigit() and len(task_id) == 8:
+            task_id = struct.unpack("<q", task_id)[0]
+        task = self.tasks.get("box:%d" % int(task_id))
+        if task is None:
+            raise ProcedureError("task not found")
+        return task
+
+    @staticmethod
+    def _row(task):
+        return (task["task_id"], task["tube"], task["status"], task["data"])
+
+    @staticmethod
+    def _box_row(task):
+        return (struct.pack("<q", task["box"]), task["space"],
+                task["status"], str(task["pri"]), task["tube"],
+                str(task["ttr"]), str(task["ttl"]), str(task["retry"]),
+                task["data"])
+
+    def _count(self, task, name):
+        self.stats[(task["space"], task["tube"])][name] += 1
+
+    @staticmethod
+    def _check(task, *statuses):
+        if task["status"] not in statuses:
+            raise ProcedureError("task is %s" % task["status"])
+
+    # ---------------- queue.*
+    def put(self, space, tube, delay, ttl, ttr, pri, *data, **kwargs):
+        method = kwargs.get("method", "put")
+        space, tube = _str(space), _str(tube)
+        data = data[0] if data else b""
+        with self.lock:
+            self._tick()
+            if method == "put_unique":
+                for task in self.tasks.values():
+                    if ((task["space"], task["tube"]) == (space, tube)
+                            and task["status"] == "ready"
+                            and task["data"] == data):
+                        return []
+            task = self._new(uuid.uuid4().hex, space, tube, data, delay,
+                             ttl, ttr, pri, urgent=method == "urgent")
+            return [self._row(task)]
+
+    def take(self, space, tube, timeout=None):
+        space, tube = _str(space), _str(tube)
+        timeout = None if timeout is None else float(timeout)
+        with self.lock:
+            task = self._wait(space, tube, timeout)
+            if task is None:
+                self.stats[(space, tube)]["take_timeout"] += 1
+                return []
+            self._taken(task)
+            return [self._row(task)]
+
+    def ack(self, space, task_id):
+        with self.lock:
+            task = self._task(task_id)
+            self._check(task, "taken")
+            task["status"] = "done"
+            del self.tasks[task["task_id"]]
+            self._count(task, "ack")
+            return [self._row(task)]
+
+    def release(self, space, task_id, delay=0, ttl=0):
+        with self.lock:
+            task = self._task(task_id)
+            self._check(task, "taken")
+            if float(ttl) > 0:
+                task["expires"] = time.time() + float(ttl)
+                self._timer(task["expires"], task, "ttl")
+            self._schedule(task, float(delay))
+            self._count(task, "release")
+            return [self._row(task)]
+
+    def requeue(self, space, task_id):
+        with self.lock:
+            task = self._task(task_id)
+            self._check(task, "taken", "ready")
+            self._schedule(task, last=True)
+            self._count(task, "requeue")
+            return [self._row(task)]
+
+    def done(self, space, task_id, data=b""):
+        with self.lock:
+            task = self._task(task_id)
+            self._check(task, "taken", "ready", "delayed")
+            task["status"], task["data"], task["rank"] = "done", data, None
+            self._count(task, "done")
+            return [self._row(task)]
+
+    def delete(self, space, task_id):
+        with self.lock:
+            task = self._task(task_id)
+            del self.tasks[task["task_id"]]
+            self._count(task, "delete")
+            return [self._row(task)]
+
+    def bury(self, space, task_id):
+        with self.lock:
+            task = self._task(task_id)
+            self._check(task, "taken", "ready", "delayed")
+            task["status"], task["rank"] = "buried", None
+            task["cbury"] += 1
+            self._count(task, "bury")
+            return [self._row(task)]
+
+    def dig(self, space, task_id):
+        with self.lock:
+            task = self._task(task_id)
+            self._check(task, "buried")
+            self._schedule(task)
+            self._count(task, "dig")
+            return [self._row(task)]
+
+    def kick(self, space, tube, count=1):
+        space, tube = _str(space), _str(tube)
+        with self.lock:
+            self._tick()
+            buried = sorted(
+                (task for task in self.tasks.values()
+                 if (task["space"], task["tube"]) == (space, tube)
+                 and task["status"] == "buried"),
+                key=lambda task: task["created"])[:int(count)]
+            for task in buried:
+                self._schedule(task)
+                self._count(task, "kick")
+            return [(str(len(buried)).encode(),)]
+
+    def touch(self, space, task_id):
+        with self.lock:
+            task = self._task(task_id)
+            self._check(task, "taken")
+            if task["ttr"] > 0:
+                task["at"] = time.time() + task["ttr"]
+                self._timer(task["at"], task, "ttr")
+            self._count(task, "touch")
+            return [self._row(task)]
+
+    def peek(self, space, task_id):
+        with self.lock:
+            return [self._row(self._task(task_id))]
+
+    def meta(self, space, task_id):
+        with self.lock:
+            task = self._task(task_id)
+            self._count(task, "meta")
+            return [(
+                task["task_id"], task["tube"], task["status"],
+                _usec(task["at"] or 0), str(-task["pri"]).encode(),
+                str(task["pri"]).encode(), struct.pack("<l", 0),
+                _usec(task["created"]), _usec(task["ttl"]),
+                _usec(task["ttr"]), struct.pack("<q", task["cbury"]),
+                struct.pack("<q", task["ctaken"]), _usec(time.time()),
+            )]
+
+    def truncate(self, space, tube):
+        space, tube = _str(space), _str(tube)
+        with self.lock:
+            deleted = [task_id for task_id, task in self.tasks.items()
+                       if (task["space"], task["tube"]) == (space, tube)]
+            for task_id in deleted:
+                del self.tasks[task_id]
+            del self.ready[(space, tube)][:]
+            return [(struct.pack("<l", len(deleted)),)]
+
+    def statistics(self, space, tube=None):
+        space, tube = _str(space), _str(tube)
+        with self.lock:
+            self._tick()
+            keys = set(self.stats) | set(
+                (task["space"], task["tube"]) for task in self.tasks.values())
+            row = []
+            for key in sorted(keys):
+                if key[0] != space or tube not in (None, key[1]):
+                    continue
+                prefix = "space{0}.{1}.".format(*key)
+                statuses = collections.defaultdict(int)
+                for task in self.tasks.values():
+                    if (task["space"], task["tube"]) == key:
+                        statuses[task["status"]] += 1
+                statuses["total"] = sum(statuses.values())
+                for status in ("ready", "delayed", "taken", "buried",
+                               "done", "total"):
+                    row += [prefix + "tasks." + status, statuses[status]]
+                for name in ("put", "urgent", "take", "take_timeout", "ack",
+                             "release", "delete", "bury", "touch", "meta"):
+                    row += [prefix + name, self.stats[key][name]]
+            return [tuple(str(value).encode() for value in row)] if row else []
+
+    # ---------------- box.queue.*
+    def box_put(self, space, tube, limits, pri, delay, ttr, ttl, retry,
+                *data):
+        space, tube = _str(space), _str(tube)
+        with self.lock:
+            self._tick()
+            count = len([task for task in self.tasks.values()
+                         if (task["space"], task["tube"]) == (space, tube)])
+            if count >= int(limits):
+                raise ProcedureError("tube %s is full" % tube)
+            box_id = next(self.box_ids)
+            task = self._new("box:%d" % box_id, space, tube,
+                             data[0] if data else b"", delay, ttl, ttr, pri,
+                             box=box_id, retry=int(retry))
+            return [self._box_row(task)]
+
+    def box_take(self, space, tube, timeout=None):
+        space, tube = _str(space), _str(tube)
+        timeout = None if timeout is None else float(timeout)
+        with self.lock:
+            task = self._wait(space, tube, timeout)
+            if task is None:
+                self.stats[(space, tube)]["take_timeout"] += 1
+                return []
+            self._taken(task)
+            return [self._box_row(task)]
+
+    def box_ack(self, space, task_id):
+        with self.lock:
+            task = self._box_task(task_id)
+            self._check(task, "taken")
+            del self.tasks[task["task_id"]]
+            self._count(task, "ack")
+            return [self._box_row(task)]
+
+    def box_release(self, space, task_id):
+        with self.lock:
+            task = self._box_task(task_id)
+            self._check(task, "taken")
+            self._schedule(task)
+            self._count(task, "release")
+            return [self._box_row(task)]
+
+    def box_delete(self, space, task_id):
+        with self.lock:
+            task = self._box_task(task_id)
+            del self.tasks[task["task_id"]]
+            self._count(task, "delete")
+            return [self._box_row(task)]
+
+    def procedures(self):
+        return {
+            "queue.put": self.put,
+            "queue.urgent": lambda *args: self.put(*args, method="urgent"),
+            "queue.put_unique":
+                lambda *args: self.put(*args, method="put_unique"),
+            "queue.take": self.take,
+            "queue.ack": self.ack,
+            "queue.release": self.release,
+            "queue.requeue": self.requeue,
+            "queue.done": self.done,
+            "queue.delete": self.delete,
+            "queue.bury": self.bury,
+            "queue.dig": self.dig,
+            "queue.kick": self.kick,
+            "queue.touch": self.touch,
+            "queue.peek": self.peek,
+            "queue.meta": self.meta,
+            "queue.truncate": self.truncate,
+            "queue.statistics": self.statistics,
+            "box.queue.put": self.box_put,
+            "box.queue.take": self.box_take,
+            "box.queue.ack": self.box_ack,
+            "box.queue.release": self.box_release,
+            "box.queue.delete": self.box_delete,
+        }
+
+
+class FakeTarantool(object):
+    """
+    Threaded TCP server. Every request is handled in its own thread,
+    so blocking `queue.take` doesn't block other requests of connection
+    and responses may come out of order (matched by request sync).
+    """
+    def __init__(self, host="127.0.0.1", port=0):
+        self.queue = FakeQueue()
+        self.procedures = self.queue.procedures()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self.host, self.port = self._sock.getsockname()
+        self._clients = []
+        self._running = False
+
+    def start(self):
+        self._sock.listen(128)
+        self._running = True
+        thread = threading.Thread(target=self._accept)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        for sock in [self._sock] + self._clients:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _accept(self):
+        while self._running:
+            try:
+                client, _ = self._sock.accept()
+            except socket.error:
+                return
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._clients.append(client)
+            thread = threading.Thread(target=self._serve, args=(client,))
+            thread.daemon = True
+            thread.start()
+
+    def _serve(self, client):
+        lock = threading.Lock()
+        stream = client.makefile("rb")
+        try:
+            while self._running:
+                header = stream.read(iproto.HEADER_SIZE)
+                if len(header) < iproto.HEADER_SIZE:
+                    return
+                request_type, length, sync = iproto.unpack_header(header)
+                body = stream.read(length) if length else b""
+                if request_type == iproto.REQUEST_TYPE_CALL:
+                    _, name, args = iproto.unpack_call(body)
+                    if self._blocking(name, args):
+                        thread = threading.Thread(
+                            target=self._call,
+                            args=(client, lock, sync, name, args))
+                        thread.daemon = True
+                        thread.start()
+                    else:
+                        self._call(client, lock, sync, name, args)
+                else:
+                    self._send(client, lock, iproto.pack_response(
+                        sync, request_type=request_type))
+        except (socket.error, ValueError):
+            return
+        finally:
+            stream.close()
+
+    @staticmethod
+    def _blocking(name, args):
+        if not name.endswith(".take"):
+            return False
+        return len(args) < 3 or float(args[2]) != 0
+
+    def _call(self, client, lock, sync, name, args):
+        procedure = self.procedures.get(name)
+        try:
+            if procedure is None:
+                raise ProcedureError("Procedure '%s' is not defined" % name)
+            response = iproto.pack_response(sync, procedure(*args))
+        except (ProcedureError, TypeError, ValueError) as e:
+            response = iproto.pack_response(
+                sync, return_code=ER_PROC_LUA, message=str(e))
+        self._send(client, lock, response)
+
+    @staticmethod
+    def _send(client, lock, data):
+        with lock:
+            try:
+                client.sendall(data)
+            except socket.error:
+                pass
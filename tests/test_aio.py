@@ -0,0 +1,114 @@
+import os
+import shutil
+import asyncio
+import tempfile
+import unittest
+import threading
+
+from tarantool_queue import codec
+from tarantool_queue.aio import AsyncQueue
+from tarantool_queue.blob import DirectoryBlobStore
+
+from .fake_tarantool import FakeTarantool
+
+
+class TestSuite_Aio(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeTarantool().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    async def asyncSetUp(self):
+        self.queue = AsyncQueue(self.server.host, self.server.port, 0)
+        self.tube = self.queue.tube("tube")
+
+    async def asyncTearDown(self):
+        await self.tube.truncate()
+        await self.queue.close()
+
+    async def test_00_PutTakeAck(self):
+        task = await self.tube.put([1, 2, 3])
+        self.assertEqual(task.status, "ready")
+        taken = await self.tube.take()
+        self.assertEqual(taken.task_id, task.task_id)
+        self.assertEqual(taken.data, [1, 2, 3])
+        meta = await taken.meta()
+        self.assertEqual(meta['status'], "taken")
+        self.assertTrue(await taken.ack())
+        self.assertIsNone(await self.tube.take())
+
+    async def test_01_Release(self):
+        await self.tube.put("task")
+        task = await self.tube.take()
+        released = await task.release()
+        self.assertEqual(released.status, "ready")
+        self.assertEqual((await self.tube.statistics())['tasks']['ready'],
+                         1)
+
+    async def test_02_ConcurrentTake(self):
+        # blocked takes must not block puts on the same connection
+        takes = [asyncio.ensure_future(self.tube.take(5)) for _ in range(10)]
+        await asyncio.sleep(0.05)
+        await asyncio.gather(*[self.tube.put(i) for i in range(10)])
+        tasks = await asyncio.wait_for(asyncio.gather(*takes), 2)
+        self.assertEqual(sorted(task.data for task in tasks), list(range(10)))
+        self.assertTrue(all(await asyncio.gather(
+            *[task.ack() for task in tasks])))
+
+    async def test_03_TakeTimeout(self):
+        self.assertIsNone(await self.tube.take(0.1))
+
+    async def test_04_Error(self):
+        with self.assertRaises(AsyncQueue.DataBaseError):
+            await self.queue._ack("not-a-task")
+
+    async def test_05_BadResponse(self):
+        await self.queue.tnt.connect()
+        tnt = self.queue.tnt
+        # response that can't be decoded fails calls instead of hanging
+        future = asyncio.get_running_loop().create_future()
+        tnt._waiters[0] = future
+        tnt._reader.feed_data(b"\x16\x00\x00\x00\x02\x00\x00\x00"
+                              b"\x00\x00\x00\x00\x00\x00")
+        with self.assertRaises(AsyncQueue.NetworkError):
+            await asyncio.wait_for(future, 2)
+        self.assertFalse(tnt.connected)
+
+    async def test_06_Blob(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        store = DirectoryBlobStore(path)
+        readers = []
+        get = store.get
+
+        def traced_get(reference):
+            readers.append(threading.current_thread())
+            return get(reference)
+        store.get = traced_get
+        self.queue.blob_store = store
+        tube = self.queue.tube("aio_blob", blob_threshold=1024)
+        big = {"data": "x" * 4096}
+        self.assertEqual((await tube.put(big)).data, big)
+        self.assertEqual(readers, [])
+        task = await tube.take()
+        self.assertIsNotNone(codec.unpack_reference(task.raw_data))
+        self.assertEqual(task.data, big)
+        # blob is read out of the event loop thread
+        self.assertEqual(len(readers), 1)
+        self.assertIsNot(readers[0], threading.current_thread())
+        self.assertTrue(await task.ack())
+        self.assertEqual([name for _, _, names in os.walk(path)
+                          for name in names], [])
+        await tube.truncate()
+
+    async def test_07_DataOfUnknownTube(self):
+        await self.queue.tube("aio_unknown").put([1])
+        del self.queue.tubes["aio_unknown"]
+        task = await self.queue._take("aio_unknown")
+        self.assertEqual(task.data, [1])
+        # deserializer is looked up without creating the tube
+        self.assertNotIn("aio_unknown", self.queue.tubes)
+        await task.ack()
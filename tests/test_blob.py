@@ -0,0 +1,107 @@
+import os
+import mmap
+import shutil
+import tempfile
+import unittest
+
+from tarantool_queue import Queue, codec
+from tarantool_queue.blob import DirectoryBlobStore
+
+from .fake_tarantool import FakeTarantool
+
+
+def _files(path):
+    return sorted(name for _, _, names in os.walk(path) for name in names)
+
+
+class TestSuite_BlobStore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.store = DirectoryBlobStore(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_00_PutGetDelete(self):
+        ref1 = self.store.put(b"spam" * 100)
+        ref2 = self.store.put(b"spam" * 100)
+        self.assertNotEqual(ref1, ref2)
+        # the same content is stored once
+        objects = os.path.join(self.path, 'objects')
+        self.assertEqual(len(_files(objects)), 1)
+        blob = self.store.get(ref1)
+        self.assertIsInstance(blob, mmap.mmap)
+        self.assertEqual(blob[:], b"spam" * 100)
+        blob.close()
+        self.assertTrue(self.store.delete(ref1))
+        self.assertFalse(self.store.delete(ref1))
+        self.assertEqual(len(_files(objects)), 1)
+        self.assertTrue(self.store.delete(ref2))
+        self.assertEqual(_files(self.path), [])
+        self.assertEqual(self.store.get(self.store.put(b"")), b"")
+
+    def test_01_BadReference(self):
+        with self.assertRaises(ValueError):
+            self.store.get("../../etc/passwd")
+
+
+class TestSuite_BlobTube(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeTarantool().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.queue = Queue(self.server.host, self.server.port, 0)
+        self.queue.blob_store = DirectoryBlobStore(self.path)
+        self.tube = self.queue.tube("blob", blob_threshold=1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_00_Externalize(self):
+        big, small = {"data": "x" * 4096}, {"data": "x"}
+        self.tube.put(big)
+        self.tube.put(small)
+        task = self.tube.take()
+        self.assertIsNotNone(codec.unpack_reference(task.raw_data))
+        self.assertLess(len(task.raw_data), 100)
+        self.assertEqual(task.data, big)
+        self.assertEqual(len(task.payload), len(Queue.basic_serialize(big)))
+        other = self.tube.take()
+        self.assertEqual(other.data, small)
+        self.assertTrue(task.ack())
+        other.ack()
+        self.assertEqual(_files(self.path), [])
+
+    def test_01_DeleteMany(self):
+        self.tube.put_many([{"data": str(i) * 2048} for i in range(3)])
+        tasks = self.tube.take_many(3)
+        self.assertEqual(len(_files(os.path.join(self.path, 'refs'))), 3)
+        self.assertEqual(self.queue.delete_many(tasks), [True] * 3)
+        self.assertEqual(_files(self.path), [])
+
+    def test_02_Config(self):
+        del self.queue.blob_store
+        with self.assertRaises(Queue.BadConfigException):
+            self.tube.put({"data": "x" * 4096})
+        with self.assertRaises(TypeError):
+            self.queue.blob_store = object()
+
+    def test_03_PlainTube(self):
+        # payload of tube without blob_threshold is never a reference
+        reference = self.queue.blob_store.put(b"blob")
+        raw = codec.pack_reference(reference)
+        tube = self.queue.tube("blob_plain")
+        tube.serialize = bytes
+        tube.deserialize = bytes
+        tube.put(raw)
+        task = tube.take()
+        self.assertEqual(task.data, raw)
+        self.assertEqual(task.payload.tobytes(), raw)
+        self.assertTrue(task.ack())
+        self.assertEqual(self.queue.blob_store.get(reference)[:], b"blob")
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import struct
+import unittest
+
+import msgpack
+
+from tarantool_queue import Queue, codec
+from tarantool_queue.codec import Codec, StructCodec
+
+
+class TestSuite_Codec(unittest.TestCase):
+    data = {"id": 1, "events": ["spam"] * 500}
+
+    def test_00_RoundTrip(self):
+        for name in ("msgpack", "json"):
+            for compression in [None] + [entry[0] for entry in
+                                         codec.compressions.values()]:
+                encode = Codec(name, compression=compression, threshold=64)
+                payload = encode(self.data)
+                self.assertEqual(bytearray(payload[:1])[0], codec.MARKER)
+                self.assertEqual(codec.decode(payload), self.data)
+                self.assertEqual(Queue.basic_deserialize(payload),
+                                 self.data)
+
+    def test_01_Threshold(self):
+        small = Codec("json", compression="zlib", threshold=1024)
+        self.assertEqual(small([1, 2]), b"\xc1\x01[1,2]")
+        big = small(self.data)
+        self.assertEqual(bytearray(big[1:2])[0], 0x11)
+        self.assertLess(len(big), len(codec._json_encode(self.data)))
+
+    def test_02_Legacy(self):
+        payload = msgpack.packb(self.data)
+        self.assertFalse(codec.is_enveloped(payload))
+        self.assertEqual(codec.decode(payload), self.data)
+
+    def test_03_Errors(self):
+        with self.assertRaises(ValueError):
+            Codec("pickle")
+        with self.assertRaises(ValueError):
+            Codec(compression="snappy")
+        with self.assertRaises(ValueError):
+            codec.decode(b"\xc1\x0e")
+        with self.assertRaises(ValueError):
+            codec.register_codec(16, "spam", str, str)
+
+    def test_04_Register(self):
+        codec.register_codec(15, "text", lambda data: data.encode("utf-8"),
+                             lambda data: bytes(data).decode("utf-8"))
+        try:
+            self.assertEqual(codec.decode(Codec("text")(u"spam")), u"spam")
+        finally:
+            del codec.codecs[15]
+
+
+class TestSuite_StructCodec(unittest.TestCase):
+    record = {"id": 2 ** 40, "kind": 3, "score": 0.5, "ok": True,
+              "name": u"спам", "blob": b"\x00\xff"}
+
+    def test_00_RoundTrip(self):
+        schema = StructCodec([("id", "uint64"), ("kind", "uint8"),
+                              ("name", "str"), ("score", "double"),
+                              ("blob", "bytes"), ("ok", "bool")])
+        payload = schema.serialize(self.record)
+        self.assertEqual(len(payload), schema.struct.size + 8 + 2)
+        self.assertEqual(schema.deserialize(payload), self.record)
+        self.assertEqual(schema.deserialize(memoryview(payload)),
+                         self.record)
+
+    def test_01_FixedAndSingle(self):
+        fixed = StructCodec([("id", "uint64"), ("kind", "uint8")])
+        self.assertEqual(len(fixed.serialize(self.record)), 9)
+        single = StructCodec([("name", "str")])
+        self.assertEqual(single.deserialize(single.serialize(self.record)),
+                         {"name": self.record["name"]})
+
+    def test_02_Errors(self):
+        with self.assertRaises(ValueError):
+            StructCodec([("id", "decimal")])
+        with self.assertRaises(ValueError):
+            StructCodec([])
+        schema = StructCodec([("id", "uint8")])
+        with self.assertRaises(KeyError):
+            schema.serialize({})
+        with self.assertRaises(struct.error):
+            schema.serialize({"id": 256})
+
+    def test_03_Tube(self):
+        schema = StructCodec([("id", "uint32"), ("name", "str")])
+        tube = Queue("127.0.0.1", 33013, 0).tube("struct")
+        tube.serialize = schema.serialize
+        tube.deserialize = schema.deserialize
+        self.assertEqual(tube.deserialize(tube.serialize(
+            {"id": 1, "name": u"spam"})), {"id": 1, "name": u"spam"})
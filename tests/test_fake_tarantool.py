@@ -0,0 +1,80 @@
+import time
+import unittest
+
+from tarantool_queue import Queue, TQueue
+
+from .fake_tarantool import FakeTarantool
+
+
+class TestSuite_FakeTarantool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeTarantool().start()
+        cls.queue = Queue(cls.server.host, cls.server.port, 0)
+        cls.tqueue = TQueue(cls.server.host, cls.server.port, 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_00_Priority(self):
+        tube = self.queue.tube("fake_pri")
+        tube.put("low", pri=1)
+        tube.put("high", pri=5)
+        tube.put("high2", pri=5)
+        tube.urgent("urgent")
+        tasks = tube.take_many(4)
+        self.assertEqual([task.data for task in tasks],
+                         ["urgent", "high", "high2", "low"])
+        self.assertEqual(self.queue.ack_many(tasks), [True] * 4)
+
+    def test_01_DelayAndTtr(self):
+        tube = self.queue.tube("fake_timers")
+        tube.put("delayed", delay=0.1)
+        self.assertIsNone(tube.take(0))
+        self.assertEqual(tube.statistics()["tasks"]["delayed"], 1)
+        task = tube.take(1)
+        self.assertEqual(task.data, "delayed")
+        task.release(delay=0.05)
+        task = tube.take(1)
+
+        tube.put("ttr", ttr=0.1)
+        expired = tube.take()
+        expired.modified = True
+        self.assertIsNone(tube.take(0))
+        again = tube.take(1)
+        self.assertEqual(again.data, "ttr")
+        self.assertEqual(again.meta()["ctaken"], 2)
+        self.assertTrue(again.ack())
+        self.assertTrue(task.ack())
+
+    def test_02_Buried(self):
+        tube = self.queue.tube("fake_buried")
+        tube.put_many([1, 2, 3])
+        tasks = tube.take_many(3)
+        self.assertEqual(self.queue.bury_many(tasks), [True] * 3)
+        self.assertIsNone(tube.take(0))
+        self.assertEqual(tube.statistics()["tasks"]["buried"], 3)
+        self.assertTrue(tube.kick(2))
+        self.assertEqual(sorted(task.data for task in tube.take_many(3)),
+                         [1, 2])
+        self.assertTrue(tasks[2].dig())
+        task = tube.take()
+        self.assertEqual(task.data, 3)
+        tube.put(4)
+        self.assertTrue(task.requeue())
+        self.assertEqual([task.data for task in tube.take_many(2)], [4, 3])
+        tube.queue.truncate("fake_buried")
+
+    def test_03_TQueue(self):
+        tube = self.tqueue.tube("fake_box")
+        tube.put("low", pri=10)
+        tube.put("high", pri=1)
+        task = tube.take()
+        self.assertEqual(task.data, "high")
+        released = task.release()
+        self.assertEqual(released.data, "high")
+        tasks = [tube.take(), tube.take()]
+        self.assertEqual([task.data for task in tasks], ["high", "low"])
+        self.assertEqual(self.tqueue.ack_many(tasks), [True, True])
+        self.assertIsNone(tube.take(0))
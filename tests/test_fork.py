@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from tarantool_queue import Queue
+
+from .fake_tarantool import FakeTarantool
+
+
+def _in_child(check):
+    # run check in forked process, return its exit code
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = 0 if check() else 2
+        finally:
+            os._exit(code)
+    return os.waitpid(pid, 0)[1] >> 8
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), "needs fork()")
+class TestSuite_Fork(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeTarantool().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_00_Lock(self):
+        queue = Queue(self.server.host, self.server.port, 0)
+        default = queue.tarantool_lock
+        self.assertEqual(_in_child(
+            lambda: queue.tnt and queue.tarantool_lock is not default), 0)
+        lock = threading.RLock()
+        queue.tarantool_lock = lock
+        self.assertEqual(_in_child(
+            lambda: queue.tnt and queue.tarantool_lock is lock), 0)
+
+    def test_01_BackgroundState(self):
+        queue = Queue(self.server.host, self.server.port, 0)
+        keeper = queue.create_lease_keeper()
+        spool = queue.create_spool(self.path)
+        tube = queue.tube("fork_state")
+        producer = tube.create_producer(linger=0)
+
+        def check():
+            task = producer.put("child").result(5)
+            return (task.data == "child" and queue.spool is None and
+                    keeper._thread.is_alive() and not len(keeper) and
+                    spool._thread is None)
+        self.assertEqual(_in_child(check), 0)
+        self.assertIs(queue.spool, spool)
+        self.assertEqual(tube.take().data, "child")
+        producer.close()
+        del queue.lease_keeper
+        del queue.spool
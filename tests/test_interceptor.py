@@ -0,0 +1,84 @@
+import unittest
+
+import tarantool
+
+from tarantool_queue import Queue, TQueue
+from tarantool_queue.interceptor import Interceptor
+
+from .fake_tarantool import FakeTarantool
+
+
+class Recorder(Interceptor):
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+
+    def call(self, call, method, args):
+        self.log.append((self.name, method))
+        return call(method, args)
+
+    def call_many(self, call_many, calls):
+        self.log.append((self.name, len(calls)))
+        return call_many(calls)
+
+
+class Faults(Interceptor):
+    def call(self, call, method, args):
+        if method == "queue.ack":
+            raise tarantool.DatabaseError(0, "injected")
+        return call(method, args)
+
+
+class TestSuite_Interceptor(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeTarantool().start()
+        cls.queue = Queue(cls.server.host, cls.server.port, 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def tearDown(self):
+        for obj in self.queue.interceptors:
+            self.queue.remove_interceptor(obj)
+        del self.queue.metrics
+
+    def test_00_Order(self):
+        log = []
+        outer, inner = Recorder("outer", log), Recorder("inner", log)
+        self.queue.add_interceptor(inner)
+        self.queue.add_interceptor(outer, 0)
+        self.assertEqual(self.queue.interceptors, (outer, inner))
+        tube = self.queue.tube("intercepted")
+        tube.put(1)
+        tube.put_many([1, 2])
+        self.assertEqual(log, [("outer", "queue.put"), ("inner", "queue.put"),
+                               ("outer", 2), ("inner", 2)])
+
+        metrics = self.queue.create_metrics()
+        self.queue.remove_interceptor(outer)
+        tube.take().ack()
+        self.assertEqual(log[4:], [("inner", "queue.take"),
+                                   ("inner", "queue.ack")])
+        self.assertEqual(metrics.snapshot()["queue.ack"]["count"], 1)
+
+    def test_01_Faults(self):
+        tube = self.queue.tube("faults")
+        tube.put(1)
+        task = tube.take()
+        self.queue.add_interceptor(Faults())
+        with self.assertRaises(tarantool.DatabaseError):
+            task.ack()
+        self.queue.remove_interceptor(self.queue.interceptors[0])
+        self.assertIsNone(self.queue.__dict__.get("_invoke"))
+        self.assertTrue(task.ack())
+
+    def test_02_Config(self):
+        with self.assertRaises(TypeError):
+            self.queue.add_interceptor(lambda call, method, args: None)
+        with self.assertRaises(ValueError):
+            self.queue.remove_interceptor(Interceptor())
+        tqueue = TQueue(self.server.host, self.server.port, 0)
+        tqueue.add_interceptor(Interceptor())
+        self.assertEqual(len(tqueue.interceptors), 1)
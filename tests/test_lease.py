@@ -0,0 +1,55 @@
+import time
+import unittest
+
+from tarantool_queue import Queue
+from tarantool_queue.lease import LeaseKeeper
+
+from .fake_tarantool import FakeTarantool
+
+
+class TestSuite_Lease(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeTarantool().start()
+        cls.queue = Queue(cls.server.host, cls.server.port, 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def tearDown(self):
+        del self.queue.lease_keeper
+
+    def test_00_RenewUntilAck(self):
+        keeper = self.queue.create_lease_keeper(margin=0.1, interval=0.01)
+        tube = self.queue.tube("lease_renew", ttr=1)
+        tube.put_many([1, 2])
+        tasks = tube.take_many(2)
+        self.assertEqual(len(keeper), 2)
+        time.sleep(0.25)
+        self.assertGreaterEqual(keeper.stats()['touched'], 4)
+        for task in tasks:
+            task.ack()
+        time.sleep(0.05)
+        touched = keeper.stats()['touched']
+        time.sleep(0.1)
+        stats = keeper.stats()
+        self.assertEqual(stats['touched'], touched)
+        self.assertEqual((stats['tracked'], stats['active']), (2, 0))
+
+    def test_01_NoTtr(self):
+        keeper = self.queue.create_lease_keeper(interval=0.01)
+        tube = self.queue.tube("lease_no_ttr", ttr=0)
+        tube.put(1)
+        task = tube.take()
+        time.sleep(0.05)
+        stats = keeper.stats()
+        self.assertEqual((stats['expired'], stats['active']), (1, 0))
+        task.ack()
+
+    def test_02_Config(self):
+        with self.assertRaises(ValueError):
+            LeaseKeeper(self.queue, margin=1)
+        with self.assertRaises(TypeError):
+            self.queue.lease_keeper = object()
+        self.assertIsNone(self.queue.lease_keeper)
@@ -0,0 +1,72 @@
+import unittest
+
+import tarantool
+
+from tarantool_queue import Queue
+from tarantool_queue.metrics import CallMetrics
+
+from .fake_tarantool import FakeTarantool
+
+
+class TestSuite_Metrics(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeTarantool().start()
+        cls.queue = Queue(cls.server.host, cls.server.port, 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def tearDown(self):
+        del self.queue.metrics
+
+    def test_00_Calls(self):
+        metrics = self.queue.create_metrics()
+        tube = self.queue.tube("metrics_calls")
+        tube.put("x" * 100)
+        tube.put_many([1, 2])
+        task = tube.take()
+        task.ack()
+        with self.assertRaises(tarantool.DatabaseError):
+            task.ack()
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["queue.put"]["count"], 3)
+        self.assertEqual(snapshot["queue.put"]["errors"], 0)
+        self.assertGreater(snapshot["queue.put"]["sent_bytes"], 100)
+        self.assertGreater(snapshot["queue.take"]["received_bytes"], 100)
+        self.assertEqual((snapshot["queue.ack"]["count"],
+                          snapshot["queue.ack"]["errors"]), (2, 1))
+        buckets = snapshot["queue.put"]["buckets"]
+        self.assertEqual(buckets[-1], (float("inf"), 3))
+        self.assertEqual(len(buckets), len(metrics.buckets) + 1)
+
+        del self.queue.metrics
+        tube.put(1)
+        self.assertEqual(metrics.snapshot()["queue.put"]["count"], 3)
+
+    def test_01_Prometheus(self):
+        metrics = CallMetrics(buckets=(0.5, 1.0))
+        metrics.observe("queue.put", 0.2, sent=10)
+        metrics.observe("queue.put", 2.0, error=True)
+        text = metrics.to_prometheus()
+        for line in (
+                'tarantool_queue_call_duration_seconds_bucket'
+                '{method="queue.put",le="0.5"} 1',
+                'tarantool_queue_call_duration_seconds_bucket'
+                '{method="queue.put",le="+Inf"} 2',
+                'tarantool_queue_call_duration_seconds_count'
+                '{method="queue.put"} 2',
+                'tarantool_queue_call_errors_total{method="queue.put"} 1',
+                'tarantool_queue_call_payload_bytes_total'
+                '{method="queue.put",direction="sent"} 10'):
+            self.assertIn(line + "\n", text)
+        metrics.reset()
+        self.assertEqual(metrics.snapshot(), {})
+
+    def test_02_Config(self):
+        with self.assertRaises(ValueError):
+            CallMetrics(buckets=(1.0, 0.5))
+        with self.assertRaises(TypeError):
+            self.queue.metrics = object()
+        self.assertIsNone(self.queue.metrics)
@@ -0,0 +1,152 @@
+import time
+import threading
+import unittest
+from unittest import mock
+from concurrent.futures import TimeoutError
+
+import tarantool
+
+from tarantool_queue import Queue, TQueue, iproto
+from tarantool_queue.mux import MultiplexedConnection
+
+from .fake_tarantool import FakeTarantool
+
+
+class TestSuite_Mux(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeTarantool().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.queue = Queue(self.server.host, self.server.port, 0)
+        self.queue.tarantool_connection = MultiplexedConnection
+
+    def tearDown(self):
+        self.queue.tnt.close()
+
+    def test_00_ConcurrentCalls(self):
+        tube = self.queue.tube("mux_threads")
+        tnt = self.queue.tnt
+        # blocking take waits in flight while other threads go on
+        waiting = tnt.submit("queue.take", ("0", "mux_idle", "5"))
+        results = []
+
+        def worker(i):
+            for j in range(20):
+                results.append(tube.put((i, j)).data)
+
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 160)
+        self.assertEqual(sorted(results),
+                         sorted([i, j] for i in range(8) for j in range(20)))
+        self.assertFalse(waiting.done())
+        self.queue.tube("mux_idle").put("wake")
+        self.assertEqual(waiting.result(5).rowcount, 1)
+        self.assertEqual(len(tube.take_many(200)), 160)
+
+    def test_01_Async(self):
+        tube = self.queue.tube("mux_async")
+        futures = [tube.put_async(i) for i in range(10)]
+        tasks = [future.result(5) for future in futures]
+        self.assertEqual([task.data for task in tasks], list(range(10)))
+        taken = tube.take_many(10)
+        acks = [task.ack_async() for task in taken]
+        self.assertEqual([future.result(5) for future in acks], [True] * 10)
+        self.assertTrue(all(task.modified for task in taken))
+        self.assertIsNone(tube.take(0))
+
+    def test_02_Errors(self):
+        tnt = self.queue.tnt
+        future = tnt.submit("queue.no_such_procedure", ())
+        self.assertIsInstance(future.exception(5), tarantool.DatabaseError)
+        results = tnt.call_many([("queue.no_such_procedure", ()),
+                                 ("queue.kick", ("0", "mux_errors", "1"))])
+        self.assertIsInstance(results[0], tarantool.DatabaseError)
+        self.assertEqual(results[1].rowcount, 1)
+
+        waiting = tnt.submit("queue.take", ("0", "mux_idle", "5"))
+        tnt.close()
+        self.assertIsInstance(waiting.exception(5), tarantool.NetworkError)
+        self.assertEqual(tnt.in_flight, 0)
+        # connection is reopened by the next call
+        self.assertEqual(self.queue.tube("mux_errors").put(1).data, 1)
+
+    def test_03_Fallback(self):
+        queue = Queue(self.server.host, self.server.port, 0)
+        metrics = queue.create_metrics()
+        tube = queue.tube("mux_fallback")
+        future = tube.put_async("data")
+        self.assertTrue(future.done())
+        self.assertEqual(future.result().data, "data")
+        self.assertTrue(tube.take().ack_async().result())
+        self.assertEqual(metrics.snapshot()["queue.put"]["count"], 1)
+        self.assertEqual(metrics.snapshot()["queue.ack"]["count"], 1)
+
+    def test_04_Metrics(self):
+        metrics = self.queue.create_metrics()
+        tube = self.queue.tube("mux_metrics")
+        tube.put_async("data").result(5)
+        future = self.queue.tnt.submit("queue.no_such_procedure", ())
+        future.exception(5)
+        task = tube.take()
+        self.assertTrue(task.ack_async().result(5))
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot["queue.put"]["count"], 1)
+        self.assertEqual(snapshot["queue.put"]["errors"], 0)
+        self.assertGreater(snapshot["queue.put"]["received_bytes"], 0)
+        self.assertEqual(snapshot["queue.ack"]["count"], 1)
+
+    def test_05_TQueue(self):
+        tqueue = TQueue(self.server.host, self.server.port, 0)
+        tqueue.tarantool_connection = MultiplexedConnection
+        try:
+            tube = tqueue.tube("mux_tqueue")
+            futures = [tube.put_async(i) for i in range(5)]
+            ids = [future.result(5) for future in futures]
+            self.assertEqual(len(set(ids)), 5)
+            tasks = [tube.take() for _ in range(5)]
+            self.assertEqual(sorted(task.task_id for task in tasks),
+                             sorted(ids))
+            acks = [task.ack_async() for task in tasks]
+            self.assertEqual([future.result(5) for future in acks],
+                             [True] * 5)
+        finally:
+            tqueue.tnt.close()
+
+    def test_06_Timeout(self):
+        tnt = MultiplexedConnection(self.server.host, self.server.port,
+                                    timeout=0.1)
+        try:
+            with self.assertRaises(TimeoutError):
+                tnt.call("queue.take", ("0", "mux_timeout", "0.5"))
+            self.assertEqual(tnt.in_flight, 0)
+            with self.assertRaises(TimeoutError):
+                tnt.call_many([("queue.take", ("0", "mux_timeout", "0.5")),
+                               ("queue.kick", ("0", "mux_timeout", "1"))])
+            self.assertEqual(tnt.in_flight, 0)
+            # late responses are skipped
+            time.sleep(0.6)
+            self.assertEqual(tnt.call("queue.kick",
+                                      ("0", "mux_timeout", "1")).rowcount, 1)
+        finally:
+            tnt.close()
+
+    def test_07_BadResponse(self):
+        tnt = self.queue.tnt
+        self.queue.tube("mux_bad").put(1)
+        # response that can't be decoded fails calls instead of hanging
+        with mock.patch.object(iproto, "unpack_response",
+                               side_effect=KeyError("broken")):
+            with self.assertRaises(tarantool.NetworkError):
+                tnt.call("queue.kick", ("0", "mux_bad", "1"))
+        self.assertEqual(tnt.in_flight, 0)
+        self.assertEqual(self.queue.tube("mux_bad").take().data, 1)
@@ -0,0 +1,139 @@
+import socket
+import struct
+import threading
+import unittest
+
+import tarantool
+
+from tarantool_queue import iproto
+from tarantool_queue.pipeline import call_many, call_pipelined
+
+try:
+    from tarantool.request import RequestCall
+except ImportError:
+    RequestCall = None
+
+
+# frames are built by hand from the iproto 1.5 spec, not by `iproto`
+def _field(data):
+    return struct.pack("<B", len(data)) + data
+
+
+def _call_body(name, args):
+    return struct.pack("<L", 1) + _field(name) + \
+        struct.pack("<L", len(args)) + b"".join([_field(a) for a in args])
+
+
+def _ok_response(sync, rows):
+    body = struct.pack("<LL", 0, len(rows))
+    for row in rows:
+        fields = b"".join([_field(value) for value in row])
+        body += struct.pack("<LL", len(fields), len(row)) + fields
+    return struct.pack("<LLL", 22, len(body), sync) + body
+
+
+def _error_response(sync, code, message):
+    body = struct.pack("<L", (code << 8) | 2) + message + b"\x00"
+    return struct.pack("<LLL", 22, len(body), sync) + body
+
+
+def _read_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError()
+        data += chunk
+    return data
+
+
+class _Connection(object):
+    # connection of the connector: only socket and close are used
+    def __init__(self, sock):
+        self._socket = sock
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        self._socket.close()
+
+
+class TestSuite_Pipeline(unittest.TestCase):
+    def setUp(self):
+        self.client, self.server = socket.socketpair()
+        self.requests = []
+
+    def tearDown(self):
+        self.client.close()
+        self.server.close()
+
+    def serve(self, count, respond, close=False):
+        # read `count` requests, then write respond(requests)
+        def run():
+            for _ in range(count):
+                header = _read_exact(self.server, 12)
+                request_type, length, sync = struct.unpack("<LLL", header)
+                body = _read_exact(self.server, length)
+                self.requests.append((request_type, sync, body))
+            self.server.sendall(respond(self.requests))
+            if close:
+                self.server.shutdown(socket.SHUT_WR)
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def test_00_Framing(self):
+        calls = [("queue.put", ("0", "tube", "x")),
+                 ("queue.ack", ("0", "id"))]
+
+        def respond(requests):
+            # out of order: responses are matched by sync
+            return _error_response(requests[1][1], 1, b"boom") + \
+                _ok_response(requests[0][1], [(b"id", b"tube")])
+        self.serve(2, respond)
+        results = call_pipelined(self.client, calls)
+        self.assertEqual([(t, body) for t, _, body in self.requests],
+                         [(22, _call_body(b"queue.put",
+                                          [b"0", b"tube", b"x"])),
+                          (22, _call_body(b"queue.ack", [b"0", b"id"]))])
+        self.assertEqual(list(results[0]), [(b"id", b"tube")])
+        self.assertIsInstance(results[1], tarantool.DatabaseError)
+
+        syncs = set(sync for _, sync, _ in self.requests)
+        self.requests = []
+        self.serve(1, lambda requests: _ok_response(requests[0][1], []))
+        self.assertEqual(call_pipelined(self.client, calls[:1])[0], [])
+        # sync isn't reused by the next batch
+        self.assertNotIn(self.requests[0][1], syncs)
+        self.assertEqual(len(syncs), 2)
+
+    def test_01_FailedBatchClosesConnection(self):
+        tnt = _Connection(self.client)
+        calls = [("queue.kick", ("0", "tube", "1"))] * 3
+        # the server goes away after the first response
+        self.serve(3, lambda requests: _ok_response(requests[0][1], []),
+                   close=True)
+        with self.assertRaises(tarantool.NetworkError) as raised:
+            call_many(tnt, calls)
+        self.assertTrue(tnt.closed)
+        # response read before the error is kept
+        self.assertEqual(raised.exception.results, [[], None, None])
+
+    def test_02_UnknownSync(self):
+        tnt = _Connection(self.client)
+        # stale response of another request is left on the socket
+        self.serve(1, lambda requests: _ok_response(0, []))
+        with self.assertRaises(tarantool.NetworkError):
+            call_many(tnt, [("queue.kick", ("0", "tube", "1"))])
+        self.assertTrue(tnt.closed)
+
+    @unittest.skipIf(RequestCall is None, "needs tarantool connector")
+    def test_03_ConnectorRequest(self):
+        # pipelined request is the same as one of the connector
+        args = ("0", "tube", "data")
+        request = bytes(RequestCall(_Connection(None), "queue.put",
+                                    args, True))
+        ours = iproto.pack_call(0, "queue.put", args)
+        self.assertEqual(ours[:8], request[:8])
+        self.assertEqual(ours[12:], request[12:])
@@ -0,0 +1,142 @@
+import time
+import unittest
+import threading
+
+from tarantool_queue import Queue
+from tarantool_queue.pool import ConnectionPool
+
+from .fake_tarantool import FakeTarantool
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+
+    def call(self, method, args):
+        return method
+
+    def ping(self):
+        if not self.alive:
+            raise Queue.NetworkError()
+
+    def close(self):
+        self.closed = True
+
+
+class TestSuite_Pool(unittest.TestCase):
+    def test_00_WarmUp(self):
+        pool = ConnectionPool(FakeConnection, min_size=3, max_size=5)
+        pool.warm_up()
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['idle']), (3, 3))
+        with self.assertRaises(ValueError):
+            ConnectionPool(FakeConnection, min_size=3, max_size=2)
+
+    def test_01_MaxSizeAndWait(self):
+        pool = ConnectionPool(FakeConnection, max_size=2, timeout=0.05)
+        conn1, conn2 = pool.acquire(), pool.acquire()
+        with self.assertRaises(ConnectionPool.PoolTimeout):
+            pool.acquire()
+        threading.Timer(0.05, pool.release, (conn1,)).start()
+        self.assertIs(pool.acquire(timeout=1), conn1)
+        stats = pool.stats()
+        self.assertEqual(stats['waited'], 1)
+        self.assertGreater(stats['wait_time_max'], 0)
+        self.assertEqual(stats['in_use'], 2)
+
+    def test_02_IdleEviction(self):
+        pool = ConnectionPool(FakeConnection, min_size=1, max_size=3,
+                              idle_timeout=0.01)
+        conns = [pool.acquire() for _ in range(3)]
+        for conn in conns:
+            pool.release(conn)
+        time.sleep(0.02)
+        pool.acquire()
+        self.assertEqual(pool.stats()['evicted'], 2)
+        self.assertEqual(sum(conn.closed for conn in conns), 2)
+
+    def test_03_HealthCheck(self):
+        pool = ConnectionPool(FakeConnection, check_interval=0)
+        conn = pool.acquire()
+        conn.alive = False
+        pool.release(conn)
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+
+    def test_04_BrokenConnection(self):
+        pool = ConnectionPool(FakeConnection)
+        with self.assertRaises(Queue.NetworkError):
+            with pool.connection() as conn:
+                raise Queue.NetworkError()
+        self.assertTrue(conn.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_05_Queue(self):
+        with FakeTarantool() as server:
+            queue = Queue(server.host, server.port, 0)
+            pool = queue.create_pool(min_size=2, max_size=4)
+            self.assertIs(queue.tnt, pool)
+            tube = queue.tube("tube")
+            tube.put_many(range(10))
+            for _ in range(10):
+                self.assertTrue(tube.take().ack())
+            self.assertEqual(pool.stats()['in_use'], 0)
+            del queue.tarantool_pool
+            self.assertIsNot(queue.tnt, pool)
+            self.assertEqual(pool.stats()['size'], 0)
+
+    def test_06_LongPoll(self):
+        with FakeTarantool() as server:
+            queue = Queue(server.host, server.port, 0)
+            queue.create_pool(min_size=1, max_size=1)
+            queue.create_long_poll(per='thread')
+            tube = queue.tube("long_poll")
+            consumers = [threading.Thread(target=tube.take, args=(0.5,))
+                         for _ in range(4)]
+            for consumer in consumers:
+                consumer.start()
+            time.sleep(0.05)
+            start = time.time()
+            tube.truncate()
+            self.assertLess(time.time() - start, 0.25)
+            for consumer in consumers:
+                consumer.join()
+            del queue.tarantool_long_poll
+            self.assertIsNone(queue.tarantool_long_poll)
+
+    def test_07_Close(self):
+        pool = ConnectionPool(FakeConnection, max_size=2)
+        conn1, conn2 = pool.acquire(), pool.acquire()
+        errors = []
+
+        def wait():
+            try:
+                pool.acquire(timeout=5)
+            except ConnectionPool.PoolClosed as e:
+                errors.append(e)
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.05)
+        pool.close()
+        waiter.join()
+        self.assertEqual(len(errors), 1)
+        self.assertFalse(conn1.closed or conn2.closed)
+        # connections in use are closed when they come back
+        pool.release(conn1)
+        pool.release(conn2)
+        self.assertTrue(conn1.closed and conn2.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+        with self.assertRaises(ConnectionPool.PoolClosed):
+            pool.acquire()
+
+    def test_08_EvictionOnRelease(self):
+        pool = ConnectionPool(FakeConnection, min_size=0, max_size=2,
+                              idle_timeout=0.01)
+        conn1, conn2 = pool.acquire(), pool.acquire()
+        pool.release(conn1)
+        time.sleep(0.02)
+        pool.release(conn2)
+        self.assertTrue(conn1.closed)
+        self.assertEqual(pool.stats()['idle'], 1)
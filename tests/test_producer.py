@@ -0,0 +1,89 @@
+import time
+import unittest
+
+import tarantool
+
+from tarantool_queue import Queue, TQueue
+from tarantool_queue.producer import BufferedProducer
+
+from .fake_tarantool import FakeTarantool
+
+
+class TestSuite_Producer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeTarantool().start()
+        cls.queue = Queue(cls.server.host, cls.server.port, 0)
+        cls.tqueue = TQueue(cls.server.host, cls.server.port, 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_00_Batches(self):
+        tube = self.queue.tube("producer_batches")
+        producer = tube.create_producer(batch_size=10, linger=60)
+        futures = [producer.put(i) for i in range(25)]
+        # two full batches are sent without waiting for linger
+        futures[19].result(5)
+        self.assertFalse(futures[20].done())
+        self.assertTrue(producer.flush(5))
+        self.assertEqual([future.result().data for future in futures],
+                         list(range(25)))
+        self.assertTrue(producer.close(5))
+        self.assertEqual(producer.stats(), {
+            "put": 25, "sent": 25, "failed": 0, "dropped": 0,
+            "batches": 3, "buffered": 0})
+        self.assertEqual(len(tube.take_many(30)), 25)
+        self.assertRaises(BufferedProducer.Closed, producer.put, 1)
+
+    def test_01_Linger(self):
+        tube = self.queue.tube("producer_linger")
+        with tube.create_producer(linger=0.05) as producer:
+            start = time.time()
+            task = producer.put("data", pri=7).result(5)
+            self.assertGreaterEqual(time.time() - start, 0.04)
+            self.assertEqual(task.data, "data")
+            self.assertEqual(int(task.meta()["pri"]), 7)
+        self.assertEqual(tube.take().data, "data")
+
+    def test_02_Backpressure(self):
+        tube = self.queue.tube("producer_full")
+        # not started, nothing leaves the buffer
+        producer = BufferedProducer(tube, batch_size=2, max_buffered=2,
+                                    on_full='drop')
+        futures = [producer.put(i) for i in range(3)]
+        self.assertIsInstance(futures[2].exception(0),
+                              BufferedProducer.BufferFull)
+        self.assertEqual(len(producer), 2)
+        self.assertEqual(producer.stats()["dropped"], 1)
+
+        producer = BufferedProducer(tube, batch_size=2, max_buffered=2,
+                                    block_timeout=0.05)
+        producer.put(1)
+        producer.put(2)
+        start = time.time()
+        future = producer.put(3)
+        self.assertGreaterEqual(time.time() - start, 0.04)
+        self.assertIsInstance(future.exception(0),
+                              BufferedProducer.BufferFull)
+        producer.start()
+        self.assertTrue(producer.close(5))
+        self.assertEqual(producer.stats()["sent"], 2)
+        self.assertEqual(len(tube.take_many(5)), 2)
+        self.assertRaises(TypeError, BufferedProducer, tube,
+                          on_full='wait')
+
+    def test_03_TQueue(self):
+        tube = self.tqueue.tube("producer_tqueue", limits=3)
+        producer = tube.create_producer(batch_size=8)
+        futures = [producer.put(i) for i in range(5)]
+        self.assertTrue(producer.close(5))
+        ids = [future.result() for future in futures[:3]]
+        self.assertEqual(len(set(ids)), 3)
+        for future in futures[3:]:
+            self.assertIsInstance(future.exception(),
+                                  tarantool.DatabaseError)
+        self.assertEqual(producer.stats()["failed"], 2)
+        self.assertEqual(sorted(tube.take().task_id for _ in range(3)),
+                         sorted(ids))
@@ -1,3 +1,4 @@
+import gc
 import sys
 import copy
 import msgpack
@@ -76,15 +77,26 @@ class TestSuite_00_ConnectionTest(TestSuite_Basic):
         task1.ack();task2.ack();task3.ack()
 
     def test_06_Destructor(self):
+        tracker = self.queue.task_tracker
+        before = tracker.stats()
         task = self.tube.put("stupid task")
-        # analog for del task; gc.gc()
-        # task is not taken - must not send exception
-        task.__del__()
+        # task is not taken - must not be tracked
+        del task
+        gc.collect()
         task = self.tube.take()
-        # task in taken - must not send exception
-        task.__del__()
-        # task is acked - must not send exception
+        # task in taken - must be released by tracker
+        del task
+        gc.collect()
+        tracker.flush()
+        after = tracker.stats()
+        self.assertEqual(after['leaked'] - before['leaked'], 1)
+        self.assertEqual(after['auto_released'] -
+                         before['auto_released'], 1)
+        # task is acked - must not be tracked any more
         self.tube.take().ack()
+        gc.collect()
+        tracker.flush()
+        self.assertEqual(tracker.stats()['leaked'], after['leaked'])
 
     def test_07_Truncate(self):
         task1_p = self.tube.put("task#1")
@@ -93,18 +105,18 @@ class TestSuite_00_ConnectionTest(TestSuite_Basic):
         before_stat = self.tube.statistics()
         result = self.tube.truncate()
         after_stat = self.tube.statistics()
-        self.assertEqual(before_stat['tasks']['ready'], '3')
+        self.assertEqual(before_stat['tasks']['ready'], 3)
         self.assertEqual(result, 3)
-        self.assertEqual(after_stat['tasks']['ready'], '0')
+        self.assertEqual(after_stat['tasks']['ready'], 0)
         task1_p = self.tube.put("task#1")
         task2_p = self.tube.put("task#2")
         task3_p = self.tube.put("task#3")
         before_stat = self.tube.statistics()
         result = self.queue.truncate('tube')
         after_stat = self.tube.statistics()
-        self.assertEqual(before_stat['tasks']['ready'], '3')
+        self.assertEqual(before_stat['tasks']['ready'], 3)
         self.assertEqual(result, 3)
-        self.assertEqual(after_stat['tasks']['ready'], '0')
+        self.assertEqual(after_stat['tasks']['ready'], 0)
         result1 = self.tube.truncate()
         result2 = self.tube.truncate()
         self.assertEqual(result1, result2)
@@ -262,3 +274,60 @@ class TestSuite_03_CustomLockAndConnection(TestSuite_Basic):
         self.queue.tarantool_lock = threading.Lock()
         self.queue.tarantool_connection = tarantool.Connection
         self.assertIsNotNone(self.queue.statistics())
+
+class TestSuite_04_Batch(TestSuite_Basic):
+    def test_00_PutMany(self):
+        data = [[i, "task"] for i in range(10)]
+        tasks = self.tube.put_many(data, chunk_size=3)
+        self.assertEqual(len(tasks), 10)
+        self.assertEqual([task.data for task in tasks], data)
+        for _ in data:
+            self.tube.take().ack()
+
+    def test_01_UrgentMany(self):
+        self.tube.put("basic prio")
+        self.tube.urgent_many(["URGENT #1", "URGENT #2"])
+        taken = [self.tube.take() for _ in range(3)]
+        self.assertEqual(taken[-1].data, "basic prio")
+        for task in taken:
+            task.ack()
+
+    def test_02_TakeMany(self):
+        self.tube.put_many(range(5))
+        tasks = self.tube.take_many(3)
+        self.assertEqual([task.data for task in tasks], [0, 1, 2])
+        tasks += self.tube.take_many(5)
+        self.assertEqual(len(tasks), 5)
+        self.assertEqual(self.tube.take_many(5, 1), [])
+        for task in tasks:
+            task.ack()
+
+    def test_03_Prefetch(self):
+        self.tube.put_many(range(5))
+        self.tube.prefetch = 2
+        tasks = list(self.tube)
+        self.assertEqual([task.data for task in tasks], list(range(5)))
+        for task in tasks:
+            task.ack()
+        self.tube.put_many(range(3))
+        self.tube.take().ack()
+        self.tube.prefetch = 0
+        self.assertEqual(self.tube.statistics()['tasks']['taken'], 0)
+        for task in self.tube:
+            task.ack()
+        with self.assertRaises(TypeError):
+            self.tube.prefetch = -1
+
+    def test_04_AckMany(self):
+        self.tube.put_many(range(4))
+        tasks = self.tube.take_many(4)
+        released = self.queue.release_many(tasks[2:])
+        self.assertEqual(len(released), 2)
+        self.assertTrue(all(task.modified for task in tasks[2:]))
+        self.assertFalse(any(task.modified for task in tasks[:2]))
+        self.assertEqual(self.queue.ack_many(tasks[:2]), [True, True])
+        tasks = self.tube.take_many(2)
+        self.assertEqual(self.queue.bury_many(tasks), [True, True])
+        self.assertEqual(self.queue.dig_many(tasks), [True, True])
+        task_ids = [task.task_id for task in self.tube.take_many(2)]
+        self.assertEqual(self.queue.delete_many(task_ids), [True, True])
@@ -0,0 +1,66 @@
+import time
+import unittest
+
+from tarantool_queue import Queue
+from tarantool_queue.sampler import RingBuffer, StatsSampler
+
+from .fake_tarantool import FakeTarantool
+
+
+class TestSuite_Sampler(unittest.TestCase):
+    def test_00_RingBuffer(self):
+        ring = RingBuffer(3)
+        self.assertEqual(ring.values(), [])
+        for value in range(5):
+            ring.append(value)
+        self.assertEqual(len(ring), 3)
+        self.assertEqual(ring.values(), [2.0, 3.0, 4.0])
+        self.assertEqual((ring[0], ring[-1]), (2.0, 4.0))
+        with self.assertRaises(IndexError):
+            ring[3]
+        with self.assertRaises(ValueError):
+            RingBuffer(1)
+
+    def test_01_Rates(self):
+        with FakeTarantool() as server:
+            queue = Queue(server.host, server.port, 0)
+            tube = queue.tube("sampled")
+            sampler = StatsSampler(queue, size=4, tubes=["sampled"])
+            self.assertIsNone(sampler.rate("sampled", "put"))
+            sampler.sample()
+            tube.put_many(range(10))
+            time.sleep(0.05)
+            sampler.sample()
+            self.assertGreater(sampler.rate("sampled", "put"), 0)
+            self.assertGreater(sampler.backlog_growth("sampled"), 0)
+            self.assertIsNone(sampler.time_to_drain("sampled"))
+
+            for task in tube.take_many(5):
+                task.ack()
+            time.sleep(0.05)
+            sampler.sample()
+            rates = sampler.rates("sampled", window=0.01)
+            self.assertGreater(rates["ack"], 0)
+            self.assertEqual(rates["put"], 0)
+            self.assertEqual(rates["backlog"], 5)
+            self.assertLess(rates["backlog_growth"], 0)
+            self.assertGreater(rates["time_to_drain"], 0)
+
+            for _ in range(3):
+                sampler.sample()
+            history = sampler.history("sampled", "ready")
+            self.assertEqual([value for _, value in history], [5] * 4)
+            self.assertEqual(list(sampler.snapshot()), ["sampled"])
+
+    def test_02_Background(self):
+        with FakeTarantool() as server:
+            queue = Queue(server.host, server.port, 0)
+            queue.tube("background").put(1)
+            sampler = StatsSampler(queue, interval=0.01).start()
+            time.sleep(0.1)
+            sampler.stop()
+            count = len(sampler.history("background", "put"))
+            self.assertGreaterEqual(count, 3)
+            time.sleep(0.05)
+            self.assertEqual(len(sampler.history("background", "put")),
+                             count)
@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+
+from tarantool_queue.sharded import HashRing, ShardedQueue
+
+from .fake_tarantool import FakeTarantool
+
+
+class TestSuite_HashRing(unittest.TestCase):
+    def test_00_MinimalRemap(self):
+        nodes = [("10.0.0.%d" % i, 33013) for i in range(4)]
+        ring = HashRing(nodes)
+        keys = ["tube%d" % i for i in range(2000)]
+        before = dict((key, ring.node(key)) for key in keys)
+        self.assertEqual(len(set(before.values())), 4)
+        ring.add(("10.0.0.4", 33013))
+        moved = [key for key in keys if ring.node(key) != before[key]]
+        self.assertTrue(0 < len(moved) < len(keys) * 0.35)
+        self.assertTrue(all(ring.node(key) == ("10.0.0.4", 33013)
+                            for key in moved))
+        ring.remove(("10.0.0.4", 33013))
+        self.assertEqual(dict((key, ring.node(key)) for key in keys), before)
+
+
+class TestSuite_Sharded(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.servers = [FakeTarantool().start() for _ in range(3)]
+        cls.queue = ShardedQueue(
+            [(server.host, server.port) for server in cls.servers])
+
+    @classmethod
+    def tearDownClass(cls):
+        for server in cls.servers:
+            server.stop()
+
+    def tearDown(self):
+        for name in list(self.queue.tubes):
+            self.queue.truncate(name)
+
+    def test_00_PinnedTube(self):
+        tube = self.queue.tube("pinned")
+        node = self.queue.node("pinned")
+        for i in range(5):
+            self.assertEqual(tube.put(i).queue, self.queue.queues[node])
+        self.assertEqual([tube.take().data for _ in range(5)], list(range(5)))
+
+    def test_01_StripedTube(self):
+        tube = self.queue.tube("striped", stripe=True)
+        tasks = [tube.put(i) for i in range(6)]
+        self.assertEqual(len(set(task.queue for task in tasks)), 3)
+        taken = [tube.take() for _ in range(6)]
+        self.assertEqual(sorted(task.data for task in taken), list(range(6)))
+        self.assertTrue(all(task.ack() for task in taken))
+        self.assertIsNone(tube.take(0.2))
+
+    def test_02_Truncate(self):
+        tube = self.queue.tube("striped_truncate", stripe=True)
+        for i in range(7):
+            tube.put(i)
+        self.assertEqual(tube.truncate(), 7)
+
+    def test_03_Statistics(self):
+        tube = self.queue.tube("striped_stats", stripe=True)
+        for i in range(6):
+            tube.put(i)
+        self.assertEqual(tube.statistics()['tasks']['ready'], 6)
+
+    def test_04_CachedTubes(self):
+        tube = self.queue.tube("striped_cached", stripe=True, pri=3)
+        tubes = tube.tubes
+        self.assertEqual([id(t) for t in tube.tubes], [id(t) for t in tubes])
+        self.queue.tube("striped_cached", pri=5)
+        tube.serialize = repr
+        self.assertTrue(all(t.opt["pri"] == 5 for t in tubes))
+        self.assertTrue(all(t.serialize is repr for t in tubes))
+
+    def test_05_PinnedStatistics(self):
+        tube = self.queue.tube("pinned_stats")
+        node = self.queue.node("pinned_stats")
+        for i in range(3):
+            tube.put(i)
+        others = [queue for other, queue in self.queue.queues.items()
+                  if other != node]
+        with mock.patch.object(others[0], "_call") as first, \
+                mock.patch.object(others[1], "_call") as second:
+            self.assertEqual(tube.statistics()['tasks']['ready'], 3)
+        self.assertFalse(first.called or second.called)
+        self.assertEqual(self.queue.statistics("unknown_stats"), {})
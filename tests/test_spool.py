@@ -0,0 +1,211 @@
+import os
+import errno
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import tarantool
+
+from tarantool_queue import Queue, TQueue
+from tarantool_queue.interceptor import Interceptor
+from tarantool_queue.spool import Spool
+
+from .fake_tarantool import FakeTarantool
+
+
+def _wait(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class BreakBatch(Interceptor):
+    # the connection breaks after the first half of a batch
+    def call_many(self, call_many, calls):
+        half = len(calls) // 2
+        results = list(call_many(calls[:half]))
+        error = tarantool.NetworkError("broken")
+        error.results = results + [None] * (len(calls) - half)
+        raise error
+
+
+class TestSuite_Spool(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        # port of a server which is down
+        server = FakeTarantool()
+        self.port = server.port
+        server.stop()
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.stop()
+        shutil.rmtree(self.path)
+
+    def start_server(self):
+        self.server = FakeTarantool(port=self.port).start()
+        return self.server
+
+    def test_00_Segments(self):
+        queue = Queue("127.0.0.1", self.port, 0)
+        spool = Spool(queue, self.path, segment_size=256)
+        for i in range(20):
+            spool.append("queue.put", ("0", "spool", "0", "0", "0", "0",
+                                       b"%02d" % i))
+        self.assertEqual(len(spool), 20)
+        segments = spool.stats()["segments"]
+        self.assertGreater(segments, 1)
+        # torn record at the end is ignored on reopen
+        spool._write.map[spool._write_offset:spool._write_offset + 8] = \
+            b"\x05\x00\x00\x00\x01\x02\x03\x04"
+        spool.close()
+
+        spool = Spool(queue, self.path, segment_size=256)
+        self.assertEqual(len(spool), 20)
+        self.assertEqual(spool.replay(), 0)
+        self.assertEqual(spool.stats()["errors"], 1)
+        self.start_server()
+        self.assertEqual(spool.replay(), 20)
+        self.assertEqual(len(spool), 0)
+        self.assertEqual(spool.stats()["segments"], 1)
+        tasks = queue.tube("spool").take_many(30)
+        self.assertEqual([task.raw_data for task in tasks],
+                         [b"%02d" % i for i in range(20)])
+        spool.close()
+        self.assertEqual(len(Spool(queue, self.path)), 0)
+
+    def test_01_PutsWhileDown(self):
+        queue = Queue("127.0.0.1", self.port, 0)
+        spool = queue.create_spool(self.path, interval=0.01)
+        tube = queue.tube("spool_down")
+        self.assertIsNone(tube.put(1))
+        self.assertIsNone(tube.urgent(2))
+        self.assertEqual(tube.put_many([3, 4]), [None, None])
+        self.assertEqual(spool.stats()["depth"], 4)
+
+        self.start_server()
+        self.assertTrue(_wait(lambda: not len(spool)))
+        stats = spool.stats()
+        self.assertEqual(stats["spooled"], 4)
+        self.assertEqual(stats["replayed"], 4)
+        self.assertGreater(stats["replay_rate"], 0)
+        # drained spool: puts go to the server again
+        self.assertEqual(tube.put(5).data, 5)
+        self.assertEqual([task.data for task in tube.take_many(10)],
+                         [2, 1, 3, 4, 5])
+        del queue.spool
+        self.assertIsNone(queue.spool)
+
+    def test_02_UniqueReplay(self):
+        queue = Queue("127.0.0.1", self.port, 0)
+        queue.spool = Spool(queue, self.path)
+        tube = queue.tube("spool_unique")
+        self.assertIsNone(tube.put_unique("once"))
+        self.assertIsNone(tube.put_unique("once"))
+        cursor = os.path.join(self.path, "cursor")
+        self.assertFalse(os.path.exists(cursor))
+
+        self.start_server()
+        self.assertEqual(queue.spool.replay(), 2)
+        # process dies before the cursor is saved: replayed again
+        os.unlink(cursor)
+        del queue.spool
+        queue.spool = Spool(queue, self.path)
+        self.assertEqual(len(queue.spool), 2)
+        self.assertEqual(queue.spool.replay(), 2)
+        self.assertEqual(tube.statistics()["tasks"]["ready"], 1)
+        self.assertRaises(TypeError, setattr, queue, "spool", object())
+        del queue.spool
+
+    def test_03_TQueueAndProducer(self):
+        tqueue = TQueue("127.0.0.1", self.port, 0)
+        spool = tqueue.create_spool(self.path, interval=0.01)
+        tube = tqueue.tube("spool_tqueue")
+        self.assertIsNone(tube.put(1))
+        producer = tube.create_producer(linger=0)
+        futures = [producer.put(i) for i in range(2, 5)]
+        self.assertTrue(producer.close(5))
+        self.assertEqual([future.result() for future in futures],
+                         [None] * 3)
+        self.assertEqual(len(spool), 4)
+
+        self.start_server()
+        self.assertTrue(_wait(lambda: not len(spool)))
+        self.assertEqual(sorted(tube.take().data for _ in range(4)),
+                         [1, 2, 3, 4])
+        del tqueue.spool
+
+    def test_04_PartialBatch(self):
+        server = self.start_server()
+        queue = Queue(server.host, server.port, 0)
+        spool = queue.create_spool(self.path, interval=60)
+        tube = queue.tube("spool_partial")
+        breaker = BreakBatch()
+        queue.add_interceptor(breaker)
+        results = tube.put_many(range(4))
+        self.assertEqual([task.data for task in results[:2]], [0, 1])
+        self.assertEqual(results[2:], [None, None])
+        # puts accepted by the server aren't spooled
+        self.assertEqual(len(spool), 2)
+        queue.remove_interceptor(breaker)
+        self.assertEqual(spool.replay(), 2)
+        self.assertEqual(sorted(task.data for task in tube.take_many(10)),
+                         [0, 1, 2, 3])
+        del queue.spool
+
+    def test_05_Allocated(self):
+        queue = Queue("127.0.0.1", self.port, 0)
+        spool = Spool(queue, self.path, segment_size=1 << 20)
+        path = os.path.join(self.path, "%016x.seg" % 0)
+        # disk blocks are reserved, the file isn't sparse
+        self.assertGreaterEqual(os.stat(path).st_blocks * 512, 1 << 20)
+        spool.close()
+
+    def test_06_MaxBytes(self):
+        queue = Queue("127.0.0.1", self.port, 0)
+        args = ("0", "spool", "0", "0", "0", "0", b"x" * 100)
+        # one record per segment, two segments at most
+        spool = Spool(queue, self.path, segment_size=256, max_bytes=512)
+        with self.assertRaises(Spool.Full):
+            spool.extend([("queue.put", args)] * 3)
+        # nothing of the batch is spooled
+        self.assertEqual(len(spool), 0)
+        spool.extend([("queue.put", args)] * 2)
+        with self.assertRaises(Spool.Full):
+            spool.append("queue.put", args)
+        stats = spool.stats()
+        self.assertEqual((stats["depth"], stats["bytes"]), (2, 512))
+        spool.close()
+
+        spool = Spool(queue, self.path, segment_size=256, max_bytes=512,
+                      on_full="drop")
+        self.assertEqual(len(spool), 2)
+        spool.append("queue.put", args)
+        stats = spool.stats()
+        self.assertEqual((stats["depth"], stats["dropped"]), (2, 1))
+        spool.close()
+        with self.assertRaises(ValueError):
+            Spool(queue, self.path, on_full="block")
+
+    def test_07_DiskFull(self):
+        queue = Queue("127.0.0.1", self.port, 0)
+        args = ("0", "spool", "0", "0", "0", "0", b"x" * 100)
+        spool = Spool(queue, self.path, segment_size=512)
+        spool.append("queue.put", args)
+
+        def full(f, size):
+            raise OSError(errno.ENOSPC, "No space left on device")
+        # two records of the batch fit in the segment, the third doesn't
+        with mock.patch("tarantool_queue.spool._allocate", full):
+            with self.assertRaises(Spool.Full):
+                spool.extend([("queue.put", args)] * 3)
+        self.assertEqual(spool.stats()["segments"], 1)
+        spool.close()
+        # records of the failed batch aren't found on reopen
+        spool = Spool(queue, self.path, segment_size=512)
+        self.assertEqual(len(spool), 1)
+        spool.close()
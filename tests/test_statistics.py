@@ -0,0 +1,45 @@
+import unittest
+
+from tarantool_queue import Queue
+from tarantool_queue.tarantool_queue import parse_statistics
+
+from .fake_tarantool import FakeTarantool
+
+
+def _row(space, tube, ready=0, put=0):
+    prefix = "space{0}.{1}.".format(space, tube)
+    return [prefix + "tasks.ready", str(ready), prefix + "tasks.total",
+            str(ready), prefix + "put", str(put)]
+
+
+class TestSuite_Statistics(unittest.TestCase):
+    def test_00_Parse(self):
+        row = (_row(0, "tube", 1, 2) + _row(0, "dotted.tube", 3) +
+               _row(1, "tube", 5))
+        self.assertEqual(parse_statistics(0, row), {
+            "tube": {"tasks": {"ready": 1, "total": 1}, "put": 2},
+            "dotted.tube": {"tasks": {"ready": 3, "total": 3},
+                                  "put": 0},
+        })
+        self.assertEqual(list(parse_statistics(0, row, ["tube"])), ["tube"])
+        with self.assertRaises(Queue.ZeroTupleException):
+            parse_statistics(0, ["bad", "1"])
+
+    def test_01_ParseBytes(self):
+        row = [field.encode("utf-8") for field in _row(0, "tube", 1, 2)]
+        self.assertEqual(parse_statistics(0, row, ["tube"]), {
+            "tube": {"tasks": {"ready": 1, "total": 1}, "put": 2},
+        })
+
+    def test_02_StatisticsMany(self):
+        with FakeTarantool() as server:
+            queue = Queue(server.host, server.port, 0)
+            queue.tube("tube1").put_many(range(3))
+            queue.tube("tube2").put(1)
+            queue.tube("tube3").put(1)
+            stats = queue.statistics_many(["tube1", "tube2", "missing"])
+            self.assertEqual(sorted(stats), ["missing", "tube1", "tube2"])
+            self.assertEqual(stats["tube1"]["tasks"]["ready"], 3)
+            self.assertEqual(stats["tube2"]["put"], 1)
+            self.assertEqual(stats["missing"], {})
+            self.assertEqual(queue.statistics("tube1"), stats["tube1"])
@@ -0,0 +1,64 @@
+import gc
+import struct
+import unittest
+import weakref
+
+import msgpack
+
+from tarantool_queue import Queue, TQueue
+from tarantool_queue.tarantool_queue import Task
+from tarantool_queue.tarantool_tqueue import TTask
+from tarantool_queue.iproto import Response
+
+
+class TestSuite_Task(unittest.TestCase):
+    def setUp(self):
+        self.queue = Queue("127.0.0.1", 33013, 0)
+        self.calls = []
+
+    def deserialize(self, data):
+        self.calls.append(data)
+        return msgpack.unpackb(data)
+
+    def task(self, tube, data):
+        row = (b"id", tube, b"taken", msgpack.packb(data))
+        return Task.from_tuple(self.queue, Response([row]))
+
+    def test_00_Slots(self):
+        task = self.task("tube", [1, 2])
+        self.assertFalse(hasattr(task, '__dict__'))
+        with self.assertRaises(AttributeError):
+            task.spam = 1
+        ref = weakref.ref(task)
+        del task
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_01_LazyCachedData(self):
+        self.queue.tube("tube").deserialize = self.deserialize
+        task = self.task("tube", [1, 2])
+        other = self.task("other", [3])
+        self.assertEqual(self.calls, [])
+        self.assertEqual(task.data, [1, 2])
+        self.assertEqual(task.data, [1, 2])
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(other.data, [3])
+        self.assertNotIn("other", self.queue.tubes)
+
+    def test_02_Payload(self):
+        task = self.task("tube", "spam")
+        self.assertIsInstance(task.payload, memoryview)
+        self.assertEqual(task.payload.tobytes(), task.raw_data)
+        self.assertIsNone(Task(self.queue).payload)
+
+    def test_03_BytesTube(self):
+        self.queue.tube("tube").deserialize = self.deserialize
+        self.assertEqual(self.task(b"tube", [1]).data, [1])
+        tqueue = TQueue("127.0.0.1", 33013, 0)
+        tqueue.tube("tube").deserialize = self.deserialize
+        row = (struct.pack("<q", 1), b"0", b"taken", b"0", b"tube",
+               b"0", b"0", b"0", msgpack.packb([2]))
+        task = TTask.from_tuple(tqueue, Response([row]))
+        self.assertEqual(task.data, [2])
+        # deserializer of the tube is used for bytes names too
+        self.assertEqual(len(self.calls), 2)
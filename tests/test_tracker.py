@@ -0,0 +1,53 @@
+import gc
+import time
+import unittest
+
+from tarantool_queue.tracker import TaskTracker
+
+
+class FakeTask(object):
+    def __init__(self, task_id):
+        self.task_id = task_id
+
+
+class TestSuite_Tracker(unittest.TestCase):
+    def setUp(self):
+        self.released = []
+
+    def release_many(self, task_ids):
+        self.released.append(list(task_ids))
+        return [ValueError(task_id) if task_id == 'bad' else task_id
+                for task_id in task_ids]
+
+    def test_00_ReleaseLeaked(self):
+        tracker = TaskTracker(self.release_many, interval=10, batch_size=2)
+        tasks = [FakeTask(str(i)) for i in range(3)]
+        for task in tasks:
+            tracker.track(task)
+        kept = tasks.pop()
+        del tasks, task
+        gc.collect()
+        self.assertEqual(self.released, [])
+        self.assertEqual(tracker.flush(), 2)
+        self.assertEqual(sorted(self.released[0]), ['0', '1'])
+        stats = tracker.stats()
+        self.assertEqual((stats['tracked'], stats['leaked']), (3, 2))
+        self.assertEqual((stats['auto_released'], stats['active']), (2, 1))
+        tracker.forget(kept)
+        del kept
+        gc.collect()
+        self.assertEqual(tracker.flush(), 0)
+        self.assertEqual(tracker.stats()['active'], 0)
+
+    def test_01_Flusher(self):
+        tracker = TaskTracker(self.release_many, interval=0.01)
+        tracker.track(FakeTask('bad'))
+        tracker.track(FakeTask('good'))
+        gc.collect()
+        deadline = time.time() + 1
+        while tracker._thread is not None and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertIsNone(tracker._thread)
+        stats = tracker.stats()
+        self.assertEqual((stats['leaked'], stats['auto_released'],
+                          stats['failed']), (2, 1, 1))
@@ -0,0 +1,122 @@
+import time
+import struct
+import unittest
+
+import tarantool
+
+from tarantool_queue import Queue, TQueue
+from tarantool_queue.interceptor import Interceptor
+
+from .fake_tarantool import FakeTarantool
+
+
+class FailLastTake(Interceptor):
+    def call_many(self, call_many, calls):
+        if calls[-1][0] != "queue.take":
+            return call_many(calls)
+        error = tarantool.DatabaseError(0, "injected")
+        return list(call_many(calls[:-1])) + [error]
+
+
+class TestSuite_Tube(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeTarantool().start()
+        cls.queue = Queue(cls.server.host, cls.server.port, 0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_00_PutOptions(self):
+        tube = self.queue.tube("put_options", pri=3)
+        self.assertEqual(int(tube.put(1).meta()["pri"]), 3)
+        self.queue.tube("put_options", pri=4, ttr=10)
+        meta = tube.put(2).meta()
+        self.assertEqual((int(meta["pri"]), meta["ttr"]), (4, 10000000))
+        meta = tube.put(3, pri=7, unknown=1).meta()
+        self.assertEqual((int(meta["pri"]), meta["ttr"]), (7, 10000000))
+        self.assertEqual(int(tube.put(4).meta()["pri"]), 4)
+        tube.truncate()
+
+    def test_01_TPutOptions(self):
+        tqueue = TQueue(self.server.host, self.server.port, 0)
+        tube = tqueue.tube("tput_options", limits=2)
+        tube.put(1)
+        tube.put(2)
+        with self.assertRaises(TQueue.DataBaseError):
+            tube.put(3)
+        tube.update_options(limits=3)
+        tube.put(3)
+        with self.assertRaises(TQueue.DataBaseError):
+            tube.put(4)
+        tube.put(4, limits=4)
+
+    def test_02_PrefetchTTR(self):
+        tube = self.queue.tube("prefetch_ttr", ttr=60)
+        tube.put("short", ttr=1)
+        tube.put("long")
+        tube.prefetch = 2
+        # TTR of put is used, not default of the tube
+        task = tube.take()
+        self.assertEqual(task.data, "long")
+        task.ack()
+        tube.prefetch = 0
+        self.assertEqual(tube.statistics()["tasks"]["ready"], 1)
+        tube.truncate()
+
+    def test_03_TakeManyError(self):
+        queue = Queue(self.server.host, self.server.port, 0)
+        queue.add_interceptor(FailLastTake())
+        tube = queue.tube("take_many_error")
+        tube.put_many(range(3))
+        with self.assertRaises(tarantool.DatabaseError):
+            tube.take_many(3)
+        # tasks taken before the error are released
+        stats = tube.statistics()["tasks"]
+        self.assertEqual((stats["taken"], stats["ready"]), (0, 3))
+        tube.truncate()
+
+    def test_04_PrefetchStale(self):
+        tube = self.queue.tube("prefetch_stale", ttr=2)
+        tube.put_many(range(3))
+        tube.prefetch = 3
+        tube.take().ack()
+        time.sleep(2.5)
+        # buffered tasks were released before their TTR ran out
+        task = tube.take()
+        self.assertIn(task.data, (1, 2))
+        task.ack()
+        tube.prefetch = 0
+        stats = tube.statistics()["tasks"]
+        self.assertEqual((stats["taken"], stats["ready"]), (0, 1))
+        tube.truncate()
+
+    def test_05_PrefetchExpired(self):
+        tube = self.queue.tube("prefetch_expired", ttr=1)
+        tube.put(1)
+        tube.put(2)
+        task = tube.take()
+        time.sleep(1.5)
+        # TTR is over, the server has already made the task ready
+        tube._prefetched.append((0, task))
+        self.assertIn(tube.take().data, (1, 2))
+        tube._prefetched.append((float('inf'), task))
+        self.assertEqual(tube.release_prefetched(), 0)
+        tube.truncate()
+
+    def test_06_BytesTaskIds(self):
+        tube = self.queue.tube("bytes_ids")
+        tube.put(1)
+        task = tube.take()
+        self.assertIsInstance(task.task_id, str)
+        released = self.queue.release_many([task.task_id.encode("utf-8")])
+        self.assertEqual(released[0].data, 1)
+        tube.truncate()
+
+        tqueue = TQueue(self.server.host, self.server.port, 0)
+        ttube = tqueue.tube("bytes_ids")
+        ttube.put(1)
+        task = ttube.take()
+        packed = struct.pack("<q", task.task_id)
+        self.assertEqual(tqueue.ack_many([packed]), [True])
@@ -0,0 +1,166 @@
+import os
+import time
+import unittest
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+from tarantool_queue import Queue, TQueue
+from tarantool_queue.worker import Worker
+
+from .fake_tarantool import FakeTarantool
+
+
+class TestSuite_Worker(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeTarantool().start()
+        cls.queue = Queue(cls.server.host, cls.server.port, 0)
+        cls.queue.create_pool(max_size=8)
+
+    @classmethod
+    def tearDownClass(cls):
+        del cls.queue.tarantool_pool
+        cls.server.stop()
+
+    def test_00_AutoAck(self):
+        tube = self.queue.tube("worker_ack")
+        tube.put_many(range(20))
+        seen = []
+        lock = threading.Lock()
+        in_flight = [0, 0]
+
+        def handler(task):
+            with lock:
+                in_flight[0] += 1
+                in_flight[1] = max(in_flight)
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+                seen.append(task.data)
+
+        worker = tube.consume(handler, concurrency=4, take_timeout=0.05)
+        while len(seen) < 20:
+            time.sleep(0.01)
+        self.assertTrue(worker.stop(5))
+        stats = worker.stats()
+        self.assertEqual(sorted(seen), list(range(20)))
+        self.assertEqual((stats['acked'], stats['in_flight']), (20, 0))
+        self.assertLessEqual(in_flight[1], 4)
+        self.assertGreater(stats['throughput'], 0)
+        self.assertIsNone(tube.take())
+
+    def test_01_BuryOnError(self):
+        tube = self.queue.tube("worker_bury")
+        tube.put("bad task")
+
+        def handler(task):
+            raise ValueError(task.data)
+
+        worker = tube.consume(handler, on_error='bury', take_timeout=0.05)
+        while not worker.stats()['processed']:
+            time.sleep(0.01)
+        worker.stop()
+        stats = worker.stats()
+        self.assertEqual((stats['failed'], stats['buried']), (1, 1))
+        self.assertIsNone(tube.take())
+
+    def test_02_DrainOnStop(self):
+        tube = self.queue.tube("worker_drain")
+        tube.put_many(range(4))
+        started = threading.Event()
+        done = []
+
+        def handler(task):
+            started.set()
+            time.sleep(0.2)
+            done.append(task.data)
+
+        worker = tube.consume(handler, concurrency=4, take_timeout=0.05)
+        started.wait(1)
+        self.assertTrue(worker.stop(5))
+        self.assertEqual(worker.stats()['in_flight'], 0)
+        self.assertEqual(len(done), worker.stats()['acked'])
+
+    def test_03_Processes(self):
+        tube = self.queue.tube("worker_processes")
+        results = self.queue.tube("worker_results")
+        tube.put_many([1, 2, 3, -1])
+        queue = self.queue
+
+        def handler(data):
+            if data < 0:
+                raise ValueError(data)
+            queue.tube("worker_results").put(data * 10)
+
+        worker = tube.consume(handler, processes=2, on_error='bury',
+                              take_timeout=0.05)
+        while worker.stats()['processed'] < 4:
+            time.sleep(0.01)
+        self.assertTrue(worker.stop(5))
+        stats = worker.stats()
+        self.assertEqual((stats['acked'], stats['buried']), (3, 1))
+        data = sorted(task.data for task in results.take_many(3))
+        self.assertEqual(data, [10, 20, 30])
+        with self.assertRaises(ValueError):
+            Worker(tube, handler, processes=-1)
+
+    def test_04_ForkSafeConnection(self):
+        queue = Queue(self.server.host, self.server.port, 0)
+        tnt = queue.tnt
+        self.assertIs(queue.tnt, tnt)
+        queue._after_fork()
+        self.assertIsNot(queue.tnt, tnt)
+        pool = queue.create_pool(min_size=2)
+        queue._after_fork()
+        self.assertIs(queue.tnt, pool)
+        self.assertEqual(pool.stats()['size'], 0)
+        del queue.tarantool_pool
+
+    def test_05_ProcessesOverlap(self):
+        tube = self.queue.tube("worker_overlap")
+        tube.put_many([1, 2, 3, 4])
+        queue = self.queue
+
+        def handler(data):
+            start = time.time()
+            time.sleep(0.3)
+            queue.tube("worker_overlap_times").put([start, time.time()])
+
+        # concurrency is not given: every process gets a task at once
+        worker = tube.consume(handler, processes=4, take_timeout=0.05)
+        while worker.stats()['processed'] < 4:
+            time.sleep(0.01)
+        self.assertTrue(worker.stop(5))
+        times = [task.data for task in
+                 self.queue.tube("worker_overlap_times").take_many(4)]
+        self.assertEqual(len(times), 4)
+        self.assertLess(max(start for start, _ in times),
+                        min(end for _, end in times))
+
+    def test_06_TTubePolicies(self):
+        tqueue = TQueue(self.server.host, self.server.port, 0)
+        tube = tqueue.tube("worker_tqueue")
+        with self.assertRaises(TypeError):
+            Worker(tube, lambda task: None, on_error='bury')
+        Worker(tube, lambda task: None, on_error='delete')
+
+    def test_07_DeadChild(self):
+        tube = self.queue.tube("worker_dead_child")
+        tube.put_many([1, -1, 2])
+        results = []
+
+        def handler(data):
+            if data < 0:
+                os._exit(1)
+
+        def on_error(task, exc):
+            results.append((task.data, type(exc)))
+            task.delete()
+
+        worker = tube.consume(handler, processes=1, on_error=on_error,
+                              take_timeout=0.05)
+        while worker.stats()['processed'] < 3:
+            time.sleep(0.01)
+        self.assertTrue(worker.stop(5))
+        self.assertEqual(results, [(-1, BrokenProcessPool)])
+        self.assertEqual(worker.stats()['acked'], 2)